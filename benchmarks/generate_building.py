@@ -0,0 +1,176 @@
+"""
+Генератор синтетических данных здания для бенчмарков.
+
+Пример:
+    python benchmarks/generate_building.py --floors 6 --rooms-per-floor 200 \
+        --vertices 8 --tenants 50 --plan-size 4000x3000 -o /tmp/bench
+"""
+import os
+import json
+import hashlib
+import math
+import random
+import argparse
+from datetime import date, timedelta
+
+# Доли статусов среди кабинетов; цвета статусов приложение добавит само при загрузке
+STATUS_WEIGHTS = {"свободный": 3, "занят": 6, "скоро освободится": 1, "в ремонте": 1}
+
+
+def _rect_polygon(x, y, w, h, vertices):
+    """Прямоугольник, периметр которого разбит на заданное число вершин (не меньше 4)."""
+    extra = max(4, vertices) - 4
+    corners = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+    points = []
+    for i, (x0, y0) in enumerate(corners):
+        x1, y1 = corners[(i + 1) % 4]
+        count = extra // 4 + (1 if i < extra % 4 else 0)
+        points.append([round(x0, 2), round(y0, 2)])
+        for k in range(1, count + 1):
+            t = k / (count + 1)
+            points.append([round(x0 + (x1 - x0) * t, 2), round(y0 + (y1 - y0) * t, 2)])
+    return points
+
+
+def _make_tenants(count, rng):
+    tenants = []
+    for i in range(count):
+        inn = "".join(rng.choice("0123456789") for _ in range(12))
+        tenants.append({
+            "inn": inn,
+            "client_name": f"Контакт {i + 1}",
+            "renter_name": f"ООО «Арендатор {i + 1}»",
+            "payment_type": rng.choice(["Наличные", "Безналичные"]),
+        })
+    return tenants
+
+
+def room_grid(rooms, plan_width, plan_height, margin=10):
+    """Раскладывает комнаты сеткой по плану: [(x, y, w, h), ...]."""
+    if rooms <= 0:
+        return []
+    cols = max(1, math.ceil(math.sqrt(rooms * plan_width / plan_height)))
+    rows = math.ceil(rooms / cols)
+    cell_w = plan_width / cols
+    cell_h = plan_height / rows
+    cells = []
+    for i in range(rooms):
+        row, col = divmod(i, cols)
+        cells.append((col * cell_w + margin, row * cell_h + margin,
+                      max(cell_w - 2 * margin, 1), max(cell_h - 2 * margin, 1)))
+    return cells
+
+
+def generate_building(floors=6, rooms_per_floor=20, vertices=4, tenants=20,
+                      plan_size=(2000, 1500), plan_dir=None, seed=1, assets_dir=None):
+    """
+    Возвращает словарь в формате building_data.json.
+    Если задан plan_dir, для каждого этажа рисуется PNG-план со стенами
+    по границам комнат (нужен запущенный QGuiApplication).
+    Если задан и assets_dir, планы кладутся в хранилище планов, как это делает
+    приложение, и данные не требуют переноса при первом запуске.
+    """
+    rng = random.Random(seed)
+    tenant_pool = _make_tenants(max(tenants, 1), rng)
+    statuses = list(STATUS_WEIGHTS)
+    weights = [STATUS_WEIGHTS[s] for s in statuses]
+    today = date.today()
+    plan_width, plan_height = plan_size
+    cells = room_grid(rooms_per_floor, plan_width, plan_height)
+
+    data = {"floors": {}}
+    for floor in range(floors):
+        rooms = []
+        for i, (x, y, w, h) in enumerate(cells):
+            status = rng.choices(statuses, weights)[0]
+            room = {
+                "id": "%032x" % rng.getrandbits(128),
+                "number": str(i + 1),
+                "floor": str(floor),
+                "status": status,
+                "points": _rect_polygon(x, y, w, h, vertices),
+                "renter_name": "",
+            }
+            if status in ("занят", "скоро освободится") and tenants:
+                entry = today - timedelta(days=rng.randint(30, 1500))
+                room.update(rng.choice(tenant_pool))
+                room["entry_date"] = entry.isoformat()
+                room["exit_date"] = (entry + timedelta(days=rng.randint(180, 1800))).isoformat()
+            rooms.append(room)
+        floor_data = {"rooms": rooms}
+        if plan_dir:
+            plan_path = draw_plan(os.path.join(plan_dir, f"plan_{floor}.png"),
+                                  plan_width, plan_height, cells)
+            if assets_dir:
+                floor_data["plan_asset"] = store_plan(plan_path, assets_dir)
+                floor_data["plan_size"] = [plan_width, plan_height]
+            else:
+                floor_data["plan_path"] = plan_path
+        data["floors"][str(floor)] = floor_data
+    return data
+
+
+def draw_plan(path, width, height, cells):
+    """Рисует план этажа: белый фон и черные стены вокруг комнат."""
+    from PySide6.QtGui import QImage, QPainter, QPen, QColor
+    from PySide6.QtCore import Qt, QRectF
+
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(QColor("white"))
+    painter = QPainter(image)
+    painter.setPen(QPen(Qt.black, 6))
+    for x, y, w, h in cells:
+        painter.drawRect(QRectF(x - 5, y - 5, w + 10, h + 10))
+    painter.end()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image.save(path)
+    return path
+
+
+def store_plan(path, assets_dir):
+    """
+    Переносит план в хранилище assets_dir/originals под именем, равным хешу
+    содержимого (как stroycent.assets.import_plan). Возвращает имя в хранилище.
+    """
+    with open(path, "rb") as f:
+        asset = hashlib.sha256(f.read()).hexdigest() + os.path.splitext(path)[1].lower()
+    target = os.path.join(assets_dir, "originals", asset)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(path, target)
+    return asset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация синтетического building_data.json")
+    parser.add_argument("--floors", type=int, default=6)
+    parser.add_argument("--rooms-per-floor", type=int, default=20)
+    parser.add_argument("--vertices", type=int, default=4)
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--plan-size", default="2000x1500", help="ШИРИНАxВЫСОТА, 0x0 — без изображений")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", default=".", help="Папка для building_data.json и планов")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.plan_size.lower().split("x"))
+    plan_dir = assets_dir = None
+    if width and height:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtGui import QGuiApplication
+        app = QGuiApplication.instance() or QGuiApplication([])  # noqa: F841
+        plan_dir = os.path.join(os.path.abspath(args.output), "plans")
+        # Хранилище планов приложение ищет рядом с файлом данных
+        assets_dir = os.path.join(os.path.abspath(args.output), "assets")
+    else:
+        width, height = 2000, 1500
+
+    data = generate_building(args.floors, args.rooms_per_floor, args.vertices, args.tenants,
+                             (width, height), plan_dir, args.seed, assets_dir)
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, "building_data.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    print(f"Создан {path}: этажей {args.floors}, кабинетов {args.floors * args.rooms_per_floor}")
+
+
+if __name__ == "__main__":
+    main()
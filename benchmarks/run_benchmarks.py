@@ -0,0 +1,170 @@
+"""
+Бенчмарки приложения на синтетических зданиях.
+
+Для каждого размера генерируется здание, и в отдельном процессе (Qt платформа
+offscreen) замеряются основные операции. Результаты сравниваются с
+сохраненной базой benchmarks/baseline.json.
+
+Примеры:
+    python benchmarks/run_benchmarks.py                      # 10, 1 000 и 50 000 кабинетов
+    python benchmarks/run_benchmarks.py --sizes 10,1000      # выбранные размеры
+    python benchmarks/run_benchmarks.py --update-baseline    # сохранить текущие результаты как базу
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+DEFAULT_SIZES = (10, 1000, 50000)
+FLOORS = 6
+# Замедление относительно базы, после которого результат считается регрессией
+REGRESSION_RATIO = 1.5
+# Разница меньше этого порога (мс) не считается регрессией: шум таймера
+REGRESSION_MIN_MS = 5.0
+# Предельное время замеров одного размера, секунд
+CHILD_TIMEOUT = 1800
+
+
+def _measure(func, repeat=3):
+    """Медиана времени выполнения func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run_child():
+    """Замеры внутри дочернего процесса; файл данных задан через STROYCENT_DATA_FILE."""
+    start = time.perf_counter()
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import Qt, QPointF, QEvent
+    from PySide6.QtGui import QMouseEvent
+    app = QApplication(sys.argv[:1])
+    from stroycent.app import MainWindow
+    from stroycent.dialogs import ReportDialog
+    from stroycent.data_manager import data_store, save_data
+    window = MainWindow()
+    window.show()
+    app.processEvents()
+    results = {"startup": (time.perf_counter() - start) * 1000}
+
+    results["load_floor"] = _measure(lambda: window.load_floor(0))
+    results["switch_floor"] = _measure(lambda: (window.load_floor(1), window.load_floor(0))) / 2
+    results["save_data"] = _measure(lambda: save_data(data_store))
+    results["update_legend"] = _measure(window.update_legend)
+    results["reload_statuses"] = _measure(window.reload_statuses)
+    results["report"] = _measure(lambda: ReportDialog(window).deleteLater())
+
+    # Вставка вершин в режиме рисования: среднее время на одну вершину
+    view = window.view
+    window.start_drawing()
+    vertices = 50
+
+    def insert_vertices():
+        view.drawing_points = []
+        for i in range(vertices):
+            pos = QPointF(20 + i * 7, 20 + (i % 5) * 9)
+            event = QMouseEvent(QEvent.MouseButtonPress, pos, view.viewport().mapToGlobal(pos),
+                                Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
+            view.mousePressEvent(event)
+    results["vertex_insert"] = _measure(insert_vertices) / vertices
+    window.reset_drawing_state()
+
+    print(json.dumps(results))
+
+
+def run_size(rooms, workdir):
+    """Генерирует здание на rooms кабинетов и запускает замеры в отдельном процессе."""
+    sys.path.insert(0, BENCH_DIR)
+    from generate_building import main as generate
+    # Наибольшее число этажей (не больше FLOORS), на которое кабинеты делятся поровну
+    floors = max(f for f in range(1, FLOORS + 1) if rooms % f == 0)
+    rooms_per_floor = rooms // floors
+    size_dir = os.path.join(workdir, str(rooms))
+    generate(["--floors", str(floors), "--rooms-per-floor", str(rooms_per_floor),
+              "--vertices", "8", "--tenants", str(max(1, rooms // 4)),
+              "--plan-size", "2000x1500", "-o", size_dir])
+    env = dict(os.environ)
+    env.update({
+        "QT_QPA_PLATFORM": "offscreen",
+        "STROYCENT_DATA_FILE": os.path.join(size_dir, "building_data.json"),
+        "STROYCENT_LOG_LEVEL": "WARNING",
+        "PYTHONPATH": REPO_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                               cwd=size_dir, env=env, capture_output=True, text=True, timeout=CHILD_TIMEOUT)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Бенчмарк для {rooms} кабинетов завершился с ошибкой:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline):
+    """Возвращает список регрессий: (размер, операция, база мс, сейчас мс)."""
+    regressions = []
+    for size, timings in results.items():
+        for name, value in timings.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if value > base * REGRESSION_RATIO and value - base > REGRESSION_MIN_MS:
+                regressions.append((size, name, base, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки StroyCent")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Количество кабинетов через запятую")
+    parser.add_argument("--update-baseline", action="store_true", help="Записать результаты в baseline.json")
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child()
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="stroycent-bench-") as workdir:
+        for rooms in (int(s) for s in args.sizes.split(",")):
+            print(f"== {rooms} кабинетов ==")
+            results[str(rooms)] = run_size(rooms, workdir)
+            for name, value in results[str(rooms)].items():
+                print(f"  {name:<16} {value:10.2f} мс")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=4)
+        print(f"База обновлена: {BASELINE_PATH}")
+        return 0
+
+    regressions = compare(results, baseline)
+    for size, name, base, value in regressions:
+        print(f"РЕГРЕССИЯ: {size} кабинетов, {name}: {base:.2f} мс -> {value:.2f} мс")
+    if not baseline:
+        print("База не найдена; запустите с --update-baseline, чтобы сохранить ее.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
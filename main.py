@@ -1,9 +1,9 @@
 from PySide6.QtWidgets import QApplication
 import sys
-from stroycent.app import MainWindow
-from stroycent.data_manager import get_log_file_path
-import traceback
+from stroycent.utils import (debug_log, error_log, info_log, logger, setup_logging, get_log_file_path,
+                             shutdown_logging, install_crash_handler, write_crash_log)
 import os
+import multiprocessing
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -46,55 +46,52 @@ def load_stylesheet():
         
         for css_path in possible_paths:
             if os.path.exists(css_path):
-                print(f"[DEBUG] Найден файл стилей: {css_path}")
+                debug_log("Найден файл стилей: %s", css_path)
                 with open(css_path, "r", encoding="utf-8") as f:
                     return f.read()
         
-        print("[DEBUG] Файл стилей не найден ни по одному из путей:")
-        for path in possible_paths:
-            print(f"  - {path}")
+        debug_log("Файл стилей не найден ни по одному из путей: %s", possible_paths)
         return ""
         
     except Exception as e:
-        print(f"[DEBUG] Ошибка загрузки стилей: {e}")
+        error_log("Ошибка загрузки стилей: %s", e)
         return ""
 
 if __name__ == "__main__":
-    log_file = None
+    # Экспорт рисует этажи в дочерних процессах; для собранного приложения это обязательно
+    multiprocessing.freeze_support()
+    log_path = get_log_file_path()
+    # Лог дописывается и ротируется, а не перезаписывается при каждом запуске.
+    # Логирование настраивается до импорта приложения: data_manager пишет в лог
+    # уже при импорте (чтение и перевод файлов данных)
+    setup_logging(log_path)
+    install_crash_handler(os.path.dirname(log_path))
+    info_log("--- Начало сеанса ---")
     try:
-        log_file = open(get_log_file_path(), "w", encoding="utf-8")
-        log_file.write("--- Начало сеанса ---\n")
-        log_file.flush()
-        
+        # Модули приложения читают данные здания при импорте. Процессы экспорта
+        # и снимков запускаются через spawn и импортируют этот файл заново
+        # (как __mp_main__), поэтому приложение импортируется только здесь
+        from stroycent.app import MainWindow
+
         app = QApplication(sys.argv)
         
         # Загрузка стилей
         stylesheet = load_stylesheet()
         if stylesheet:
             app.setStyleSheet(stylesheet)
-            if log_file:
-                log_file.write("Стили успешно загружены\n")
+            info_log("Стили успешно загружены")
         else:
-            if log_file:
-                log_file.write("Стили не загружены - файл не найден\n")
+            logger.warning("Стили не загружены - файл не найден")
 
         window = MainWindow()
         window.show()
 
         sys.exit(app.exec())
 
-    except Exception as e:
-        if log_file and not log_file.closed:
-            log_file.write("\n" + "="*50 + "\n")
-            log_file.write("Произошла критическая ошибка! Приложение будет закрыто.\n")
-            log_file.write(f"Ошибка: {str(e)}\n")
-            traceback.print_exc(file=log_file)
-            log_file.write("="*50 + "\n\n")
-            log_file.flush()
-        # Повторно выводим в консоль для отладки
-        traceback.print_exc()
+    except Exception:
+        logger.critical("Произошла критическая ошибка! Приложение будет закрыто.", exc_info=True)
+        write_crash_log(*sys.exc_info(), os.path.dirname(log_path))
 
     finally:
-        if log_file and not log_file.closed:
-            log_file.write("--- Конец сеанса ---\n")
-            log_file.close()
+        info_log("--- Конец сеанса ---")
+        shutdown_logging()
@@ -0,0 +1,526 @@
+"""
+Локальный HTTP/JSON API к данным здания на asyncio.
+
+Сервер слушает только 127.0.0.1 и работает либо внутри приложения (в
+отдельном потоке со своим циклом событий), либо без интерфейса:
+
+    python -m stroycent.api --port 8765
+
+Чтение:
+    GET /api/building                       здание и версия данных
+    GET /api/floors                         этажи с количеством кабинетов по статусам
+    GET /api/statuses                       статусы и количество кабинетов
+    GET /api/rooms?floor=&status=&limit=&offset=&points=1
+    GET /api/rooms/<этаж>/<номер>           кабинет вместе с полигоном
+    GET /api/search?q=&limit=               поиск по номеру, арендатору и ИНН
+    GET /api/counts                         сводка: всего, по статусам, по этажам, занятость
+
+Изменение (заголовок "Authorization: Bearer <токен>"):
+    PATCH /api/rooms/<этаж>/<номер>         {"status": ..., "renter_name": ..., ...}
+
+Токен берется из переменной STROYCENT_API_TOKEN или из файла api_token.txt
+рядом с основным файлом данных (создается при первом запуске).
+
+Запросы на чтение обслуживаются из неизменяемого среза данных, который
+перестраивается только после изменения данных, поэтому сотни одновременных
+запросов не обращаются к потоку интерфейса. Изменения выполняются там же,
+где и изменения из окна кабинета: проверка validate_changes, журнал
+(и через него индекс статусов), сохранение и история отмены.
+"""
+import os
+import sys
+import hmac
+import json
+import asyncio
+import secrets
+import argparse
+import threading
+import concurrent.futures
+from urllib.parse import urlsplit, parse_qs, unquote
+from PySide6.QtCore import QObject, Signal
+from stroycent import data_manager
+from stroycent.data_manager import (data_store, save_data, get_building, building_floors, validate_changes,
+                                    get_default_data_file_path, after_save_callbacks, merge_callbacks,
+                                    building_switch_callbacks, status_id)
+from stroycent.history import history_store, TRACKED_FIELDS, OCCUPIED_STATUS_IDS, VACANT_STATUS_IDS
+from stroycent.importer import IMPORT_FIELDS
+from stroycent.utils import info_log, error_log
+
+# Адрес не настраивается: чтение не требует токена, поэтому сервер доступен только с этого компьютера
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Ограничения на размер запроса
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+# Поля кабинета в ответах (полигон — только по запросу)
+ROOM_FIELDS = ("floor", "number") + tuple(field for field in TRACKED_FIELDS if field != "number")
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large", 422: "Unprocessable Entity",
+            500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def get_token_file_path():
+    return os.path.join(os.path.dirname(get_default_data_file_path()), "api_token.txt")
+
+
+def load_token():
+    """Токен для изменения данных: из окружения или из файла (создается при первом запуске)."""
+    token = os.environ.get("STROYCENT_API_TOKEN")
+    if token:
+        return token
+    path = get_token_file_path()
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    info_log("Создан токен API: %s", path)
+    return token
+
+
+def _room_view(room_data, points=False):
+    view = {field: room_data.get(field) for field in ROOM_FIELDS if room_data.get(field) is not None}
+    view["floor"] = str(room_data.get("floor", ""))
+    if points:
+        view["points"] = room_data.get("points", [])
+    return view
+
+
+class Snapshot:
+    """Неизменяемый срез данных здания для ответов на чтение."""
+
+    def __init__(self, data):
+        building = get_building()
+        self.version = data.get("version", 0)
+        self.building = {"id": building["id"], "name": building["name"]}
+        self.statuses = {name: dict(colors) for name, colors in data.get("statuses", {}).items()}
+        self.floor_names = {floor["key"]: floor["name"] for floor in building_floors()}
+        self.rooms = []
+        self.by_key = {}
+        self.search_text = []
+        for floor_key, floor_data in data.get("floors", {}).items():
+            for room_data in floor_data.get("rooms", []):
+                room = dict(room_data)
+                room["floor"] = str(floor_key)
+                self.rooms.append(room)
+                self.by_key[(room["floor"], str(room.get("number", "")))] = room
+                self.search_text.append(" ".join(
+                    str(room.get(field) or "") for field in ("number", "renter_name", "client_name", "inn")
+                ).casefold())
+        self.counts = self._counts()
+
+    def _counts(self):
+        by_status = {name: 0 for name in self.statuses}
+        by_floor = {}
+        for room in self.rooms:
+            status = room.get("status") or "свободный"
+            by_status[status] = by_status.get(status, 0) + 1
+            floor_counts = by_floor.setdefault(room["floor"], {})
+            floor_counts[status] = floor_counts.get(status, 0) + 1
+        # Занятость определяется по идентификатору статуса: название можно переименовать
+        occupied = sum(count for status, count in by_status.items()
+                       if status_id(status, self.statuses) in OCCUPIED_STATUS_IDS)
+        vacant = sum(count for status, count in by_status.items()
+                     if status_id(status, self.statuses) in VACANT_STATUS_IDS)
+        return {
+            "total": len(self.rooms),
+            "occupied": occupied,
+            "vacant": vacant,
+            "occupancy_rate": occupied / len(self.rooms) if self.rooms else 0.0,
+            "by_status": by_status,
+            "by_floor": by_floor,
+        }
+
+    # --- Ответы ---
+
+    def get_building(self, query):
+        return {"building": self.building, "version": self.version, "rooms": len(self.rooms)}
+
+    def get_floors(self, query):
+        keys = list(self.floor_names) + [key for key in self.counts["by_floor"] if key not in self.floor_names]
+        return {"floors": [{
+            "key": key,
+            "name": self.floor_names.get(key, f"{key} этаж"),
+            "rooms": sum(self.counts["by_floor"].get(key, {}).values()),
+            "by_status": self.counts["by_floor"].get(key, {}),
+        } for key in keys]}
+
+    def get_statuses(self, query):
+        return {"statuses": [
+            dict(colors, name=name, rooms=self.counts["by_status"].get(name, 0))
+            for name, colors in self.statuses.items()
+        ]}
+
+    def get_counts(self, query):
+        return self.counts
+
+    def get_rooms(self, query):
+        floor = _param(query, "floor")
+        status = _param(query, "status")
+        rooms = [room for room in self.rooms
+                 if (floor is None or room["floor"] == floor)
+                 and (status is None or (room.get("status") or "свободный") == status)]
+        return _page(rooms, query)
+
+    def get_room(self, floor, number):
+        room = self.by_key.get((floor, number))
+        if room is None:
+            raise ApiError(404, f"Кабинет {number} на этаже {floor} не найден.")
+        return {"room": _room_view(room, points=True)}
+
+    def search(self, query):
+        text = (_param(query, "q") or "").strip().casefold()
+        if not text:
+            raise ApiError(400, "Не задан параметр q.")
+        rooms = [room for room, haystack in zip(self.rooms, self.search_text) if text in haystack]
+        return _page(rooms, query)
+
+
+def _param(query, name):
+    values = query.get(name)
+    return values[0] if values else None
+
+
+def _int_param(query, name, default, maximum=None):
+    value = _param(query, name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(400, f"Параметр {name} должен быть числом.")
+    if number < 0:
+        raise ApiError(400, f"Параметр {name} не может быть отрицательным.")
+    return min(number, maximum) if maximum else number
+
+
+def _page(rooms, query):
+    limit = _int_param(query, "limit", DEFAULT_LIMIT, MAX_LIMIT)
+    offset = _int_param(query, "offset", 0)
+    points = _param(query, "points") in ("1", "true")
+    return {
+        "total": len(rooms),
+        "offset": offset,
+        "rooms": [_room_view(room, points) for room in rooms[offset:offset + limit]],
+    }
+
+
+def find_room(floor, number):
+    for room_data in data_store["floors"].get(str(floor), {}).get("rooms", []):
+        if str(room_data.get("number", "")) == number:
+            return room_data
+    return None
+
+
+def apply_room_changes(changes, description):
+    """Изменение кабинетов без интерфейса: журнал, индекс статусов и одно сохранение."""
+    for room_data, values in changes:
+        old_values = {field: room_data.get(field) for field in TRACKED_FIELDS}
+        room_data.update(values)
+        history_store.record_changes(room_data, old_values)
+    if changes:
+        save_data(data_store)
+
+
+class ApiServer:
+    """
+    HTTP-сервер API. Все обращения к данным (построение среза и изменения)
+    выполняет run_in_model — в приложении это поток интерфейса, без
+    интерфейса — сам цикл событий сервера. apply_changes(changes, описание)
+    вносит изменения, как MainWindow.apply_room_changes.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, token=None, run_in_model=None,
+                 apply_changes=apply_room_changes, check_external_changes=False):
+        self.host = HOST
+        self.port = port
+        self.token = token or load_token()
+        self.run_in_model = run_in_model or self._run_inline
+        self.apply_changes = apply_changes
+        self.check_external_changes = check_external_changes
+        self._snapshot = None
+        self._building = None
+        self._stale = True
+        self._server = None
+        self.loop = None
+
+    # --- Срез данных ---
+
+    def invalidate(self):
+        """Данные изменились: срез будет перестроен при следующем запросе."""
+        self._stale = True
+
+    def install_callbacks(self):
+        for callbacks in (after_save_callbacks, merge_callbacks, building_switch_callbacks):
+            callbacks.append(self.invalidate)
+
+    def remove_callbacks(self):
+        for callbacks in (after_save_callbacks, merge_callbacks, building_switch_callbacks):
+            if self.invalidate in callbacks:
+                callbacks.remove(self.invalidate)
+
+    async def _run_inline(self, func):
+        return func()
+
+    def _build_snapshot(self):
+        if self.check_external_changes:
+            _merge_external_changes()
+        self._stale = False
+        return Snapshot(data_store)
+
+    async def snapshot(self):
+        """Текущий срез; одновременные запросы ждут одного перестроения."""
+        if self.check_external_changes and not self._stale:
+            signature = data_manager._get_file_signature(data_manager.get_data_file_path())
+            self._stale = data_manager.is_external_change(signature)
+        if self._stale or self._snapshot is None:
+            if self._building is None:
+                self._building = asyncio.ensure_future(self.run_in_model(self._build_snapshot))
+            building = self._building
+            try:
+                self._snapshot = await building
+            finally:
+                if self._building is building:
+                    self._building = None
+        return self._snapshot
+
+    # --- Изменение ---
+
+    def _update_room(self, floor, number, values):
+        room_data = find_room(floor, number)
+        if room_data is None:
+            raise ApiError(404, f"Кабинет {number} на этаже {floor} не найден.")
+        errors = validate_changes(room_data, values, data_store["statuses"])
+        if errors:
+            raise ApiError(422, " ".join(errors))
+        changes = {field: value for field, value in values.items() if room_data.get(field) != value}
+        if changes:
+            self.apply_changes([(room_data, changes)], f"изменение кабинета {number} через API")
+        return {"room": _room_view(room_data, points=True), "changed": sorted(changes)}
+
+    async def update_room(self, floor, number, body, headers):
+        auth = headers.get("authorization", "")
+        if not auth.startswith("Bearer ") or not hmac.compare_digest(auth[7:].strip(), self.token):
+            raise ApiError(401, "Нужен заголовок Authorization: Bearer <токен>.")
+        try:
+            values = json.loads(body.decode("utf-8") or "{}")
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ApiError(400, "Тело запроса должно быть JSON-объектом.")
+        if not isinstance(values, dict) or not values:
+            raise ApiError(400, "Тело запроса должно быть непустым JSON-объектом.")
+        unknown = [field for field in values if field not in IMPORT_FIELDS]
+        if unknown:
+            raise ApiError(400, f"Эти поля нельзя менять: {', '.join(unknown)}.")
+        values = {field: "" if value is None else str(value) for field, value in values.items()}
+        return await self.run_in_model(lambda: self._update_room(floor, number, values))
+
+    # --- HTTP ---
+
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        query = parse_qs(url.query)
+        if parts[:1] != ["api"] or len(parts) < 2:
+            raise ApiError(404, "Неизвестный адрес.")
+        resource = parts[1]
+        if resource == "rooms" and len(parts) == 4:
+            if method == "PATCH":
+                return await self.update_room(parts[2], parts[3], body, headers)
+            if method == "GET":
+                return (await self.snapshot()).get_room(parts[2], parts[3])
+            raise ApiError(405, "Допустимы методы GET и PATCH.")
+        handlers = {
+            "building": Snapshot.get_building,
+            "floors": Snapshot.get_floors,
+            "statuses": Snapshot.get_statuses,
+            "rooms": Snapshot.get_rooms,
+            "search": Snapshot.search,
+            "counts": Snapshot.get_counts,
+        }
+        handler = handlers.get(resource) if len(parts) == 2 else None
+        if handler is None:
+            raise ApiError(404, "Неизвестный адрес.")
+        if method != "GET":
+            raise ApiError(405, "Допустим только метод GET.")
+        return handler(await self.snapshot(), query)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 413, {"error": "Слишком большие заголовки."}, False)
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Некорректная строка запроса."}, False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+                try:
+                    length = int(headers.get("content-length", "0"))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "Некорректный размер тела запроса."}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload = 200, await self.dispatch(method.upper(), target, headers, body)
+                except ApiError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    error_log("Ошибка API %s %s: %s", method, target, e)
+                    status, payload = 500, {"error": "Внутренняя ошибка сервера."}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        info_log("API запущен: http://%s:%s/api/", self.host, self.port)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+
+def _merge_external_changes():
+    """Без интерфейса: подхватывает изменения файла, сделанные приложением или скриптами."""
+    signature = data_manager._get_file_signature(data_manager.get_data_file_path())
+    if data_manager.is_external_change(signature):
+        disk, signature = data_manager.read_data_file()
+        data_manager.apply_external_changes(data_store, disk, signature)
+
+
+class _ModelDispatcher(QObject):
+    """Передает функции из потока сервера в поток интерфейса (очередь сигналов Qt)."""
+    call = Signal(object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.call.connect(self._run)
+
+    def _run(self, func, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+
+    async def run(self, func):
+        future = concurrent.futures.Future()
+        self.call.emit(func, future)
+        return await asyncio.wrap_future(future)
+
+
+class ApiThread(threading.Thread):
+    """
+    API внутри приложения: сервер работает в отдельном потоке со своим
+    циклом asyncio, а чтение среза и изменения выполняются в потоке интерфейса.
+    """
+
+    def __init__(self, window, port=DEFAULT_PORT):
+        super().__init__(name="stroycent-api", daemon=True)
+        self.dispatcher = _ModelDispatcher()
+        self.server = ApiServer(port, run_in_model=self.dispatcher.run,
+                                apply_changes=window.apply_room_changes)
+        self.started = threading.Event()
+        self.error = None
+
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        try:
+            await self.server.start()
+        except Exception as e:
+            self.error = e
+            self.started.set()
+            return
+        self.started.set()
+        async with self.server._server:
+            try:
+                await self.server._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def start_server(self, timeout=5):
+        """Запускает поток и ждет, пока сервер откроет порт. Ошибку запуска выбрасывает."""
+        self.server.install_callbacks()
+        self.start()
+        self.started.wait(timeout)
+        if self.error is not None:
+            self.server.remove_callbacks()
+            raise self.error
+
+    def stop(self):
+        self.server.remove_callbacks()
+        if self.server.loop is not None and self.server.loop.is_running():
+            self.server.loop.call_soon_threadsafe(self.server.close)
+        self.join(2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальный HTTP/JSON API StroyCent без интерфейса")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    server = ApiServer(args.port, check_external_changes=True)
+    server.install_callbacks()
+    print(f"API: http://{HOST}:{args.port}/api/ (токен: {get_token_file_path()})", flush=True)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        history_store.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
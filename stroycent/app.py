@@ -1,12 +1,26 @@
-import traceback
-from PySide6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,QGraphicsTextItem,QGraphicsPolygonItem, QGraphicsScene, QSizePolicy, QStatusBar, QLabel, QFileDialog
-from PySide6.QtGui import QPixmap, QPainter, QColor, QBrush, QFont
+from PySide6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,QGraphicsTextItem,QGraphicsPolygonItem, QGraphicsScene, QSizePolicy, QStatusBar, QLabel, QFileDialog, QMenu, QMessageBox, QComboBox, QInputDialog, QDockWidget
+from PySide6.QtGui import QPixmap, QPainter, QColor, QBrush, QFont, QShortcut, QKeySequence, QPen, QActionGroup
 from PySide6.QtCore import Qt, QPointF, QTimer
 from functools import partial
-from stroycent.graphics import DrawingGraphicsView, QPolygonF
-from stroycent.dialogs import RoomDialog, StatusEditorDialog, InstructionsDialog, ReportDialog
-from stroycent.data_manager import data_store, save_data
-from stroycent.utils import debug_log
+from stroycent.graphics import DrawingGraphicsView, QPolygonF, AnnotationLayerItem, ANNOTATION_LAYERS, MinimapWidget
+from stroycent.dialogs import (RoomDialog, StatusEditorDialog, InstructionsDialog, ReportDialog, PerfDialog,
+                               ExportDialog, ImportDialog, BulkEditPanel, DetectionDialog, OverviewDialog,
+                               SnapshotDialog, LedgerDialog, TimelinePanel)
+from stroycent import data_manager
+from stroycent.data_manager import (data_store, save_data, room_id, new_room_id, portfolio, get_building, building_floors,
+                                    floor_name, get_data_file_path)
+from stroycent.history import history_store, TRACKED_FIELDS, VACANT_STATUS_IDS
+from stroycent.statuses import status_index
+from stroycent.undo import (UndoStack, RoomCreatedCommand, RoomDeletedCommand, RoomPolygonCommand,
+                            RoomFieldsCommand, RoomsBatchCommand, RoomsCreatedCommand)
+from stroycent.watcher import DataFileWatcher
+from stroycent import assets
+from stroycent.geometry import normalize_polygon
+from stroycent.snapshots import SnapshotManager
+from stroycent.timeline import LeaseTimeline
+from stroycent.heatmap import HeatmapOverlay, MODES as HEATMAP_MODES
+from stroycent.utils import debug_log, error_log
+from stroycent.perf import timed
 import os
 
 class MainWindow(QMainWindow):
@@ -20,31 +34,76 @@ class MainWindow(QMainWindow):
         container = QWidget()
         main_layout = QVBoxLayout()
         
-        self.floor_buttons_layout = QHBoxLayout()
-        floor_names = ["Цокольный этаж", "1 этаж", "2 этаж", "3 этаж", "4 этаж", "5 этаж"]
-        self.floor_buttons = []
-        for i, name in enumerate(floor_names):
-            btn = QPushButton(name)
-            btn.setProperty("floor_index", i)
-            btn.clicked.connect(lambda checked, f=i: self.load_floor(f))
-            self.floor_buttons_layout.addWidget(btn)
-            self.floor_buttons.append(btn)
-        main_layout.addLayout(self.floor_buttons_layout)
+        # Навигатор: здание и этаж выбираются из списков, которые строятся по portfolio.json
+        navigator_layout = QHBoxLayout()
+        navigator_layout.addWidget(QLabel("Здание:"))
+        self.building_combo = QComboBox()
+        self.building_combo.setMinimumWidth(220)
+        self.building_combo.activated.connect(self.on_building_selected)
+        navigator_layout.addWidget(self.building_combo)
+        navigator_layout.addWidget(QLabel("Этаж:"))
+        self.floor_combo = QComboBox()
+        self.floor_combo.setMinimumWidth(180)
+        self.floor_combo.activated.connect(self.on_floor_selected)
+        navigator_layout.addWidget(self.floor_combo)
+        self.portfolio_btn = QPushButton("Здания и этажи")
+        self.portfolio_btn.setToolTip("Добавить или переименовать здание, добавить, переименовать или удалить этаж")
+        self.portfolio_btn.setMenu(self.build_portfolio_menu())
+        navigator_layout.addWidget(self.portfolio_btn)
+        navigator_layout.addStretch()
+        main_layout.addLayout(navigator_layout)
         
         self.scene = QGraphicsScene()
         self.view = DrawingGraphicsView(self.scene, self, parent=container)
         self.view.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
         self.view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         main_layout.addWidget(self.view)
+
+        # Миникарта этажа в прикрепляемой панели
+        self.minimap = MinimapWidget(self.view)
+        self.minimap_dock = QDockWidget("Обзор этажа", self)
+        self.minimap_dock.setObjectName("minimap_dock")
+        self.minimap_dock.setWidget(self.minimap)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.minimap_dock)
+
+        # Панель группового редактирования видна, когда выделены кабинеты
+        self.bulk_panel = BulkEditPanel(self)
+        self.bulk_panel.hide()
+        main_layout.addWidget(self.bulk_panel)
+        self.scene.selectionChanged.connect(self.on_selection_changed)
+
+        # Шкала времени: кабинеты, сданные на выбранную дату
+        self.timeline = LeaseTimeline()
+        # Тепловая карта простоя и сроков аренды (режим выбирается в меню «Слои»)
+        self.heatmap = HeatmapOverlay()
+        self.timeline_panel = TimelinePanel(self)
+        self.timeline_panel.date_changed.connect(self.set_timeline_date)
+        main_layout.addWidget(self.timeline_panel)
         
         controls_layout = QHBoxLayout()
+
+        self.undo_stack = UndoStack(parent=self)
+        self.undo_btn = QPushButton("Отменить")
+        self.undo_btn.setToolTip("Отменить последнее действие (Ctrl+Z)")
+        self.undo_btn.clicked.connect(self.undo)
+        self.redo_btn = QPushButton("Повторить")
+        self.redo_btn.setToolTip("Повторить отмененное действие (Ctrl+Shift+Z)")
+        self.redo_btn.clicked.connect(self.redo)
+        controls_layout.addWidget(self.undo_btn)
+        controls_layout.addWidget(self.redo_btn)
+        QShortcut(QKeySequence.Undo, self, activated=self.undo)
+        QShortcut(QKeySequence.Redo, self, activated=self.redo)
+        QShortcut(QKeySequence(Qt.Key_F12), self, activated=self.toggle_perf_dialog)
+        self.perf_dialog = None
+        self.undo_stack.changed.connect(self.update_undo_buttons)
+        self.update_undo_buttons()
         
         zoom_in_btn = QPushButton("Увеличить")
         zoom_in_btn.setToolTip("Увеличить")
-        zoom_in_btn.clicked.connect(lambda: self.view.scale(1.2, 1.2))
+        zoom_in_btn.clicked.connect(lambda: self.view.zoom_by(1.2, animated=True))
         zoom_out_btn = QPushButton("Уменьшить")
         zoom_out_btn.setToolTip("Уменьшить")
-        zoom_out_btn.clicked.connect(lambda: self.view.scale(0.8, 0.8))
+        zoom_out_btn.clicked.connect(lambda: self.view.zoom_by(0.8, animated=True))
         controls_layout.addWidget(zoom_in_btn)
         controls_layout.addWidget(zoom_out_btn)
 
@@ -58,7 +117,22 @@ class MainWindow(QMainWindow):
         self.add_room_btn.clicked.connect(self.start_drawing)
 
         controls_layout.addWidget(self.add_room_btn)
+
+        self.detect_rooms_btn = QPushButton("Найти кабинеты")
+        self.detect_rooms_btn.setToolTip("Найти замкнутые помещения на плане и предложить их как кабинеты")
+        self.detect_rooms_btn.clicked.connect(self.open_detection_dialog)
+        controls_layout.addWidget(self.detect_rooms_btn)
+        self.detection_dialog = None
+        self.candidate_items = []
         
+        self.layers_btn = QPushButton("Слои")
+        self.layers_btn.setToolTip("Показать/скрыть слои пометок и добавить пометки на план")
+        self.layers_btn.setMenu(self.build_layers_menu())
+        self.layers_btn.menu().addSeparator()
+        self.layers_btn.menu().addAction(self.minimap_dock.toggleViewAction())
+        self.layers_btn.menu().addMenu(self.build_heatmap_menu())
+        controls_layout.addWidget(self.layers_btn)
+
         self.upload_plan_btn = QPushButton("Загрузить план")
         self.upload_plan_btn.setToolTip("Загрузить новый план этажа")
         self.upload_plan_btn.clicked.connect(self.upload_plan)
@@ -80,6 +154,40 @@ class MainWindow(QMainWindow):
         self.report_btn.clicked.connect(self.open_report_dialog)
         controls_layout.addWidget(self.report_btn)
 
+        self.overview_btn = QPushButton("Обзор здания")
+        self.overview_btn.setToolTip("Миниатюры всех этажей с количеством кабинетов по статусам")
+        self.overview_btn.clicked.connect(self.open_overview_dialog)
+        controls_layout.addWidget(self.overview_btn)
+        self.overview_dialog = None
+
+        self.export_btn = QPushButton("Экспорт")
+        self.export_btn.setToolTip("Сохранить планы этажей в PDF или PNG")
+        self.export_btn.clicked.connect(self.open_export_dialog)
+        controls_layout.addWidget(self.export_btn)
+        self.export_dialog = None
+
+        self.import_btn = QPushButton("Импорт")
+        self.import_btn.setToolTip("Загрузить данные арендаторов из CSV или XLSX")
+        self.import_btn.clicked.connect(self.open_import_dialog)
+        controls_layout.addWidget(self.import_btn)
+
+        self.snapshots_btn = QPushButton("Снимки")
+        self.snapshots_btn.setToolTip("Резервные снимки данных здания и восстановление")
+        self.snapshots_btn.clicked.connect(self.open_snapshot_dialog)
+        controls_layout.addWidget(self.snapshots_btn)
+
+        self.ledger_btn = QPushButton("Платежи")
+        self.ledger_btn.setToolTip("Начисления, оплаты, задолженность и потери от простоя")
+        self.ledger_btn.clicked.connect(self.open_ledger_dialog)
+        controls_layout.addWidget(self.ledger_btn)
+
+        self.api_btn = QPushButton("API")
+        self.api_btn.setCheckable(True)
+        self.api_btn.setToolTip("Локальный HTTP/JSON API для скриптов (только 127.0.0.1)")
+        self.api_btn.toggled.connect(self.toggle_api)
+        controls_layout.addWidget(self.api_btn)
+        self.api_thread = None
+
         main_layout.addLayout(controls_layout)
         
         self.status = QStatusBar()
@@ -102,16 +210,144 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(container)
         
         self.view.drawing_finished.connect(self.finish_drawing)
+        self.view.point_picked.connect(self.add_marker)
+        self.view.zoom_changed.connect(self.ensure_plan_resolution)
+        self.view.zoom.gesture_finished.connect(self.ensure_plan_resolution)
         
-        self.current_floor = 0
+        self.current_floor = None
         self.editing_room_data = None
         self.is_adding_mode = False
         self.is_editing_mode = False
-        self.floor_item = None
-        self.room_items = {} # Словарь для хранения ссылок на графические объекты
+        self.room_items = {} # Графические объекты кабинетов по постоянному идентификатору (room_id)
+        self.layer_items = {} # Слои пометок текущего этажа: ключ слоя -> AnnotationLayerItem
+        self.pending_marker_layer = None
+        self.pending_route_layer = None
+
+        # Отслеживание изменений файла данных другими процессами
+        self.data_watcher = DataFileWatcher(self)
+        self.data_watcher.data_changed.connect(self.apply_external_changes)
+        self.data_watcher.plan_changed.connect(self.reload_plan_image)
+
+        # Уменьшенные копии планов создаются в фоне
+        self.rendition_worker = assets.RenditionWorker(self)
+        self.rendition_worker.ready.connect(self.on_plan_rendition_ready)
+
+        # Снимки файла данных по таймеру, в фоне
+        self.snapshot_manager = SnapshotManager(self)
         
+        self.populate_navigator()
+
         # Загружаем первый этаж сразу, чтобы план был виден при запуске
-        self.load_floor(0) 
+        self.load_floor(self.first_floor_key())
+
+        # STROYCENT_API_PORT включает API при запуске
+        if os.environ.get("STROYCENT_API_PORT"):
+            self.api_btn.setChecked(True)
+
+    # --- Навигация по зданиям и этажам ---
+
+    def build_portfolio_menu(self):
+        menu = QMenu(self)
+        menu.addAction("Добавить здание...", self.add_building)
+        menu.addAction("Переименовать здание...", self.rename_building)
+        menu.addSeparator()
+        menu.addAction("Добавить этаж...", self.add_floor)
+        menu.addAction("Переименовать этаж...", self.rename_floor)
+        menu.addAction("Удалить этаж", self.remove_floor)
+        return menu
+
+    def populate_navigator(self):
+        """Заполняет списки зданий и этажей по манифесту, не читая файлы других зданий."""
+        building = get_building()
+        self.setWindowTitle(f"План здания — {building['name']}")
+        self.building_combo.clear()
+        for entry in portfolio["buildings"]:
+            self.building_combo.addItem(entry["name"], entry["id"])
+        self.building_combo.setCurrentIndex(self.building_combo.findData(building["id"]))
+        self.floor_combo.clear()
+        for floor in building_floors():
+            self.floor_combo.addItem(floor["name"], floor["key"])
+        self.set_active_floor(self.current_floor)
+
+    def first_floor_key(self):
+        floors = building_floors()
+        return floors[0]["key"] if floors else "0"
+
+    def on_building_selected(self, index):
+        building_id = self.building_combo.itemData(index)
+        if building_id != portfolio["current"]:
+            self.switch_building(building_id)
+
+    def on_floor_selected(self, index):
+        floor_key = self.floor_combo.itemData(index)
+        if floor_key is not None and floor_key != self.current_floor:
+            self.load_floor(floor_key)
+
+    def switch_building(self, building_id):
+        """Загружает данные выбранного здания и показывает его первый этаж."""
+        self.reset_drawing_state()
+        data_manager.switch_building(building_id)
+        # Команды отмены ссылаются на кабинеты предыдущего здания
+        self.undo_stack.clear()
+        self.data_watcher.set_data_file(get_data_file_path())
+        self.current_floor = None
+        self.populate_navigator()
+        self.update_legend()
+        self.load_floor(self.first_floor_key())
+
+    def add_building(self):
+        name, ok = QInputDialog.getText(self, "Новое здание", "Название здания:")
+        if not ok or not name.strip():
+            return
+        floor_count, ok = QInputDialog.getInt(self, "Новое здание", "Количество этажей:", 1, 1, 200)
+        if not ok:
+            return
+        building = data_manager.add_building(name.strip(), floor_count)
+        self.switch_building(building["id"])
+        self.status.showMessage(f"Добавлено здание «{building['name']}».")
+
+    def rename_building(self):
+        building = get_building()
+        name, ok = QInputDialog.getText(self, "Переименовать здание", "Название здания:", text=building["name"])
+        if ok and name.strip():
+            data_manager.rename_building(building["id"], name.strip())
+            self.populate_navigator()
+
+    def add_floor(self):
+        name, ok = QInputDialog.getText(self, "Новый этаж", "Название этажа:")
+        if ok and name.strip():
+            floor_key = data_manager.add_floor(name.strip())
+            self.populate_navigator()
+            self.load_floor(floor_key)
+
+    def rename_floor(self):
+        name, ok = QInputDialog.getText(self, "Переименовать этаж", "Название этажа:",
+                                        text=floor_name(self.current_floor))
+        if ok and name.strip():
+            data_manager.rename_floor(self.current_floor, name.strip())
+            self.populate_navigator()
+            self.status.showMessage(f"Выбран: {floor_name(self.current_floor)}")
+
+    def remove_floor(self):
+        """Удаляет текущий этаж, если на нем нет кабинетов."""
+        if len(building_floors()) <= 1:
+            self.status.showMessage("В здании должен остаться хотя бы один этаж.")
+            return
+        floor_data = data_store["floors"].get(self.current_floor, {})
+        if floor_data.get("rooms"):
+            QMessageBox.warning(self, "Ошибка", "На этаже есть кабинеты. Удалите их перед удалением этажа.")
+            return
+        name = floor_name(self.current_floor)
+        answer = QMessageBox.question(self, "Подтверждение", f"Удалить этаж «{name}»?")
+        if answer != QMessageBox.Yes:
+            return
+        if data_store["floors"].pop(self.current_floor, None) is not None:
+            save_data(data_store)
+        data_manager.remove_floor(self.current_floor)
+        self.current_floor = None
+        self.populate_navigator()
+        self.load_floor(self.first_floor_key())
+        self.status.showMessage(f"Этаж «{name}» удален.")
 
     def open_instructions_dialog(self):
         """Открывает модальное окно с инструкцией."""
@@ -123,6 +359,211 @@ class MainWindow(QMainWindow):
         dlg = ReportDialog(self)
         dlg.exec()
 
+    def open_import_dialog(self):
+        """Открывает окно массового импорта данных арендаторов."""
+        if self.view.is_drawing:
+            self.status.showMessage("Завершите рисование перед импортом.")
+            return
+        dlg = ImportDialog(self)
+        dlg.exec()
+
+    def open_export_dialog(self):
+        """Открывает немодальное окно экспорта; экспорт идет в фоне."""
+        if self.export_dialog is None or self.export_dialog.task is None:
+            if self.export_dialog is not None:
+                self.export_dialog.deleteLater()
+            # Окно строится заново: список этажей зависит от текущего здания
+            self.export_dialog = ExportDialog(self)
+        self.export_dialog.show()
+        self.export_dialog.raise_()
+
+    def open_overview_dialog(self):
+        """Открывает немодальное окно обзора всех этажей здания."""
+        if self.overview_dialog is None:
+            self.overview_dialog = OverviewDialog(self)
+        self.overview_dialog.refresh()
+        self.overview_dialog.show()
+        self.overview_dialog.raise_()
+
+    def open_snapshot_dialog(self):
+        """Открывает окно снимков данных текущего здания."""
+        if self.view.is_drawing:
+            self.status.showMessage("Завершите рисование перед работой со снимками.")
+            return
+        dlg = SnapshotDialog(self)
+        dlg.exec()
+
+    def open_ledger_dialog(self):
+        """Открывает окно журнала платежей текущего здания."""
+        dlg = LedgerDialog(self)
+        dlg.exec()
+
+    def restore_snapshot_data(self, data):
+        """Заменяет данные здания данными снимка и показывает их."""
+        self.reset_drawing_state()
+        self.close_detection_dialog()
+        data_manager.replace_data(data)
+        # Команды отмены ссылаются на кабинеты до восстановления
+        self.undo_stack.clear()
+        floor = self.current_floor
+        self.current_floor = None
+        self.populate_navigator()
+        self.update_legend()
+        known = {entry["key"] for entry in building_floors()}
+        self.load_floor(floor if floor in known else self.first_floor_key())
+        self.status.showMessage("Данные восстановлены из снимка.")
+
+    def open_detection_dialog(self):
+        """Запускает поиск кабинетов на плане текущего этажа."""
+        if self.view.is_drawing:
+            self.status.showMessage("Завершите рисование перед поиском кабинетов.")
+            return
+        source = self.detection_source()
+        if source is None:
+            self.status.showMessage("Сначала загрузите план этажа.")
+            return
+        self.close_detection_dialog()
+        self.detection_dialog = DetectionDialog(self, *source)
+        self.detection_dialog.show()
+
+    def close_detection_dialog(self):
+        if self.detection_dialog is not None:
+            self.detection_dialog.close()
+            self.detection_dialog.deleteLater()
+            self.detection_dialog = None
+
+    def detection_source(self):
+        """Файл плана текущего этажа и размер плана для поиска кабинетов."""
+        floor_data = data_store["floors"].get(str(self.current_floor), {})
+        asset = floor_data.get("plan_asset")
+        if asset and os.path.exists(assets.original_path(asset)):
+            return assets.original_path(asset), floor_data.get("plan_size")
+        img_path = floor_data.get("plan_path")
+        if img_path and os.path.exists(img_path):
+            return img_path, None
+        return None
+
+    def show_room_candidates(self, candidates):
+        """Рисует найденные контуры пунктиром поверх плана."""
+        self.clear_room_candidates()
+        for candidate in candidates:
+            item = QGraphicsPolygonItem(QPolygonF([QPointF(x, y) for x, y in candidate["points"]]))
+            item.setAcceptedMouseButtons(Qt.NoButton)
+            item.setZValue(10)
+            self.scene.addItem(item)
+            self.candidate_items.append(item)
+            self.set_candidate_checked(len(self.candidate_items) - 1, True)
+
+    def set_candidate_checked(self, index, checked, current=False):
+        """Отмеченные кандидаты — зеленые, отклоненные — серые, текущий — с толстой рамкой."""
+        color = QColor("#2E7D32") if checked else QColor("#9E9E9E")
+        pen = QPen(color, 6 if current else 3, Qt.DashLine)
+        pen.setCosmetic(True)
+        fill = QColor(color)
+        fill.setAlpha(60 if checked else 20)
+        item = self.candidate_items[index]
+        item.setPen(pen)
+        item.setBrush(QBrush(fill))
+
+    def clear_room_candidates(self):
+        for item in self.candidate_items:
+            if item.scene() is self.scene:
+                self.scene.removeItem(item)
+        self.candidate_items = []
+
+    def add_detected_rooms(self, polygons):
+        """
+        Добавляет принятые контуры как новые свободные кабинеты текущего этажа
+        одной операцией: одно сохранение и одна команда в истории отмены.
+        """
+        if not polygons:
+            return
+        floor_data = data_store["floors"].setdefault(str(self.current_floor), {"rooms": []})
+        number = self.get_next_room_number()
+        rooms = []
+        for points in polygons:
+            room_data = {
+                "id": new_room_id(),
+                "number": str(number),
+                "floor": str(self.current_floor),
+                "status": "свободный",
+                "points": normalize_polygon(points),
+                "renter_name": ""
+            }
+            number += 1
+            floor_data["rooms"].append(room_data)
+            history_store.record_created(room_data)
+            rooms.append(room_data)
+        save_data(data_store)
+        self.undo_stack.push(RoomsCreatedCommand(rooms, f"добавление найденных кабинетов ({len(rooms)})"))
+        for room_data in rooms:
+            self.add_room_to_scene(room_data)
+        self.update_legend()
+        self.status.showMessage(f"Добавлено кабинетов: {len(rooms)}.")
+
+    def toggle_api(self, enabled):
+        """Запускает или останавливает локальный API в отдельном потоке."""
+        if not enabled:
+            if self.api_thread is not None:
+                self.api_thread.stop()
+                self.api_thread = None
+            self.status.showMessage("API остановлен.")
+            return
+        # asyncio и сервер API загружаются только при включении API
+        from stroycent import api
+        port = int(os.environ.get("STROYCENT_API_PORT") or api.DEFAULT_PORT)
+        self.api_thread = api.ApiThread(self, port=port)
+        try:
+            self.api_thread.start_server()
+        except OSError as e:
+            self.api_thread = None
+            self.api_btn.blockSignals(True)
+            self.api_btn.setChecked(False)
+            self.api_btn.blockSignals(False)
+            self.status.showMessage(f"Не удалось запустить API на порту {port}: {e}")
+            return
+        self.status.showMessage(f"API: http://127.0.0.1:{self.api_thread.server.port}/api/ "
+                                f"(токен для изменений: {api.get_token_file_path()})")
+
+    def closeEvent(self, event):
+        if self.api_thread is not None:
+            self.api_thread.stop()
+            self.api_thread = None
+        self.snapshot_manager.shutdown()
+        super().closeEvent(event)
+
+    def toggle_perf_dialog(self):
+        """Показывает или скрывает окно замеров производительности (F12)."""
+        if self.perf_dialog is None:
+            self.perf_dialog = PerfDialog(self)
+        self.perf_dialog.setVisible(not self.perf_dialog.isVisible())
+
+    def update_undo_buttons(self):
+        self.undo_btn.setEnabled(self.undo_stack.can_undo())
+        self.redo_btn.setEnabled(self.undo_stack.can_redo())
+
+    def undo(self):
+        """Отменяет последнее действие без перезагрузки этажа."""
+        if self.view.is_drawing:
+            self.status.showMessage("Завершите рисование перед отменой действия.")
+            return
+        command = self.undo_stack.undo(self)
+        if command:
+            save_data(data_store)
+            self.update_legend()
+            self.status.showMessage(f"Отменено: {command.description}")
+
+    def redo(self):
+        """Повторяет отмененное действие без перезагрузки этажа."""
+        if self.view.is_drawing:
+            self.status.showMessage("Завершите рисование перед повтором действия.")
+            return
+        command = self.undo_stack.redo(self)
+        if command:
+            save_data(data_store)
+            self.update_legend()
+            self.status.showMessage(f"Повторено: {command.description}")
+
     def reset_drawing_state(self):
         """Сбрасывает состояние рисования в главном окне."""
         self.is_adding_mode = False
@@ -130,7 +571,10 @@ class MainWindow(QMainWindow):
         self.add_room_btn.setText("Добавить кабинет")
         self.status.showMessage("")
         self.editing_room_data = None
+        self.pending_marker_layer = None
+        self.pending_route_layer = None
         self.view.stop_drawing_mode()
+        self.view.stop_point_picking()
 
     def resizeEvent(self, event):
         """
@@ -141,9 +585,10 @@ class MainWindow(QMainWindow):
 
     def fit_plan_to_view(self):
         """Автоматически масштабирует план так, чтобы он вписывался в виджет."""
-        # Убеждаемся, что у нас есть элемент для масштабирования
-        if self.floor_item and self.view.rect().size().isValid():
-            self.view.fitInView(self.floor_item, Qt.KeepAspectRatio)
+        # Убеждаемся, что у нас есть план для масштабирования
+        if self.view.plan_pixmap and self.view.rect().size().isValid():
+            self.view.fitInView(self.view.plan_rect(), Qt.KeepAspectRatio)
+            self.ensure_plan_resolution()
 
     def start_drawing(self):
         if self.is_adding_mode or self.is_editing_mode or self.view.is_drawing:
@@ -151,6 +596,7 @@ class MainWindow(QMainWindow):
             return
         self.is_adding_mode = True
         self.is_editing_mode = False
+        self.scene.clearSelection()
         self.view.start_drawing_mode()
         self.add_room_btn.setText("Рисуем... (правый клик - готово)")
         self.status.showMessage("Кликните левой кнопкой мыши, чтобы добавить точки полигона. Правый клик завершает рисование.")
@@ -169,84 +615,328 @@ class MainWindow(QMainWindow):
         """
         Обрабатывает завершение рисования, создавая или обновляя полигон.
         """
+        if self.pending_route_layer:
+            self.finish_route(points)
+            return
         try:
-            if self.is_editing_mode and self.editing_room_data:
+            # Координаты mapToScene хранятся с округлением и без лишних вершин
+            new_points = normalize_polygon([[p.x(), p.y()] for p in points])
+            if len(new_points) < 3:
+                new_points = [[p.x(), p.y()] for p in points]
+            is_new_room = not (self.is_editing_mode and self.editing_room_data)
+            if not is_new_room:
                 room_data_to_save = self.editing_room_data
-                room_data_to_save["points"] = [[p.x(), p.y()] for p in points]
+                old_points = room_data_to_save.get("points", [])
+                room_data_to_save["points"] = new_points
+                command = RoomPolygonCommand(room_data_to_save, old_points)
             else:
                 room_number = str(self.get_next_room_number())
                 room_data_to_save = {
+                    "id": new_room_id(),
                     "number": room_number,
                     "floor": str(self.current_floor),
                     "status": "свободный",
-                    "points": [[p.x(), p.y()] for p in points],
+                    "points": new_points,
                     "renter_name": ""
                 }
                 floor_data = data_store["floors"].setdefault(str(self.current_floor), {"rooms": []})
                 floor_data["rooms"].append(room_data_to_save)
+                history_store.record_created(room_data_to_save)
+                command = RoomCreatedCommand(room_data_to_save)
 
             save_data(data_store)
+            self.undo_stack.push(command)
             
             self.reset_drawing_state()
+            if is_new_room:
+                self.add_room_to_scene(room_data_to_save)
+                self.update_legend()
+            else:
+                self.update_room_geometry(room_data_to_save)
             self.status.showMessage("Готово. Вы можете продолжить рисование.")
-            self.load_floor(self.current_floor) # Полная перезагрузка для чистоты
 
         except Exception as e:
             self.status.showMessage(f"Ошибка при завершении рисования: {e}")
-            debug_log(f"Ошибка при завершении рисования: {traceback.format_exc()}")
+            error_log("Ошибка при завершении рисования")
         
+    @timed("load_floor")
     def load_floor(self, floor):
         """
         Загружает изображение этажа и рисует на нем полигоны.
         """
         try:
-            debug_log(f"Загрузка этажа {floor}")
+            debug_log("Загрузка этажа %s", floor)
             
             # Сбрасываем состояние рисования перед загрузкой нового этажа
             self.reset_drawing_state()
+            # Найденные контуры относятся к прежнему этажу
+            self.close_detection_dialog()
             
+            self.view.forget_scene_items()
             self.scene.clear()
             self.room_items.clear()
+            floor = str(floor)
             self.current_floor = floor
             
-            floor_data = data_store["floors"].setdefault(str(floor), {"rooms": []})
-            img_path = floor_data.get("plan_path")
-            
-            pixmap = None
-            if img_path and os.path.exists(img_path):
-                debug_log(f"Файл найден: {img_path}")
-                pixmap = QPixmap(img_path)
-            
-            if not pixmap or pixmap.isNull():
-                debug_log("Файл не найден или ошибка загрузки, создаем заглушку")
-                pixmap = QPixmap(1000, 800)
-                pixmap.fill(Qt.lightGray)
-            
-            self.floor_item = self.scene.addPixmap(pixmap)
+            floor_data = data_store["floors"].setdefault(floor, {"rooms": []})
+            self.timeline.set_rooms(floor_data["rooms"])
+            self.heatmap.set_rooms(floor_data["rooms"])
+            self.view.set_plan_pixmap(*self.load_plan_pixmap(floor_data))
+            self.minimap.clear_rooms()
+            self.update_minimap_plan(floor_data)
             
             QTimer.singleShot(0, self.fit_plan_to_view)
 
-            self.set_active_floor_button(floor)
-            floor_names = ["Цокольный этаж", "1 этаж", "2 этаж", "3 этаж", "4 этаж", "5 этаж"]
-            self.status.showMessage(f"Выбран: {floor_names[floor]}")
+            self.set_active_floor(floor)
+            self.status.showMessage(f"Выбран: {floor_name(floor)}")
 
             for room_data in floor_data["rooms"]:
                 if 'points' in room_data:
                     self.draw_room_polygon(room_data)
                 else:
-                    debug_log(f"Пропущено некорректное помещение без данных о полигоне: {room_data}")
+                    debug_log("Пропущено некорректное помещение без данных о полигоне: %s", room_data)
+
+            self.draw_annotation_layers(floor_data)
+            self.update_timeline_label()
+            if self.heatmap.mode:
+                self.update_legend()
                 
         except Exception as e:
             self.status.showMessage(f"Ошибка при загрузке этажа: {e}")
-            debug_log(f"Ошибка при загрузке этажа: {traceback.format_exc()}")
+            error_log("Ошибка при загрузке этажа")
 
-    def set_active_floor_button(self, floor_index):
-        """Устанавливает стиль для активной кнопки этажа."""
-        for i, btn in enumerate(self.floor_buttons):
-            if i == floor_index:
-                btn.setStyleSheet("background-color: #5c5c5c; color: #f7f7f7; font-weight: bold;")
-            else:
-                btn.setStyleSheet("background-color: #f7f7f7; color: #3c3c3c;")
+    def load_plan_pixmap(self, floor_data):
+        """
+        Загружает изображение плана этажа или создает заглушку.
+        Для плана из хранилища берется наименьшая копия, которой достаточно
+        для текущего размера окна. Возвращает (изображение, размер оригинала).
+        """
+        img_path = floor_data.get("plan_path")
+        if img_path and not floor_data.get("plan_asset") and os.path.exists(img_path):
+            self.import_legacy_plan(floor_data)
+        asset = floor_data.get("plan_asset")
+        self.data_watcher.watch_plan(None if asset else img_path)
+
+        pixmap = None
+        plan_size = None
+        if asset and os.path.exists(assets.original_path(asset)):
+            plan_size = floor_data.get("plan_size") or assets.image_size(assets.original_path(asset))
+            img_path, _ = assets.best_plan_file(asset, plan_size, self.required_plan_pixels(plan_size))
+            self.rendition_worker.request(asset, plan_size)
+        if img_path and os.path.exists(img_path):
+            debug_log("Файл найден: %s", img_path)
+            pixmap = QPixmap(img_path)
+
+        if not pixmap or pixmap.isNull():
+            debug_log("Файл не найден или ошибка загрузки, создаем заглушку")
+            pixmap = QPixmap(1000, 800)
+            pixmap.fill(Qt.lightGray)
+            plan_size = None
+        return pixmap, plan_size
+
+    def import_legacy_plan(self, floor_data):
+        """Переносит план, заданный абсолютным путем, в хранилище планов."""
+        try:
+            asset, plan_size = assets.import_plan(floor_data["plan_path"])
+        except Exception:
+            error_log("Не удалось перенести план %s в хранилище", floor_data["plan_path"])
+            return
+        floor_data["plan_asset"] = asset
+        floor_data["plan_size"] = plan_size
+        floor_data.pop("plan_path", None)
+        save_data(data_store)
+
+    def required_plan_pixels(self, plan_size):
+        """Сколько пикселей по длинной стороне плана нужно при текущем масштабе."""
+        if not plan_size or min(plan_size) <= 0:
+            return 0
+        viewport = self.view.viewport().size()
+        fit_scale = min(viewport.width() / plan_size[0], viewport.height() / plan_size[1])
+        scale = max(abs(self.view.transform().m11()), fit_scale)
+        return max(plan_size) * scale * self.view.devicePixelRatioF()
+
+    def ensure_plan_resolution(self):
+        """При увеличении заменяет копию плана на более подробную, если она нужна."""
+        if self.view.zoom.active:
+            # Подробная копия загружается после жеста, чтобы не прерывать анимацию
+            return
+        floor_data = data_store["floors"].get(str(self.current_floor), {})
+        asset = floor_data.get("plan_asset")
+        pixmap = self.view.plan_pixmap
+        if not asset or not pixmap or not floor_data.get("plan_size"):
+            return
+        plan_size = floor_data["plan_size"]
+        loaded = max(pixmap.width(), pixmap.height())
+        if loaded >= min(self.required_plan_pixels(plan_size), max(plan_size)):
+            return
+        path, size = assets.best_plan_file(asset, plan_size, self.required_plan_pixels(plan_size))
+        if size > loaded:
+            debug_log("Загружается более подробная копия плана: %s", path)
+            self.view.set_plan_pixmap(QPixmap(path), plan_size)
+
+    def on_plan_rendition_ready(self, asset):
+        if data_store["floors"].get(str(self.current_floor), {}).get("plan_asset") == asset:
+            self.reload_plan_image()
+
+    def reload_plan_image(self, *args):
+        """Обновляет изображение плана текущего этажа, не трогая кабинеты."""
+        floor_data = data_store["floors"].get(str(self.current_floor), {})
+        self.view.set_plan_pixmap(*self.load_plan_pixmap(floor_data))
+        self.update_minimap_plan(floor_data)
+
+    def update_minimap_plan(self, floor_data):
+        """Миникарта строится по миниатюре плана из хранилища, если она уже есть."""
+        asset = floor_data.get("plan_asset")
+        pixmap = self.view.plan_pixmap
+        if asset and os.path.exists(assets.thumbnail_path(asset)):
+            pixmap = QPixmap(assets.thumbnail_path(asset))
+        self.minimap.set_plan(pixmap, self.view.plan_size)
+
+    def build_layers_menu(self):
+        """Меню слоев: видимость каждого слоя и добавление пометок."""
+        menu = QMenu(self)
+        self.layer_visibility = {}
+        for layer_key, layer in ANNOTATION_LAYERS.items():
+            action = menu.addAction(layer["name"])
+            action.setCheckable(True)
+            action.setChecked(True)
+            action.toggled.connect(partial(self.toggle_layer, layer_key))
+            self.layer_visibility[layer_key] = True
+        menu.addSeparator()
+        for layer_key, layer in ANNOTATION_LAYERS.items():
+            action = menu.addAction(f"Добавить: {layer['name']}")
+            action.triggered.connect(partial(self.start_annotation, layer_key))
+        return menu
+
+    def build_heatmap_menu(self):
+        """Подменю тепловой карты: режимы взаимоисключающие."""
+        menu = QMenu("Тепловая карта", self)
+        group = QActionGroup(menu)
+        for mode, title in [(None, "Выключена")] + [(key, value["name"]) for key, value in HEATMAP_MODES.items()]:
+            action = menu.addAction(title)
+            action.setCheckable(True)
+            action.setChecked(mode is None)
+            action.triggered.connect(partial(self.set_heatmap_mode, mode))
+            group.addAction(action)
+        return menu
+
+    @timed("set_heatmap_mode")
+    def set_heatmap_mode(self, mode, checked=True):
+        """Включает или выключает тепловую карту: меняются только кисти кабинетов, сцена не перестраивается."""
+        self.heatmap.set_mode(mode)
+        self.heatmap.refresh()
+        for room_data in self.timeline.rooms:
+            self.set_room_colors(room_data)
+        self.update_legend()
+
+    def toggle_layer(self, layer_key, visible):
+        """Показывает или скрывает слой, не затрагивая остальные элементы сцены."""
+        self.layer_visibility[layer_key] = visible
+        item = self.layer_items.get(layer_key)
+        if item:
+            item.setVisible(visible)
+
+    def floor_annotations(self, layer_key, floor=None):
+        """Список пометок слоя на этаже (хранится в данных этажа)."""
+        floor_data = data_store["floors"].setdefault(str(self.current_floor if floor is None else floor), {"rooms": []})
+        return floor_data.setdefault("layers", {}).setdefault(layer_key, {"items": []})["items"]
+
+    def draw_annotation_layers(self, floor_data):
+        self.layer_items = {}
+        layers = floor_data.get("layers", {})
+        for layer_key in ANNOTATION_LAYERS:
+            item = AnnotationLayerItem(layer_key, layers.get(layer_key, {}).get("items", []),
+                                       on_remove=self.remove_annotation)
+            item.setVisible(self.layer_visibility[layer_key])
+            self.scene.addItem(item)
+            self.layer_items[layer_key] = item
+
+    def refresh_layer(self, layer_key):
+        item = self.layer_items.get(layer_key)
+        if item:
+            floor_layers = data_store["floors"].get(str(self.current_floor), {}).get("layers", {})
+            item.set_annotations(floor_layers.get(layer_key, {}).get("items", []))
+
+    def start_annotation(self, layer_key):
+        if self.is_adding_mode or self.is_editing_mode or self.view.is_drawing:
+            self.status.showMessage("Завершите текущее действие перед добавлением пометки.")
+            return
+        name = ANNOTATION_LAYERS[layer_key]["name"]
+        if not self.layer_visibility[layer_key]:
+            self.toggle_layer(layer_key, True)
+        if layer_key == "cabling":
+            self.pending_route_layer = layer_key
+            self.view.start_drawing_mode(min_points=2, closed=False)
+            self.status.showMessage(f"{name}: кликните точки трассы. Правый клик завершает трассу.")
+        else:
+            self.pending_marker_layer = layer_key
+            self.view.start_point_picking()
+            self.status.showMessage(f"{name}: кликните на плане, чтобы поставить отметку.")
+
+    def add_marker(self, pos):
+        layer_key = self.pending_marker_layer
+        self.pending_marker_layer = None
+        if not layer_key:
+            return
+        self.floor_annotations(layer_key).append({"kind": "marker", "pos": [pos.x(), pos.y()]})
+        save_data(data_store)
+        self.refresh_layer(layer_key)
+        self.status.showMessage(f"Отметка добавлена: {ANNOTATION_LAYERS[layer_key]['name']}")
+
+    def finish_route(self, points):
+        layer_key = self.pending_route_layer
+        self.floor_annotations(layer_key).append({"kind": "route", "points": [[p.x(), p.y()] for p in points]})
+        save_data(data_store)
+        self.reset_drawing_state()
+        self.refresh_layer(layer_key)
+        self.status.showMessage(f"Трасса добавлена: {ANNOTATION_LAYERS[layer_key]['name']}")
+
+    def remove_annotation(self, layer_key, annotation):
+        """Удаляет пометку по правому клику после подтверждения."""
+        if self.view.is_drawing:
+            return
+        answer = QMessageBox.question(self, "Подтверждение",
+                                      f"Удалить пометку слоя «{ANNOTATION_LAYERS[layer_key]['name']}»?")
+        if answer != QMessageBox.Yes:
+            return
+        annotations = self.floor_annotations(layer_key)
+        for i, item in enumerate(annotations):
+            if item is annotation:
+                annotations.pop(i)
+                break
+        save_data(data_store)
+        self.refresh_layer(layer_key)
+
+    def apply_external_changes(self, changes):
+        """
+        Применяет к сцене изменения файла данных, сделанные другим процессом:
+        перерисовываются только изменившиеся кабинеты текущего этажа.
+        """
+        for room_data in changes["removed"].values():
+            self.remove_room_from_scene(room_data)
+        if changes["updated"]:
+            for room_data in data_store["floors"].get(str(self.current_floor), {}).get("rooms", []):
+                if room_id(room_data) in changes["updated"] and room_data is not self.editing_room_data:
+                    self.update_room_geometry(room_data, refresh_legend=False)
+        if changes["floors"] and data_manager.sync_building_floors(data_store):
+            # Другой процесс добавил этажи, которых нет в навигаторе
+            data_manager.save_portfolio()
+            self.populate_navigator()
+        if str(self.current_floor) in changes["floors"]:
+            self.reload_plan_image()
+            for layer_key in self.layer_items:
+                self.refresh_layer(layer_key)
+        if changes.get("statuses"):
+            self.reload_statuses()
+        self.update_legend()
+        count = len(changes["updated"]) + len(changes["removed"])
+        self.status.showMessage(f"Данные обновлены другим пользователем (кабинетов: {count}).")
+
+    def set_active_floor(self, floor_key):
+        """Выделяет текущий этаж в навигаторе."""
+        index = self.floor_combo.findData(floor_key)
+        if index >= 0 and index != self.floor_combo.currentIndex():
+            self.floor_combo.setCurrentIndex(index)
 
     def upload_plan(self):
         """Открывает диалог для выбора нового плана этажа."""
@@ -254,19 +944,28 @@ class MainWindow(QMainWindow):
         file_dialog.setWindowTitle("Выберите новый план этажа")
         file_path, _ = file_dialog.getOpenFileName(self, "Open Image", "", "Image Files (*.png *.jpg *.bmp)")
         if file_path:
-            debug_log(f"Выбран файл: {file_path}")
+            debug_log("Выбран файл: %s", file_path)
+            try:
+                asset, plan_size = assets.import_plan(file_path)
+            except Exception as e:
+                self.status.showMessage(f"Не удалось загрузить план: {e}")
+                error_log("Ошибка при загрузке плана")
+                return
             floor_data = data_store["floors"].setdefault(str(self.current_floor), {"rooms": []})
-            floor_data["plan_path"] = file_path
+            floor_data["plan_asset"] = asset
+            floor_data["plan_size"] = plan_size
+            floor_data.pop("plan_path", None)
             save_data(data_store)
             self.load_floor(self.current_floor)
 
+    @timed("draw_room_polygon")
     def draw_room_polygon(self, room_data):
         """
         Создает и рисует полигон для кабинета на сцене.
         Сохраняет ссылки на графические элементы в словаре self.room_items.
         """
         try:
-            debug_log(f"Создаем полигон для кабинета {room_data.get('number')}")
+            debug_log("Создаем полигон для кабинета %s", room_data.get('number'))
             
             points = [QPointF(x, y) for x, y in room_data.get("points", [])]
             polygon = QPolygonF(points)
@@ -275,14 +974,14 @@ class MainWindow(QMainWindow):
             item = QGraphicsPolygonItem(polygon)
             item.setData(0, room_data)
             
-            status = room_data.get("status", "свободный")
-            colors = data_store["statuses"].get(status, {"bg": "#B3808080", "text": "#000000"})
+            colors = self.room_colors(room_data)
             
             item.setBrush(QBrush(QColor(colors["bg"])))
             
             item.setFlag(QGraphicsPolygonItem.ItemIsSelectable, True)
             item.mousePressEvent = partial(self.polygon_clicked, room_data=room_data)
             self.scene.addItem(item)
+            self.minimap.update_room(room_id(room_data), polygon, QColor(colors["bg"]))
             
             bounding_rect = polygon.boundingRect()
 
@@ -297,7 +996,7 @@ class MainWindow(QMainWindow):
             number_x = bounding_rect.x() + 30
             number_y = bounding_rect.y() + 30
             number_text_item.setPos(number_x, number_y)
-            self.scene.addItem(number_text_item)
+            self.view.add_label(number_text_item)
             
             # Создаем элемент для названия компании
             renter_name = room_data.get('renter_name', 'Нет арендатора')
@@ -312,10 +1011,10 @@ class MainWindow(QMainWindow):
             # Устанавливаем позицию текста под номером кабинета с небольшим отступом
             renter_y = number_y + number_text_item.boundingRect().height() + 10
             renter_text_item.setPos(number_x, renter_y)
-            self.scene.addItem(renter_text_item)
+            self.view.add_label(renter_text_item)
 
             # Сохраняем ссылки на элементы
-            self.room_items[room_data.get('number')] = {
+            self.room_items[room_id(room_data)] = {
                 'polygon': item,
                 'number_text': number_text_item,
                 'renter_text': renter_text_item
@@ -324,11 +1023,40 @@ class MainWindow(QMainWindow):
             return item, number_text_item, renter_text_item
         except Exception as e:
             self.status.showMessage(f"Ошибка при отрисовке полигона: {e}")
-            debug_log(f"Ошибка при отрисовке полигона: {traceback.format_exc()}")
+            error_log("Ошибка при отрисовке полигона")
 
 
+    def selected_rooms(self):
+        """Кабинеты текущего этажа, полигоны которых выделены на плане."""
+        rooms = []
+        for room_data in data_store["floors"].get(str(self.current_floor), {}).get("rooms", []):
+            items = self.room_items.get(room_id(room_data))
+            if items and items['polygon'].isSelected():
+                rooms.append(room_data)
+        return rooms
+
+    def on_selection_changed(self):
+        if self.view.is_drawing:
+            return
+        rooms = self.selected_rooms()
+        if rooms:
+            self.bulk_panel.set_rooms(rooms)
+            self.bulk_panel.show()
+        else:
+            self.bulk_panel.hide()
+
     def polygon_clicked(self, event, room_data):
+        if event.button() == Qt.LeftButton and event.modifiers() & Qt.ShiftModifier:
+            # Выделение рамкой начинает сам вид
+            event.ignore()
+            return
+        if event.button() == Qt.LeftButton and event.modifiers() & Qt.ControlModifier:
+            items = self.room_items.get(room_id(room_data))
+            if items:
+                items['polygon'].setSelected(not items['polygon'].isSelected())
+            return
         if event.button() == Qt.LeftButton:
+            self.scene.clearSelection()
             dlg = RoomDialog(room_data, self)
             if dlg.exec():
                 save_data(data_store)
@@ -336,9 +1064,10 @@ class MainWindow(QMainWindow):
                 self.status.showMessage(f"Сохранено: кабинет {room_data.get('number', 'Новый')}")
         elif event.button() == Qt.RightButton:
             if not self.view.is_drawing and not self.is_adding_mode:
+                self.scene.clearSelection()
                 self.editing_room_data = room_data
                 initial_points = [QPointF(x, y) for x, y in room_data.get("points", [])]
-                items = self.room_items.get(room_data.get('number'))
+                items = self.room_items.get(room_id(room_data))
                 if items:
                     items['polygon'].setVisible(False)
                     items['number_text'].setVisible(False)
@@ -349,25 +1078,110 @@ class MainWindow(QMainWindow):
                 self.is_editing_mode = True
                 self.is_adding_mode = False
 
-    def update_room_items(self, room_data):
+    def add_room_to_scene(self, room_data):
+        """Рисует кабинет, если он находится на текущем этаже."""
+        if str(room_data.get("floor")) == str(self.current_floor) and 'points' in room_data:
+            self.timeline.room_changed(room_data)
+            self.draw_room_polygon(room_data)
+            self.update_timeline_label()
+
+    def remove_room_from_scene(self, room_data):
+        """Убирает графические элементы кабинета со сцены."""
+        if str(room_data.get("floor")) != str(self.current_floor):
+            return
+        items = self.room_items.pop(room_id(room_data), None)
+        self.minimap.remove_room(room_id(room_data))
+        self.timeline.room_removed(room_data)
+        self.heatmap.room_removed(room_data)
+        self.update_timeline_label()
+        if items:
+            self.scene.removeItem(items['polygon'])
+            self.scene.removeItem(items['number_text'])
+            self.scene.removeItem(items['renter_text'])
+
+    def update_room_geometry(self, room_data, refresh_legend=True):
+        """Обновляет форму полигона кабинета и показывает его элементы."""
+        if str(room_data.get("floor")) != str(self.current_floor):
+            return
+        items = self.room_items.get(room_id(room_data))
+        if not items:
+            self.add_room_to_scene(room_data)
+            return
+        points = [QPointF(x, y) for x, y in room_data.get("points", [])]
+        items['polygon'].setPolygon(QPolygonF(points))
+        for item in items.values():
+            item.setVisible(True)
+        self.update_room_items(room_data, refresh_legend)
+
+    def room_colors(self, room_data):
+        """
+        Цвета кабинета: по статусу, а при включенной шкале времени
+        занятый кабинет вне срока аренды окрашивается как свободный.
+        Тепловая карта заменяет цвет заливки.
+        """
+        status = room_data.get("status", "свободный")
+        if self.timeline.is_vacant(room_data):
+            # Цвет свободного статуса, как бы он ни был переименован
+            status = next((name for name, colors in data_store["statuses"].items()
+                           if colors.get("id") in VACANT_STATUS_IDS), "свободный")
+        colors = data_store["statuses"].get(status, {"bg": "#B3808080", "text": "#000000"})
+        if self.heatmap.mode:
+            return {"bg": self.heatmap.color(room_data), "text": colors["text"]}
+        return colors
+
+    def set_room_colors(self, room_data):
+        """Меняет только цвета элементов кабинета (без текста и положения)."""
+        items = self.room_items.get(room_id(room_data))
+        if not items:
+            return
+        colors = self.room_colors(room_data)
+        fill = QColor(colors["bg"])
+        items['polygon'].setBrush(QBrush(fill))
+        text_color = QColor(colors["text"])
+        if items['number_text'].defaultTextColor() != text_color:
+            items['number_text'].setDefaultTextColor(text_color)
+            items['renter_text'].setDefaultTextColor(text_color)
+        self.minimap.set_room_color(room_id(room_data), fill)
+
+    @timed("timeline_step")
+    def set_timeline_date(self, day):
+        """
+        Перекрашивает этаж на дату шкалы времени (None — по текущим статусам).
+        Перекрашиваются только кабинеты, состояние которых изменилось.
+        """
+        if day is None:
+            changed = [room_data for room_data in self.timeline.rooms if self.timeline.is_vacant(room_data)]
+            self.timeline.clear()
+        else:
+            changed = self.timeline.set_date(day)
+        for room_data in changed:
+            self.set_room_colors(room_data)
+        self.update_timeline_label()
+
+    def update_timeline_label(self):
+        self.timeline_panel.update_label(self.timeline.leased_count(), len(self.room_items))
+
+    def update_room_items(self, room_data, refresh_legend=True):
         """
         Обновляет внешний вид полигона и текста на сцене,
         используя прямой доступ через словарь self.room_items.
+        При пакетном обновлении легенду обновляет вызывающий код (refresh_legend=False).
         """
         try:
-            debug_log(f"Обновление элементов для кабинета {room_data.get('number')}")
+            debug_log("Обновление элементов для кабинета %s", room_data.get('number'))
             
-            room_number = room_data.get('number')
-            if room_number in self.room_items:
-                items = self.room_items[room_number]
+            items = self.room_items.get(room_id(room_data))
+            if items:
                 item = items['polygon']
                 number_text_item = items['number_text']
                 renter_text_item = items['renter_text']
 
-                status = room_data.get("status", "свободный")
-                colors = data_store["statuses"].get(status, {"bg": "#B3808080", "text": "#000000"})
+                self.timeline.room_changed(room_data)
+                self.heatmap.room_changed(room_data)
+                colors = self.room_colors(room_data)
                 item.setBrush(QBrush(QColor(colors["bg"])))
-                debug_log(f"Обновлен цвет полигона на {colors['bg']}")
+                self.minimap.update_room(room_id(room_data), item.polygon(), QColor(colors["bg"]))
+                debug_log("Обновлен цвет полигона на %s", colors['bg'])
                 
                 # Обновляем текст
                 number_text = f"Каб. № {room_data.get('number', 'N/A')}"
@@ -375,8 +1189,11 @@ class MainWindow(QMainWindow):
                 if len(renter_name) > 20:
                     renter_name = renter_name[:17] + "..."
                 
-                number_text_item.setPlainText(number_text)
-                renter_text_item.setPlainText(renter_name)
+                # setPlainText заново раскладывает документ, поэтому вызывается только при смене текста
+                if number_text_item.toPlainText() != number_text:
+                    number_text_item.setPlainText(number_text)
+                if renter_text_item.toPlainText() != renter_name:
+                    renter_text_item.setPlainText(renter_name)
                 
                 # Обновляем цвета текста
                 number_text_item.setDefaultTextColor(QColor(colors["text"]))
@@ -391,51 +1208,72 @@ class MainWindow(QMainWindow):
                 number_text_item.setPos(number_x, number_y)
                 renter_text_item.setPos(number_x, renter_y)
                 
-                debug_log(f"Обновлен текст и его цвет на {colors['text']}")
+                debug_log("Обновлен текст и его цвет на %s", colors['text'])
             else:
-                debug_log(f"Не удалось найти элементы для кабинета {room_number} в словаре.")
+                debug_log("Не удалось найти элементы для кабинета %s в словаре.", room_data.get('number'))
             # Добавляем вызов обновления легенды
-            self.update_legend()
+            if refresh_legend:
+                self.update_legend()
         except Exception as e:
             self.status.showMessage(f"Ошибка при обновлении элементов: {e}")
-            debug_log(f"Ошибка при обновлении элементов: {traceback.format_exc()}")
+            error_log("Ошибка при обновлении элементов")
             
     def delete_room_from_scene_and_data(self, room_data_to_delete):
         """
         Удаляет полигон и его данные.
         """
         try:
-            debug_log(f"Удаление кабинета: {room_data_to_delete.get('number')}")
+            debug_log("Удаление кабинета: %s", room_data_to_delete.get('number'))
             floor_rooms = data_store["floors"].get(str(self.current_floor), {}).get("rooms", [])
+            index = next((i for i, room in enumerate(floor_rooms) if room is room_data_to_delete), -1)
 
-            if room_data_to_delete in floor_rooms:
-                floor_rooms.remove(room_data_to_delete)
+            if index >= 0:
+                floor_rooms.pop(index)
+                history_store.record_deleted(room_data_to_delete)
                 save_data(data_store)
+                self.undo_stack.push(RoomDeletedCommand(room_data_to_delete, index))
                 self.status.showMessage(f"Кабинет {room_data_to_delete.get('number')} удален.")
                 
-                # Находим и удаляем элементы на сцене и в словаре
-                room_number = room_data_to_delete.get('number')
-                if room_number in self.room_items:
-                    items = self.room_items.pop(room_number)
-                    self.scene.removeItem(items['polygon'])
-                    self.scene.removeItem(items['number_text'])
-                    self.scene.removeItem(items['renter_text'])
-                
-                # Сбрасываем состояние рисования после удаления
+                # Сбрасываем состояние рисования и удаляем элементы со сцены
                 self.reset_drawing_state()
-                self.load_floor(self.current_floor)
+                self.remove_room_from_scene(room_data_to_delete)
+                self.update_legend()
             else:
                 self.status.showMessage("Не удалось найти данные для удаления.")
         except Exception as e:
             self.status.showMessage(f"Ошибка при удалении кабинета: {e}")
-            debug_log(f"Ошибка при удалении кабинета: {traceback.format_exc()}")
+            error_log("Ошибка при удалении кабинета")
+
+    def apply_room_changes(self, changes, description):
+        """
+        Применяет изменения полей многих кабинетов одной транзакцией:
+        changes — список (кабинет, {поле: значение}). Данные сохраняются
+        один раз, сцена и легенда обновляются один раз, а в историю отмены
+        попадает одна команда.
+        """
+        commands = []
+        for room_data, values in changes:
+            old_values = {field: room_data.get(field) for field in TRACKED_FIELDS}
+            room_data.update(values)
+            history_store.record_changes(room_data, old_values)
+            commands.append(RoomFieldsCommand(room_data, old_values))
+        if not commands:
+            return
+        save_data(data_store)
+        self.undo_stack.push(RoomsBatchCommand(commands, description))
+        self.refresh_rooms([room_data for room_data, _ in changes])
+
+    def refresh_rooms(self, rooms):
+        """Обновляет на сцене кабинеты текущего этажа из списка и один раз — легенду."""
+        for room_data in rooms:
+            if str(room_data.get("floor")) == str(self.current_floor):
+                self.update_room_items(room_data, refresh_legend=False)
+        self.update_legend()
 
     def open_status_editor(self):
         """Открывает окно для редактирования статусов."""
         dlg = StatusEditorDialog(self)
         dlg.exec()
-        self.reload_statuses()
-        self.update_legend()
 
     def reload_statuses(self):
         """
@@ -443,10 +1281,11 @@ class MainWindow(QMainWindow):
         Также вызывает обновление легенды.
         """
         for room_data in data_store["floors"].get(str(self.current_floor), {}).get("rooms", []):
-            self.update_room_items(room_data)
+            self.update_room_items(room_data, refresh_legend=False)
         self.status.showMessage("Статусы кабинетов обновлены.")
         self.update_legend() # Вызываем обновление легенды
 
+    @timed("update_legend")
     def update_legend(self):
         """
         Создает и обновляет легенду статусов в статус-баре,
@@ -458,22 +1297,24 @@ class MainWindow(QMainWindow):
             if child.widget():
                 child.widget().deleteLater()
         
+        if self.heatmap.mode:
+            # Легенда тепловой карты: интервалы и количество кабинетов этажа в каждом
+            title_label = QLabel(f"{HEATMAP_MODES[self.heatmap.mode]['name']}:")
+            title_label.setStyleSheet("color: #f7f7f7;")
+            self.legend_layout.addWidget(title_label)
+            for color, label, count in self.heatmap.legend():
+                color_label = QLabel()
+                color_label.setFixedSize(16, 16)
+                color_label.setStyleSheet(f"background-color: {color}; border: 1px solid white; border-radius: 4px;")
+                text_label = QLabel(f"{label} ({count})")
+                text_label.setStyleSheet("color: #f7f7f7;")
+                self.legend_layout.addWidget(color_label)
+                self.legend_layout.addWidget(text_label)
+            return
+
         # --- НОВАЯ ЛОГИКА ПОДСЧЕТА ---
-        status_counts = {}
-        # Инициализируем словарь подсчета для всех известных статусов
-        for status in data_store["statuses"].keys():
-            status_counts[status] = 0
-            
-        # Проходим по всем этажам и кабинетам, чтобы посчитать их статусы
-        for floor_data in data_store["floors"].values():
-            for room_data in floor_data.get("rooms", []):
-                status = room_data.get("status", "свободный")
-                if status in status_counts:
-                    status_counts[status] += 1
-                else:
-                    # Если статус есть в данных, но не в словаре статусов,
-                    # можно добавить его сюда с предупреждением
-                    status_counts[status] = 1
+        # Количество кабинетов по статусам берется из обратного индекса, без обхода этажей
+        status_counts = status_index.counts()
         # --- КОНЕЦ НОВОЙ ЛОГИКИ ---
         
         # Добавляем новые элементы, используя данные о количестве
@@ -0,0 +1,175 @@
+import os
+import shutil
+import hashlib
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, Signal
+from PySide6.QtGui import QImageReader
+from stroycent.data_manager import get_default_data_file_path
+from stroycent.utils import debug_log, error_log
+
+# Длинная сторона уменьшенных копий плана, пикселей
+RENDITION_SIZES = (1024, 2048, 4096)
+THUMBNAIL_SIZE = 256
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_assets_dir():
+    """Хранилище планов (рядом с основным файлом данных, общее для всех зданий)"""
+    return os.path.join(os.path.dirname(get_default_data_file_path()), "assets")
+
+
+def original_path(asset):
+    return os.path.join(get_assets_dir(), "originals", asset)
+
+
+def _rendition_ext(asset):
+    # Фотографии и сканы остаются в JPEG, остальное сохраняется в PNG
+    return ".jpg" if os.path.splitext(asset)[1].lower() in (".jpg", ".jpeg") else ".png"
+
+
+def rendition_path(asset, size):
+    stem = os.path.splitext(asset)[0]
+    return os.path.join(get_assets_dir(), "renditions", f"{stem}_{size}{_rendition_ext(asset)}")
+
+
+def thumbnail_path(asset):
+    return rendition_path(asset, "thumb")
+
+
+def file_hash(path):
+    """SHA-256 содержимого файла; файл читается блоками."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_size(path):
+    """Размер изображения [ширина, высота] без декодирования пикселей."""
+    size = QImageReader(path).size()
+    return [size.width(), size.height()]
+
+
+def import_plan(path):
+    """
+    Копирует изображение плана в хранилище под именем, равным хешу содержимого,
+    поэтому одинаковые планы хранятся один раз.
+    Возвращает (имя в хранилище, [ширина, высота]).
+    """
+    ext = os.path.splitext(path)[1].lower() or ".png"
+    asset = file_hash(path) + ext
+    target = original_path(asset)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = target + ".tmp"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, target)
+        debug_log("План добавлен в хранилище: %s -> %s", path, asset)
+    return asset, image_size(target)
+
+
+def rendition_sizes(plan_size):
+    """Размеры копий, которые меньше оригинала (большие копии бессмысленны)."""
+    longest = max(plan_size) if plan_size else 0
+    return [size for size in RENDITION_SIZES if size < longest]
+
+
+def missing_renditions(asset, plan_size):
+    """Размеры копий (и "thumb" для миниатюры), которых еще нет на диске."""
+    missing = [size for size in rendition_sizes(plan_size) if not os.path.exists(rendition_path(asset, size))]
+    if not os.path.exists(thumbnail_path(asset)):
+        missing.append("thumb")
+    return missing
+
+
+def best_plan_file(asset, plan_size, required):
+    """
+    Наименьший готовый файл плана, длинная сторона которого не меньше required
+    пикселей. Если подходящей копии нет, возвращается оригинал.
+    Возвращает (путь, длинная сторона).
+    """
+    for size in rendition_sizes(plan_size):
+        if size >= required and os.path.exists(rendition_path(asset, size)):
+            return rendition_path(asset, size), size
+    return original_path(asset), max(plan_size) if plan_size else 0
+
+
+def generate_renditions(asset, sizes):
+    """
+    Создает уменьшенные копии и миниатюру плана. Работает с QImage,
+    поэтому может выполняться вне потока интерфейса.
+    """
+    image = QImageReader(original_path(asset)).read()
+    if image.isNull():
+        raise ValueError(f"Не удалось прочитать план {asset}")
+    os.makedirs(os.path.join(get_assets_dir(), "renditions"), exist_ok=True)
+    # От большей копии к меньшей: каждая следующая уменьшается из предыдущей
+    numeric = sorted((s for s in sizes if s != "thumb"), reverse=True)
+    if "thumb" in sizes:
+        numeric.append("thumb")
+    image_format = "JPEG" if _rendition_ext(asset) == ".jpg" else "PNG"
+    source = image
+    for size in numeric:
+        side = THUMBNAIL_SIZE if size == "thumb" else size
+        scaled = source.scaled(QSize(side, side), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        path = rendition_path(asset, size)
+        tmp_path = path + ".tmp"
+        if not scaled.save(tmp_path, image_format):
+            raise OSError(f"Не удалось сохранить {path}")
+        os.replace(tmp_path, path)
+        source = scaled
+
+
+class _RenditionSignals(QObject):
+    finished = Signal(str)
+    failed = Signal(str, str)
+
+
+class _RenditionTask(QRunnable):
+    def __init__(self, asset, sizes):
+        super().__init__()
+        self.asset = asset
+        self.sizes = sizes
+        self.signals = _RenditionSignals()
+
+    def run(self):
+        try:
+            generate_renditions(self.asset, self.sizes)
+        except Exception as e:
+            self.signals.failed.emit(self.asset, str(e))
+            return
+        self.signals.finished.emit(self.asset)
+
+
+class RenditionWorker(QObject):
+    """
+    Создает недостающие копии планов в пуле потоков.
+    Сигнал ready(имя в хранилище) приходит, когда копии плана готовы.
+    """
+    ready = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tasks = {}
+
+    def request(self, asset, plan_size):
+        """Запускает создание копий, если их нет и они еще не создаются."""
+        if asset in self._tasks or not os.path.exists(original_path(asset)):
+            return
+        sizes = missing_renditions(asset, plan_size)
+        if not sizes:
+            return
+        task = _RenditionTask(asset, sizes)
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        self._tasks[asset] = task
+        QThreadPool.globalInstance().start(task)
+
+    def _on_finished(self, asset):
+        self._tasks.pop(asset, None)
+        self.ready.emit(asset)
+
+    def _on_failed(self, asset, error):
+        self._tasks.pop(asset, None)
+        error_log("Ошибка создания копий плана %s: %s", asset, error)
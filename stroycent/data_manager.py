@@ -2,14 +2,26 @@ import sys
 import os
 import json
 import shutil
+import uuid
+from datetime import date
+from contextlib import contextmanager
+from stroycent.utils import info_log, error_log, get_log_file_path
+from stroycent.perf import timed
 
+# Встроенные статусы с постоянными идентификаторами: по ним (а не по названию,
+# которое можно переименовать) определяется занятость кабинета
 DEFAULT_STATUSES = {
-    "свободный": {"bg": "#B300ff00", "text": "#000000"},
-    "занят": {"bg": "#B3ffff00", "text": "#000000"},
-    "скоро освободится": {"bg": "#B3ffa500", "text": "#000000"},
-    "в ремонте": {"bg": "#B3ff0000", "text": "#ffffff"}
+    "свободный": {"bg": "#B300ff00", "text": "#000000", "id": "free"},
+    "занят": {"bg": "#B3ffff00", "text": "#000000", "id": "occupied"},
+    "скоро освободится": {"bg": "#B3ffa500", "text": "#000000", "id": "leaving"},
+    "в ремонте": {"bg": "#B3ff0000", "text": "#ffffff", "id": "repair"}
 }
 
+PAYMENT_TYPES = ("Наличные", "Безналичные")
+
+# Этажи здания, которое существовало до появления списка зданий (portfolio.json)
+DEFAULT_FLOOR_NAMES = ["Цокольный этаж", "1 этаж", "2 этаж", "3 этаж", "4 этаж", "5 этаж"]
+
 def get_resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
     try:
@@ -26,26 +38,178 @@ def get_resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 def get_data_file_path():
-    """Путь к файлу данных (всегда рядом с исполняемым файлом)"""
+    """Путь к файлу данных текущего здания"""
+    return _active_data_file or get_default_data_file_path()
+
+def get_default_data_file_path():
+    """Путь к основному файлу данных (всегда рядом с исполняемым файлом)"""
+    # Переменная окружения позволяет направить несколько процессов на общий файл
+    override = os.environ.get("STROYCENT_DATA_FILE")
+    if override:
+        return os.path.abspath(override)
     if getattr(sys, 'frozen', False):
         base_path = os.path.dirname(sys.executable)
     else:
         base_path = os.path.abspath(".")
     return os.path.join(base_path, "building_data.json")
 
-def get_log_file_path():
-    """Путь к файлу логов (всегда рядом с исполняемым файлом)"""
-    if getattr(sys, 'frozen', False):
-        base_path = os.path.dirname(sys.executable)
-    else:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, "error_log.txt")
+def get_portfolio_file_path():
+    """Путь к списку зданий (рядом с основным файлом данных)"""
+    return os.path.join(os.path.dirname(get_default_data_file_path()), "portfolio.json")
+
+def get_history_file_path():
+    """Путь к файлу истории изменений (рядом с файлом данных)"""
+    return os.path.join(os.path.dirname(get_data_file_path()), "building_history.json")
+
+def get_ledger_file_path():
+    """Путь к журналу начислений и оплат (рядом с файлом данных)"""
+    return os.path.join(os.path.dirname(get_data_file_path()), "building_ledger.json")
+
+def room_key(room_data):
+    """Ключ кабинета по номеру: "<этаж>:<номер>" (так журналы ссылались на кабинеты до появления "id")."""
+    return f"{room_data.get('floor', '')}:{room_data.get('number', '')}"
+
+def new_room_id():
+    return uuid.uuid4().hex
+
+def room_id(room_data):
+    """
+    Постоянный идентификатор кабинета: не меняется при смене номера.
+    У кабинетов без "id" (добавленных прежней версией программы) — ключ по номеру.
+    """
+    return room_data.get("id") or room_key(room_data)
+
+def ensure_room_ids(data):
+    """Дает "id" кабинетам, у которых его нет. Возвращает число добавленных идентификаторов."""
+    added = 0
+    for floor_data in data.get("floors", {}).values():
+        for room in floor_data.get("rooms", []):
+            if not room.get("id"):
+                room["id"] = new_room_id()
+                added += 1
+    return added
+
+def room_ids_by_key(data):
+    """
+    Идентификаторы кабинетов по прежним ключам "<этаж>:<номер>" — для перевода
+    журналов на идентификаторы. Номера, которые на этаже носят несколько
+    кабинетов, не переводятся: записи нельзя отнести к одному из них.
+    """
+    ids = {}
+    ambiguous = set()
+    for floor_data in data.get("floors", {}).values():
+        for room in floor_data.get("rooms", []):
+            key = room_key(room)
+            if key in ids:
+                ambiguous.add(key)
+            ids[key] = room_id(room)
+    for key in ambiguous:
+        del ids[key]
+    return ids
 
-def ensure_data_file_exists():
+def new_status_id():
+    return uuid.uuid4().hex[:8]
+
+def ensure_status_ids(statuses):
+    """
+    Дает каждому статусу постоянный идентификатор "id", который не меняется
+    при переименовании. Встроенные статусы получают свои постоянные
+    идентификаторы (в том числе вместо случайных, выданных прежней версией),
+    остальные записи без "id" — новый. Записи заменяются копиями.
+    Возвращает True, если что-то изменено.
+    """
+    changed = False
+    used = {colors.get("id") for colors in statuses.values()}
+    for name, colors in list(statuses.items()):
+        builtin_id = DEFAULT_STATUSES.get(name, {}).get("id")
+        if builtin_id and colors.get("id") != builtin_id and builtin_id not in used:
+            statuses[name] = dict(colors, id=builtin_id)
+            used.add(builtin_id)
+            changed = True
+        elif not colors.get("id"):
+            statuses[name] = dict(colors, id=new_status_id())
+            changed = True
+    return changed
+
+def add_default_statuses(statuses):
+    """Добавляет встроенные статусы, которых нет в списке (переименованные встроенные не дублируются)."""
+    used = {colors.get("id") for colors in statuses.values()}
+    for name, colors in DEFAULT_STATUSES.items():
+        if name not in statuses and colors["id"] not in used:
+            statuses[name] = dict(colors)
+
+def status_id(name, statuses=None):
+    """
+    Постоянный идентификатор статуса по его названию (по умолчанию в списке
+    статусов текущего здания). Для названия не из списка возвращается само название.
+    """
+    colors = (data_store["statuses"] if statuses is None else statuses).get(name)
+    return colors.get("id") or name if colors else name
+
+def _parse_iso_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def validate_room(room_data, statuses=None):
+    """
+    Проверяет поля кабинета и возвращает список ошибок (пустой, если ошибок нет).
+    Одни и те же правила используются окном кабинета и массовым импортом.
+    """
+    errors = []
+    if not str(room_data.get("number") or "").strip():
+        errors.append("Номер кабинета не может быть пустым.")
+    inn = str(room_data.get("inn") or "")
+    if inn and not (len(inn) == 12 and inn.isdigit()):
+        errors.append("ИНН арендатора должен состоять из 12 цифр.")
+    entry_date = _parse_iso_date(room_data.get("entry_date"))
+    exit_date = _parse_iso_date(room_data.get("exit_date"))
+    if room_data.get("entry_date") and entry_date is None:
+        errors.append(f"Некорректная дата заезда: {room_data.get('entry_date')}.")
+    if room_data.get("exit_date") and exit_date is None:
+        errors.append(f"Некорректная дата выезда: {room_data.get('exit_date')}.")
+    if entry_date and exit_date and exit_date < entry_date:
+        errors.append("Дата выезда не может быть раньше даты заезда.")
+    rent = room_data.get("rent")
+    if rent not in (None, ""):
+        try:
+            valid_rent = float(str(rent).replace(",", ".")) >= 0
+        except ValueError:
+            valid_rent = False
+        if not valid_rent:
+            errors.append(f"Некорректная ставка аренды: {rent}.")
+    payment_type = room_data.get("payment_type")
+    if payment_type and payment_type not in PAYMENT_TYPES:
+        errors.append(f"Неизвестный тип оплаты: {payment_type}.")
+    status = room_data.get("status")
+    if statuses is not None and status and status not in statuses:
+        errors.append(f"Неизвестный статус: {status}.")
+    return errors
+
+def validate_changes(room_data, values, statuses=None):
+    """
+    Проверяет только изменяемые поля кабинета (values), чтобы старые
+    некорректные данные кабинета не мешали изменению других полей.
+    Даты проверяются парой, если меняется хотя бы одна из них.
+    """
+    merged = dict(room_data)
+    merged.update(values)
+    check = {"number": merged.get("number")}
+    check.update({field: merged.get(field) for field in values})
+    if "entry_date" in values or "exit_date" in values:
+        check["entry_date"] = merged.get("entry_date")
+        check["exit_date"] = merged.get("exit_date")
+    return validate_room(check, statuses)
+
+def ensure_data_file_exists(target_path=None):
     """Создает файл данных если его нет, копируя из ресурсов"""
-    target_path = get_data_file_path()
+    target_path = target_path or get_data_file_path()
     if not os.path.exists(target_path):
         try:
+            if target_path != get_default_data_file_path():
+                # Для добавленных зданий пример из ресурсов не подходит
+                raise FileNotFoundError(target_path)
             # Пробуем несколько возможных путей к исходному файлу
             possible_sources = [
                 get_resource_path("building_data.json"),  # Для PyInstaller .app
@@ -56,51 +220,504 @@ def ensure_data_file_exists():
             for source_path in possible_sources:
                 if os.path.exists(source_path):
                     shutil.copyfile(source_path, target_path)
-                    print(f"Файл данных скопирован из: {source_path}")
+                    info_log("Файл данных скопирован из: %s", source_path)
                     return
             
             # Если файл не найден нигде, создаем пустой
-            print("Исходный файл данных не найден, создаем новый")
+            info_log("Исходный файл данных не найден, создаем новый")
+            initial_data = {"floors": {}, "statuses": DEFAULT_STATUSES}
+            with open(target_path, "w", encoding="utf-8") as f:
+                json.dump(initial_data, f, indent=4, ensure_ascii=False)
+
+        except FileNotFoundError:
+            info_log("Создан пустой файл данных: %s", target_path)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
             initial_data = {"floors": {}, "statuses": DEFAULT_STATUSES}
             with open(target_path, "w", encoding="utf-8") as f:
                 json.dump(initial_data, f, indent=4, ensure_ascii=False)
-                
         except Exception as e:
-            print(f"Ошибка создания building_data.json: {e}")
+            error_log("Ошибка создания building_data.json: %s", e)
             # Создаем минимальный файл данных
             initial_data = {"floors": {}, "statuses": DEFAULT_STATUSES}
             with open(target_path, "w", encoding="utf-8") as f:
                 json.dump(initial_data, f, indent=4, ensure_ascii=False)
 
+@timed("load_data")
 def load_data():
     """Загрузка данных из файла"""
+    global _merge_base, _file_signature
     data_file = get_data_file_path()
     if os.path.exists(data_file):
         try:
             with open(data_file, "r", encoding="utf-8") as f:
                 data = json.load(f)
-                # Ensure statuses exist
-                if 'statuses' not in data:
-                    data['statuses'] = DEFAULT_STATUSES.copy()
-                # Ensure all default statuses exist
-                for status, colors in DEFAULT_STATUSES.items():
-                    if status not in data['statuses']:
-                        data['statuses'][status] = colors
-                return data
+            if ensure_room_ids(data):
+                # Файл без идентификаторов кабинетов: они записываются сразу
+                data = _migrate_room_ids(data_file)
+            _file_signature = _get_file_signature(data_file)
+            _merge_base = _snapshot(data)
+            # Ensure statuses exist
+            if 'statuses' not in data:
+                data['statuses'] = {}
+            ensure_status_ids(data['statuses'])
+            # Ensure all default statuses exist
+            add_default_statuses(data['statuses'])
+            return data
         except Exception as e:
-            print(f"Ошибка загрузки данных: {e}")
-            return {"floors": {}, "statuses": DEFAULT_STATUSES.copy()}
-    else:
-        return {"floors": {}, "statuses": DEFAULT_STATUSES.copy()}
+            error_log("Ошибка загрузки данных: %s", e)
+    data = {"floors": {}, "statuses": {}}
+    add_default_statuses(data["statuses"])
+    return data
+
+def _migrate_room_ids(path):
+    """
+    Записывает в файл данных идентификаторы кабинетов. Файл перечитывается
+    под блокировкой, чтобы процессы, открывшие его одновременно, не дали
+    одним и тем же кабинетам разные идентификаторы. Возвращает данные файла.
+    """
+    with data_file_lock(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        added = ensure_room_ids(data)
+        if added:
+            data["version"] = data.get("version", 0) + 1
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            info_log("Кабинетам присвоены постоянные идентификаторы: %d", added)
+    return data
+
+# --- Совместная работа нескольких процессов с одним файлом данных ---
+
+# Состояние файла на момент последнего чтения/записи этим процессом:
+# по нему определяется, что файл успел изменить кто-то другой
+_merge_base = {"rooms": {}, "floors": {}, "statuses": {}}
+_file_signature = None
+
+# Результат последнего слияния с изменениями других процессов: идентификаторы (room_id)
+# обновленных кабинетов, удаленные кабинеты {идентификатор: словарь} и этажи с измененным планом
+last_merge = {"updated": set(), "removed": {}, "floors": set()}
+
+# Функции, вызываемые после слияния с изменениями другого процесса (перестроение индексов)
+merge_callbacks = []
+
+_MISSING = object()
+
+
+def _get_file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # Запись идет через замену файла, поэтому inode меняется при каждом сохранении
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+@contextmanager
+def data_file_lock(path=None):
+    """Рекомендательная блокировка файла данных через соседний файл .lock"""
+    lock_path = (path or get_data_file_path()) + ".lock"
+    with open(lock_path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _snapshot(data):
+    """
+    Неглубокий срез данных для трехстороннего слияния.
+    Копируются только словари кабинетов и статусов, вложенные списки
+    (например, точки полигона) разделяются, поэтому срез строится быстро.
+    """
+    rooms = {}
+    floors = {}
+    for floor_key, floor_data in data.get("floors", {}).items():
+        floors[floor_key] = {k: v for k, v in floor_data.items() if k != "rooms"}
+        for room in floor_data.get("rooms", []):
+            rooms[room_id(room)] = dict(room)
+    statuses = {name: dict(colors) for name, colors in data.get("statuses", {}).items()}
+    return {"rooms": rooms, "floors": floors, "statuses": statuses}
+
+
+def _merge3(base, ours, theirs):
+    """
+    Трехстороннее слияние значения: берется изменение той стороны, которая
+    его сделала. Словари сливаются по ключам, при конфликте одного поля
+    побеждает текущее сохранение.
+    """
+    if ours == base:
+        return theirs
+    if theirs == base or theirs == ours:
+        return ours
+    if isinstance(ours, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = {}
+        for key in list(theirs) + [k for k in ours if k not in theirs]:
+            value = _merge3(base.get(key, _MISSING), ours.get(key, _MISSING), theirs.get(key, _MISSING))
+            if value is not _MISSING:
+                merged[key] = value
+        return merged
+    # Удаление с одной стороны и изменение с другой: изменение сохраняется
+    if ours is _MISSING:
+        return theirs
+    return ours
+
+
+def _merge_into(data, disk):
+    """
+    Сливает изменения другого процесса (disk) в data на месте.
+    Словари кабинетов, которые уже есть в памяти, обновляются, а не
+    заменяются, чтобы ссылки из интерфейса оставались действительными.
+    """
+    ours = _snapshot(data)
+    theirs = _snapshot(disk)
+    rooms = _merge3(_merge_base["rooms"], ours["rooms"], theirs["rooms"])
+    floors_meta = _merge3(_merge_base["floors"], ours["floors"], theirs["floors"])
+    statuses = _merge3(_merge_base["statuses"], ours["statuses"], theirs["statuses"])
+
+    existing = {}
+    for floor_data in data.get("floors", {}).values():
+        for room in floor_data.get("rooms", []):
+            existing[room_id(room)] = room
+
+    updated = set()
+    ordered_keys = list(theirs["rooms"]) + [k for k in ours["rooms"] if k not in theirs["rooms"]]
+    rooms_by_floor = {}
+    for key in ordered_keys:
+        merged_room = rooms.get(key)
+        if merged_room is None:
+            continue
+        room = existing.get(key)
+        if room is None:
+            room = dict(merged_room)
+            # Кабинет, добавленный прежней версией программы, получает идентификатор до показа
+            room.setdefault("id", new_room_id())
+            updated.add(room_id(room))
+        elif room != merged_room:
+            room.clear()
+            room.update(merged_room)
+            updated.add(key)
+        rooms_by_floor.setdefault(str(room.get("floor")), []).append(room)
+
+    floors = data.setdefault("floors", {})
+    for floor_key in list(floors):
+        if floor_key not in floors_meta and floor_key not in rooms_by_floor:
+            del floors[floor_key]
+    for floor_key in set(floors_meta) | set(rooms_by_floor):
+        floor_data = floors.setdefault(floor_key, {"rooms": []})
+        meta = floors_meta.get(floor_key, {})
+        for field in [k for k in floor_data if k != "rooms" and k not in meta]:
+            del floor_data[field]
+        floor_data.update(meta)
+        floor_data["rooms"] = rooms_by_floor.get(floor_key, [])
+
+    statuses_changed = data["statuses"] != statuses
+    data["statuses"].clear()
+    data["statuses"].update(statuses)
+    last_merge["updated"] = updated
+    last_merge["removed"] = {key: existing[key] for key in ours["rooms"] if key not in rooms}
+    last_merge["floors"] = {key for key in set(ours["floors"]) | set(floors_meta)
+                            if ours["floors"].get(key) != floors_meta.get(key)}
+    last_merge["statuses"] = statuses_changed
+    for callback in merge_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            error_log("Ошибка в обработчике слияния: %s", e)
+
+
+def read_data_file():
+    """
+    Читает файл данных без блокировки (запись атомарна).
+    Возвращает (данные, подпись файла) — подпись относится именно к прочитанной версии.
+    """
+    with open(get_data_file_path(), "r", encoding="utf-8") as f:
+        stat = os.fstat(f.fileno())
+        return json.load(f), (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
 
+def is_external_change(signature):
+    """Истина, если файл с такой подписью записан не этим процессом."""
+    return signature is not None and signature != _file_signature
+
+
+def apply_external_changes(data, disk, signature):
+    """
+    Вносит в data изменения, сделанные в файле другим процессом или скриптом.
+    Возвращает копию last_merge с описанием изменившихся кабинетов.
+    """
+    global _merge_base, _file_signature
+    _merge_into(data, disk)
+    data["version"] = disk.get("version", 0)
+    _merge_base = _snapshot(disk)
+    _file_signature = signature
+    return dict(last_merge)
+
+
+# Функции, вызываемые после каждого успешного сохранения (история, резервные копии и т.п.)
+after_save_callbacks = []
+
+@timed("save_data")
 def save_data(data):
-    """Сохранение данных в файл"""
+    """
+    Сохранение данных в файл.
+
+    Запись выполняется под блокировкой. Если с момента последнего чтения файл
+    изменил другой процесс, его изменения сливаются с нашими по кабинетам,
+    а не затираются. Номер версии в файле увеличивается при каждой записи.
+    """
+    global _merge_base, _file_signature
+    data_file = get_data_file_path()
+    try:
+        with data_file_lock(data_file):
+            last_merge.update(updated=set(), removed={}, floors=set(), statuses=False)
+            signature = _get_file_signature(data_file)
+            disk_version = data.get("version", 0)
+            if signature is not None and signature != _file_signature:
+                with open(data_file, "r", encoding="utf-8") as f:
+                    disk = json.load(f)
+                disk_version = disk.get("version", 0)
+                _merge_into(data, disk)
+            data["version"] = disk_version + 1
+            tmp_path = data_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, data_file)
+            _file_signature = _get_file_signature(data_file)
+            _merge_base = _snapshot(data)
+    except Exception as e:
+        error_log("Ошибка при сохранении данных: %s", e)
+        return
+    for callback in after_save_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            error_log("Ошибка в обработчике сохранения: %s", e)
+
+def replace_data(data):
+    """
+    Заменяет содержимое data_store (например, данными из снимка) и сохраняет
+    его. Номер версии продолжает текущий; после замены вызываются
+    merge_callbacks, как после слияния с изменениями другого процесса.
+    """
+    data = dict(data)
+    data["version"] = data_store.get("version", 0)
+    data.setdefault("floors", {})
+    data.setdefault("statuses", {})
+    ensure_status_ids(data["statuses"])
+    add_default_statuses(data["statuses"])
+    ensure_room_ids(data)
+    data_store.clear()
+    data_store.update(data)
+    sync_building_floors(data_store)
+    save_data(data_store)
+    for callback in merge_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            error_log("Ошибка в обработчике слияния: %s", e)
+
+# --- Список зданий (portfolio.json) ---
+#
+# В манифесте хранятся здания, названия и порядок их этажей и путь к файлу
+# данных каждого здания. При запуске читается только манифест и файл
+# текущего здания; данные других зданий загружаются при переключении.
+
+PORTFOLIO_FORMAT_VERSION = 1
+
+_active_data_file = None
+
+# Функции, вызываемые после переключения здания (история, наблюдение за файлом и т.п.)
+building_switch_callbacks = []
+
+
+def _floor_sort_key(floor_key):
+    return (0, int(floor_key), "") if str(floor_key).lstrip("-").isdigit() else (1, 0, str(floor_key))
+
+
+def _default_floor_name(floor_key):
+    if str(floor_key) == "0":
+        return DEFAULT_FLOOR_NAMES[0]
+    return f"{floor_key} этаж"
+
+
+def load_portfolio():
+    """
+    Читает манифест зданий. Если его нет, создает манифест с одним зданием —
+    основным файлом данных и прежним набором из шести этажей.
+    """
+    path = get_portfolio_file_path()
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("buildings"):
+                return manifest
+        except Exception as e:
+            error_log("Ошибка загрузки списка зданий: %s", e)
+    info_log("Создается список зданий: %s", path)
+    return {
+        "version": PORTFOLIO_FORMAT_VERSION,
+        "current": "main",
+        "buildings": [{
+            "id": "main",
+            "name": "Основное здание",
+            "data_file": os.path.basename(get_default_data_file_path()),
+            "floors": [{"key": str(i), "name": name} for i, name in enumerate(DEFAULT_FLOOR_NAMES)],
+        }],
+    }
+
+
+def save_portfolio():
+    """Сохраняет манифест зданий (запись через временный файл)."""
+    path = get_portfolio_file_path()
     try:
-        with open(get_data_file_path(), "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(portfolio, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, path)
     except Exception as e:
-        print(f"Ошибка при сохранении данных: {e}")
+        error_log("Ошибка при сохранении списка зданий: %s", e)
+
+
+def get_building(building_id=None):
+    """Запись здания в манифесте; по умолчанию — текущее здание."""
+    building_id = building_id or portfolio["current"]
+    for building in portfolio["buildings"]:
+        if building["id"] == building_id:
+            return building
+    return portfolio["buildings"][0]
+
+
+def building_data_path(building):
+    """Абсолютный путь к файлу данных здания (в манифесте путь относительный)."""
+    return os.path.normpath(os.path.join(os.path.dirname(get_portfolio_file_path()), building["data_file"]))
+
+
+def building_floors(building=None):
+    """Этажи здания в порядке навигации: [{"key", "name"}, ...]."""
+    return (building or get_building())["floors"]
+
+
+def floor_name(floor_key, building=None):
+    """Название этажа по ключу; для неизвестного этажа — "<ключ> этаж"."""
+    for floor in building_floors(building):
+        if floor["key"] == str(floor_key):
+            return floor["name"]
+    return _default_floor_name(floor_key)
+
+
+def sync_building_floors(data, building=None):
+    """
+    Добавляет в манифест этажи, которые есть в данных здания, но не описаны
+    в манифесте (например, созданные сторонним скриптом). Возвращает True,
+    если манифест изменился.
+    """
+    floors = building_floors(building)
+    known = {floor["key"] for floor in floors}
+    missing = sorted((key for key in data.get("floors", {}) if key not in known), key=_floor_sort_key)
+    for key in missing:
+        floors.append({"key": key, "name": _default_floor_name(key)})
+    return bool(missing)
+
+
+def add_building(name, floor_count=1):
+    """
+    Добавляет здание с этажами "1 этаж" … "<floor_count> этаж" и пустым
+    файлом данных в собственной папке. Возвращает запись здания.
+    """
+    building_id = uuid.uuid4().hex[:8]
+    building = {
+        "id": building_id,
+        "name": name,
+        "data_file": os.path.join("buildings", building_id, "building_data.json"),
+        "floors": [{"key": str(i), "name": f"{i} этаж"} for i in range(1, max(1, floor_count) + 1)],
+    }
+    portfolio["buildings"].append(building)
+    ensure_data_file_exists(building_data_path(building))
+    save_portfolio()
+    return building
+
+
+def rename_building(building_id, name):
+    get_building(building_id)["name"] = name
+    save_portfolio()
+
+
+def add_floor(name, building=None):
+    """Добавляет этаж в конец списка этажей здания и возвращает его ключ."""
+    floors = building_floors(building)
+    numeric = [int(floor["key"]) for floor in floors if floor["key"].lstrip("-").isdigit()]
+    key = str(max(numeric) + 1 if numeric else 0)
+    floors.append({"key": key, "name": name})
+    save_portfolio()
+    return key
+
+
+def rename_floor(floor_key, name, building=None):
+    for floor in building_floors(building):
+        if floor["key"] == str(floor_key):
+            floor["name"] = name
+    save_portfolio()
+
+
+def remove_floor(floor_key, building=None):
+    """Убирает этаж из манифеста (данные этажа удаляет вызывающий код)."""
+    floors = building_floors(building)
+    floors[:] = [floor for floor in floors if floor["key"] != str(floor_key)]
+    save_portfolio()
+
+
+def _activate_building(building):
+    global _active_data_file
+    _active_data_file = building_data_path(building)
+    ensure_data_file_exists(_active_data_file)
+
+
+def switch_building(building_id):
+    """
+    Делает здание текущим: читает его файл данных и заменяет содержимое
+    data_store на месте, чтобы ссылки на data_store в других модулях
+    оставались действительными.
+    """
+    building = get_building(building_id)
+    portfolio["current"] = building["id"]
+    _activate_building(building)
+    data = load_data()
+    data_store.clear()
+    data_store.update(data)
+    sync_building_floors(data_store, building)
+    save_portfolio()
+    for callback in building_switch_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            error_log("Ошибка в обработчике смены здания: %s", e)
+
 
-# Инициализация данных при импорте
-ensure_data_file_exists()
+# Инициализация данных при импорте: читается только манифест и текущее здание
+portfolio = load_portfolio()
+_activate_building(get_building())
 data_store = load_data()
+if sync_building_floors(data_store) or not os.path.exists(get_portfolio_file_path()):
+    save_portfolio()
@@ -0,0 +1,250 @@
+"""
+Автоматический поиск контуров кабинетов на изображении плана.
+
+План переводится в оттенки серого и бинаризуется (порог Оцу), затем
+уменьшается так, чтобы тонкие стены не пропадали (пиксель считается стеной,
+если стеной был хотя бы один пиксель блока), и небольшие разрывы в стенах
+(двери) закрываются расширением стен. Замкнутые области находятся разметкой
+связных компонент по сериям пикселей строк (run-length) с объединением
+серий соседних строк — все шаги векторизованы в NumPy. Для каждой области
+обходится внешний контур и упрощается алгоритмом Дугласа — Пекера.
+"""
+import math
+import numpy as np
+from PySide6.QtCore import QObject, QRunnable, Signal
+from PySide6.QtGui import QImage, QImageReader
+from stroycent.geometry import simplify_polygon, point_in_polygon, polygon_area
+
+# Длинная сторона изображения, на котором ищутся области, пикселей
+WORK_SIZE = 2048
+# Радиус закрытия разрывов в стенах (дверных проемов), пикселей рабочего изображения
+GAP_RADIUS = 3
+# Допуск упрощения контура, пикселей рабочего изображения
+SIMPLIFY_TOLERANCE = 2.0
+# Доли площади плана: меньшие области — мусор, большие — коридоры и фон
+MIN_AREA_RATIO = 0.0005
+MAX_AREA_RATIO = 0.5
+
+# Соседи пикселя по часовой стрелке (ось y направлена вниз): (dy, dx)
+_DIRECTIONS = ((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1))
+# Направление на пиксель, проверенный перед найденным, относительно найденного
+_BACKTRACK = [
+    _DIRECTIONS.index((_DIRECTIONS[d - 1][0] - _DIRECTIONS[d][0], _DIRECTIONS[d - 1][1] - _DIRECTIONS[d][1]))
+    for d in range(8)
+]
+
+
+def read_gray(path):
+    """Изображение плана в оттенках серого как массив uint8 (высота, ширина)."""
+    image = QImageReader(path).read()
+    if image.isNull():
+        raise ValueError(f"Не удалось прочитать план {path}")
+    image = image.convertToFormat(QImage.Format_Grayscale8)
+    width, height = image.width(), image.height()
+    buffer = np.frombuffer(image.constBits(), np.uint8, count=image.bytesPerLine() * height)
+    return buffer.reshape(height, image.bytesPerLine())[:, :width].copy()
+
+
+def otsu_threshold(gray):
+    """Порог бинаризации Оцу по гистограмме яркости."""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(histogram)
+    total = weight[-1]
+    mean = np.cumsum(histogram * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * weight / total - mean) ** 2 / (weight * (total - weight))
+    return int(np.nanargmax(between[:-1]))
+
+
+def wall_mask(gray, work_size=WORK_SIZE):
+    """
+    Маска стен, уменьшенная до work_size по длинной стороне.
+    Возвращает (маска, коэффициент уменьшения).
+    """
+    walls = gray <= otsu_threshold(gray)
+    factor = max(1, math.ceil(max(walls.shape) / work_size))
+    if factor > 1:
+        height, width = walls.shape[0] // factor, walls.shape[1] // factor
+        walls = walls[:height * factor, :width * factor].reshape(height, factor, width, factor).any(axis=(1, 3))
+    return walls, factor
+
+
+def dilate(mask, radius):
+    """Расширение маски квадратом (2 * radius + 1) — отдельно по строкам и столбцам."""
+    if radius <= 0:
+        return mask
+    result = mask.copy()
+    for step in range(1, radius + 1):
+        result[:, step:] |= mask[:, :-step]
+        result[:, :-step] |= mask[:, step:]
+    rows = result.copy()
+    for step in range(1, radius + 1):
+        result[step:, :] |= rows[:-step, :]
+        result[:-step, :] |= rows[step:, :]
+    return result
+
+
+def find_runs(mask):
+    """Серии подряд идущих True в строках: массивы (строка, начало, конец), конец не включается."""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends
+
+
+def label_runs(rows, starts, ends, width):
+    """
+    Номера связных компонент (4-связность) для серий.
+    Серии соседних строк, перекрывающиеся по столбцам, соединяются ребрами;
+    компоненты находятся итеративным подвешиванием корней и сжатием путей.
+    """
+    count = len(rows)
+    if not count:
+        return np.zeros(0, np.int64)
+    stride = width + 1
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    # Для серии строки y — диапазон серий строки y-1 с end > start и start < end
+    first = np.searchsorted(end_keys, (rows - 1) * stride + starts, side="right")
+    last = np.searchsorted(start_keys, (rows - 1) * stride + ends, side="left")
+    pair_counts = np.maximum(last - first, 0)
+    a = np.repeat(np.arange(count), pair_counts)
+    offsets = np.arange(len(a)) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+    b = np.repeat(first, pair_counts) + offsets
+
+    labels = np.arange(count)
+    while True:
+        label_a = labels[a]
+        label_b = labels[b]
+        differ = label_a != label_b
+        if not differ.any():
+            break
+        smaller = np.minimum(label_a[differ], label_b[differ])
+        np.minimum.at(labels, label_a[differ], smaller)
+        np.minimum.at(labels, label_b[differ], smaller)
+        while True:
+            parents = labels[labels]
+            if np.array_equal(parents, labels):
+                break
+            labels = parents
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def trace_contour(mask):
+    """
+    Внешний контур области обходом соседей Мура.
+    mask — двумерный массив с рамкой из нулей. Возвращает [(x, y), ...].
+    """
+    grid = mask.tolist()
+    start_y = int(np.argmax(mask.any(axis=1)))
+    start_x = grid[start_y].index(True)
+    contour = [(start_x, start_y)]
+    y, x = start_y, start_x
+    # Начальный сосед слева заведомо фон
+    back = 4
+    first_move = None
+    for _ in range(4 * mask.size):
+        for k in range(1, 9):
+            direction = (back + k) % 8
+            dy, dx = _DIRECTIONS[direction]
+            if grid[y + dy][x + dx]:
+                break
+        else:
+            return contour  # одиночный пиксель
+        ny, nx = y + dy, x + dx
+        if first_move is None:
+            first_move = (ny, nx)
+        elif (y, x) == (start_y, start_x) and (ny, nx) == first_move:
+            break
+        back = _BACKTRACK[direction]
+        y, x = ny, nx
+        contour.append((x, y))
+    # Последняя точка совпадает с начальной
+    return contour[:-1] if len(contour) > 1 and contour[-1] == contour[0] else contour
+
+
+def detect_rooms(path, plan_size=None, existing=(), work_size=WORK_SIZE, gap_radius=GAP_RADIUS,
+                 tolerance=SIMPLIFY_TOLERANCE):
+    """
+    Находит замкнутые области на плане и возвращает кандидатов в кабинеты:
+    [{"points": [[x, y], ...], "area": площадь}, ...] в координатах плана
+    размера plan_size (по умолчанию — размер изображения). Области, внутри
+    которых уже есть кабинет из existing (списки точек), пропускаются.
+    """
+    gray = read_gray(path)
+    image_height, image_width = gray.shape
+    walls, factor = wall_mask(gray, work_size)
+    del gray
+    walls = dilate(walls, gap_radius)
+    height, width = walls.shape
+    plan_width, plan_height = plan_size or (image_width, image_height)
+    scale_x = plan_width / image_width * factor
+    scale_y = plan_height / image_height * factor
+
+    rows, starts, ends = find_runs(~walls)
+    labels = label_runs(rows, starts, ends, width)
+    if not len(labels):
+        return []
+    component_count = int(labels.max()) + 1
+    areas = np.bincount(labels, weights=ends - starts, minlength=component_count)
+    touches_border = np.zeros(component_count, bool)
+    border = (rows == 0) | (rows == height - 1) | (starts == 0) | (ends == width)
+    touches_border[labels[border]] = True
+    total = height * width
+    keep = ~touches_border & (areas >= total * MIN_AREA_RATIO) & (areas <= total * MAX_AREA_RATIO)
+
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(component_count + 1))
+    candidates = []
+    for label in np.nonzero(keep)[0]:
+        runs = order[bounds[label]:bounds[label + 1]]
+        run_rows, run_starts, run_ends = rows[runs], starts[runs], ends[runs]
+        # Внутренняя точка области: середина первой серии
+        inner_x = (run_starts[0] + run_ends[0]) / 2 * scale_x
+        inner_y = (run_rows[0] + 0.5) * scale_y
+        if any(point_in_polygon(inner_x, inner_y, points) for points in existing):
+            continue
+        top, left = int(run_rows.min()), int(run_starts.min())
+        pad = gap_radius + 1
+        mask = np.zeros((run_rows.max() - top + 1 + 2 * pad, run_ends.max() - left + 2 * pad), bool)
+        for row, start, end in zip(run_rows - top + pad, run_starts - left + pad, run_ends - left + pad):
+            mask[row, start:end] = True
+        # Область возвращается к середине стен, сжатых расширением
+        mask = dilate(mask, gap_radius)
+        contour = trace_contour(mask)
+        contour = simplify_polygon([[x, y] for x, y in contour], tolerance)
+        if len(contour) < 3:
+            continue
+        points = [[round((x + left - pad + 0.5) * scale_x, 2), round((y + top - pad + 0.5) * scale_y, 2)]
+                  for x, y in contour]
+        candidates.append({"points": points, "area": round(polygon_area(points), 2)})
+    # Сверху вниз и слева направо — в таком порядке кабинетам даются номера
+    candidates.sort(key=lambda c: (min(p[1] for p in c["points"]), min(p[0] for p in c["points"])))
+    return candidates
+
+
+class _DetectionSignals(QObject):
+    finished = Signal(object)
+    failed = Signal(str)
+
+
+class DetectionTask(QRunnable):
+    """Поиск кабинетов в пуле потоков; результат приходит сигналом finished(список кандидатов)."""
+
+    def __init__(self, path, plan_size, existing):
+        super().__init__()
+        self.path = path
+        self.plan_size = plan_size
+        self.existing = existing
+        self.signals = _DetectionSignals()
+
+    def run(self):
+        try:
+            candidates = detect_rooms(self.path, self.plan_size, self.existing)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(candidates)
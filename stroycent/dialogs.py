@@ -1,13 +1,31 @@
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
                                QComboBox, QGridLayout, QDateEdit, QPushButton, QListWidget, 
-                               QListWidgetItem, QInputDialog, QColorDialog, QMessageBox, QTextBrowser)
+                               QListWidgetItem, QInputDialog, QColorDialog, QMessageBox, QTextBrowser,
+                               QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog,
+                               QGraphicsTextItem, QSpinBox, QProgressBar, QScrollArea, QToolButton, QSlider)
 from PySide6.QtGui import QRegularExpressionValidator
 from PySide6.QtCore import QRegularExpression
-from PySide6.QtCore import Qt, QDate
-from PySide6.QtGui import QColor
-from stroycent.data_manager import data_store, save_data
+from PySide6.QtCore import Qt, QDate, QTimer, QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtWidgets import QApplication, QWidget
+from PySide6.QtGui import QColor, QPixmap, QIcon
+from stroycent.data_manager import (data_store, save_data, floor_name, building_floors, get_building,
+                                    validate_room, validate_changes, PAYMENT_TYPES, new_status_id,
+                                    after_save_callbacks, merge_callbacks, building_switch_callbacks)
 from stroycent.utils import debug_log
+from stroycent.history import history_store, TRACKED_FIELDS
+from stroycent.undo import RoomFieldsCommand, StatusCommand
+from stroycent import statuses
+from stroycent import perf
+from stroycent import export
+from stroycent import importer
+from stroycent import overview
+from stroycent import snapshots
+from stroycent import ledger
+from stroycent.ledger import ledger_store, room_labels, room_label
+from stroycent.rooms import validate_room_number
+from functools import partial
 import re
+import os
 
 class StatusEditorDialog(QDialog):
     def __init__(self, parent=None):
@@ -56,14 +74,18 @@ class StatusEditorDialog(QDialog):
             if bg_color.isValid():
                 text_color = QColorDialog.getColor(QColor(0, 0, 0, 255), self, "Выберите цвет текста")
                 if text_color.isValid():
+                    old_status = (name, data_store['statuses'][name]) if name in data_store['statuses'] else None
                     new_status = {
                         name: {
                             "bg": bg_color.name(QColor.HexArgb),
-                            "text": text_color.name()
+                            "text": text_color.name(),
+                            "id": old_status[1].get("id") if old_status else new_status_id()
                         }
                     }
+                    position = list(data_store['statuses']).index(name) if old_status else len(data_store['statuses'])
                     data_store['statuses'].update(new_status)
-                    self.parent().reload_statuses()
+                    self.parent().undo_stack.push(StatusCommand(old_status, (name, new_status[name]), position))
+                    self.parent().refresh_rooms(statuses.status_index.rooms(name))
                     save_data(data_store)
                     self.update_list()
                 
@@ -78,16 +100,23 @@ class StatusEditorDialog(QDialog):
         new_name, ok = QInputDialog.getText(self, "Изменить статус", "Новое название:", text=old_name)
         
         if ok and new_name:
+            if new_name != old_name and new_name in data_store['statuses']:
+                QMessageBox.warning(self, "Ошибка", f"Статус «{new_name}» уже есть.")
+                return
             new_bg_color = QColorDialog.getColor(QColor(old_colors['bg']), self, "Выберите новый цвет фона")
             new_text_color = QColorDialog.getColor(QColor(old_colors['text']), self, "Выберите новый цвет текста")
 
             if new_bg_color.isValid() and new_text_color.isValid():
-                data_store['statuses'].pop(old_name)
-                data_store['statuses'][new_name] = {
+                position = list(data_store['statuses']).index(old_name)
+                old_status = (old_name, data_store['statuses'][old_name])
+                # Кабинеты статуса переименовываются вместе с ним (только они, по индексу)
+                rooms = statuses.rename_status(old_name, new_name, {
                     "bg": new_bg_color.name(QColor.HexArgb),
                     "text": new_text_color.name()
-                }
-                self.parent().reload_statuses()
+                })
+                new_status = (new_name, data_store['statuses'][new_name])
+                self.parent().undo_stack.push(StatusCommand(old_status, new_status, position, rooms))
+                self.parent().refresh_rooms(rooms)
                 save_data(data_store)
                 self.update_list()
 
@@ -98,8 +127,24 @@ class StatusEditorDialog(QDialog):
             
         name = current_item.text()
         if name in data_store['statuses']:
-            del data_store['statuses'][name]
-            self.parent().reload_statuses()
+            others = [status for status in data_store['statuses'] if status != name]
+            if not others:
+                QMessageBox.warning(self, "Ошибка", "Нельзя удалить единственный статус.")
+                return
+            replacement = others[0]
+            count = statuses.status_index.count(name)
+            if count:
+                replacement, ok = QInputDialog.getItem(
+                    self, "Удаление статуса",
+                    f"Кабинетов со статусом «{name}»: {count}.\nКакой статус им назначить?",
+                    others, 0, False)
+                if not ok:
+                    return
+            position = list(data_store['statuses']).index(name)
+            old_status = (name, data_store['statuses'][name])
+            rooms = statuses.remove_status(name, replacement)
+            self.parent().undo_stack.push(StatusCommand(old_status, None, position, rooms, replacement))
+            self.parent().refresh_rooms(rooms)
             save_data(data_store)
             self.update_list()
 
@@ -109,17 +154,11 @@ class RoomDialog(QDialog):
         self.parent_window = parent
         self.room_data = room_data
 
-        floor_names_map = {
-            "0": "Цокольный этаж", "1": "1 этаж", "2": "2 этаж",
-            "3": "3 этаж", "4": "4 этаж", "5": "5 этаж"
-        }
-        
         room_number = self.room_data.get('number', '')
         if not room_number or room_number == "Новый":
             self.setWindowTitle("Введите данные о кабинете")
         else:
-            floor_name = floor_names_map.get(str(self.room_data.get('floor')), 'Неизвестный этаж')
-            self.setWindowTitle(f"Информация о кабинете № {room_number} на {floor_name}")
+            self.setWindowTitle(f"Информация о кабинете № {room_number} на {floor_name(self.room_data.get('floor'))}")
 
         layout = QGridLayout()
         self.inputs = {}
@@ -131,6 +170,7 @@ class RoomDialog(QDialog):
             ("Имя арендатора", QLineEdit, False),
             ("Юридическое наименование арендатора", QLineEdit, False),
             ("Тип оплаты", QComboBox, False),
+            ("Ставка аренды, руб./мес.", QLineEdit, False),
             ("Дата заезда", QDateEdit, False),
             ("Дата выезда", QDateEdit, False),
             ("Статус", QComboBox, False)
@@ -144,8 +184,7 @@ class RoomDialog(QDialog):
                 widget = QLineEdit()
                 widget.setReadOnly(read_only)
                 if label_text == "Этаж":
-                    floor_name_display = floor_names_map.get(str(self.room_data.get('floor')), 'Неизвестный этаж')
-                    widget.setText(floor_name_display)
+                    widget.setText(floor_name(self.room_data.get('floor')))
                 if label_text == "ИНН арендатора":
                     widget = QLineEdit()
                     widget.setMaxLength(12)
@@ -158,6 +197,14 @@ class RoomDialog(QDialog):
                     self.inputs[label_text] = widget
                     row += 1
                     continue
+                if label_text == "Ставка аренды, руб./мес.":
+                    widget.setValidator(QRegularExpressionValidator(QRegularExpression(r"\d{0,9}([.,]\d{0,2})?")))
+                    widget.setText(str(self.room_data.get("rent", "")))
+                    layout.addWidget(lbl, row, 0)
+                    layout.addWidget(widget, row, 1)
+                    self.inputs[label_text] = widget
+                    row += 1
+                    continue
                 else:
                     key = self.get_data_key(label_text)
                     widget.setText(str(self.room_data.get(key, "")))
@@ -165,8 +212,7 @@ class RoomDialog(QDialog):
                     widget = QLineEdit()
                     widget.setReadOnly(read_only)
                     if label_text == "Этаж":
-                        floor_name_display = floor_names_map.get(str(self.room_data.get('floor')), 'Неизвестный этаж')
-                        widget.setText(floor_name_display)
+                        widget.setText(floor_name(self.room_data.get('floor')))
                     else:
                         key = self.get_data_key(label_text)
                         widget.setText(str(self.room_data.get(key, "")))
@@ -188,7 +234,7 @@ class RoomDialog(QDialog):
             elif widget_type == QComboBox:
                 widget = QComboBox()
                 if label_text == "Тип оплаты":
-                    widget.addItems(["Наличные", "Безналичные"])
+                    widget.addItems(PAYMENT_TYPES)
                     widget.setCurrentText(self.room_data.get("payment_type", "Наличные"))
                 elif label_text == "Статус":
                     widget.addItems(data_store["statuses"].keys())
@@ -199,6 +245,15 @@ class RoomDialog(QDialog):
             self.inputs[label_text] = widget
             row += 1
         
+        # Задолженность по журналу платежей и внесение оплаты
+        self.balance_label = QLabel()
+        payment_btn = QPushButton("Внести оплату...")
+        payment_btn.clicked.connect(self.add_payment)
+        layout.addWidget(self.balance_label, row, 0)
+        layout.addWidget(payment_btn, row, 1)
+        row += 1
+        self.update_balance()
+
         # Кнопки сохранения, очистки и удаления
         save_btn = QPushButton("Сохранить")
         clear_btn = QPushButton("Очистить данные")
@@ -221,6 +276,7 @@ class RoomDialog(QDialog):
             "Имя арендатора": "client_name",
             "Юридическое наименование арендатора": "renter_name",
             "Тип оплаты": "payment_type",
+            "Ставка аренды, руб./мес.": "rent",
             "Дата заезда": "entry_date",
             "Дата выезда": "exit_date",
             "Статус": "status",
@@ -236,6 +292,8 @@ class RoomDialog(QDialog):
                 continue
             if isinstance(widget, QLineEdit):
                 data[key] = widget.text() if not clear else ""
+                if key == "rent":
+                    data[key] = data[key].replace(",", ".")
             elif isinstance(widget, QComboBox):
                 data[key] = widget.currentText() if not clear else "Наличные" if key == "payment_type" else "свободный"
             elif isinstance(widget, QDateEdit):
@@ -243,28 +301,40 @@ class RoomDialog(QDialog):
         return data
     
 
-    def validate_data(self, data):
-        # Номер кабинета обязателен и не пустой
-        if not data.get("number") or data["number"].strip() == "":
-            QMessageBox.warning(self, "Ошибка", "Номер кабинета не может быть пустым.")
-            return False
+    def update_balance(self):
+        balance = ledger_store.balance(self.room_data)
+        text = f"Задолженность: {balance:,.2f} руб." if balance > 0 else f"Переплата: {-balance:,.2f} руб." \
+            if balance < 0 else "Задолженности нет"
+        self.balance_label.setText(text.replace(",", " "))
 
+    def add_payment(self):
+        amount, ok = QInputDialog.getDouble(self, "Оплата", "Сумма оплаты, руб.:",
+                                            max(ledger_store.balance(self.room_data), 0.0), 0.0, 1e9, 2)
+        if not ok or amount <= 0:
+            return
+        ledger_store.add_payment(self.room_data, amount)
+        ledger_store.flush()
+        self.update_balance()
+        self.parent_window.status.showMessage(
+            f"Оплата {amount:.2f} руб. по кабинету {self.room_data.get('number')} записана.")
 
-        # Даты: дата выезда не может быть раньше даты заезда
-        entry_date = QDate.fromString(data.get("entry_date", ""), "yyyy-MM-dd")
-        exit_date = QDate.fromString(data.get("exit_date", ""), "yyyy-MM-dd")
-        if exit_date < entry_date:
-            QMessageBox.warning(self, "Ошибка", "Дата выезда не может быть раньше даты заезда.")
+    def validate_data(self, data):
+        # Правила общие с массовым импортом (data_manager.validate_room)
+        errors = validate_room(data) or validate_room_number(self.room_data, data.get("number"))
+        if errors:
+            QMessageBox.warning(self, "Ошибка", errors[0])
             return False
-
         return True
 
     def save_and_accept(self):
         new_data = self.get_data()
         if not self.validate_data(new_data):
             return
+        old_values = {field: self.room_data.get(field) for field in TRACKED_FIELDS}
         self.room_data.update(new_data)
+        history_store.record_changes(self.room_data, old_values)
         save_data(data_store)
+        self.parent_window.undo_stack.push(RoomFieldsCommand(self.room_data, old_values))
         self.accept()
         self.parent_window.update_legend()
         self.parent_window.status.showMessage(f"Данные кабинета {self.room_data.get('number')} сохранены.")
@@ -284,7 +354,8 @@ class RoomDialog(QDialog):
             self.reject()
 
     def clear_data_only(self):
-        debug_log(f"Очистка данных кабинета {self.room_data.get('number')}")
+        debug_log("Очистка данных кабинета %s", self.room_data.get('number'))
+        old_values = {field: self.room_data.get(field) for field in TRACKED_FIELDS}
         self.room_data.update({
             "inn": "",
             "client_name": "",
@@ -294,6 +365,8 @@ class RoomDialog(QDialog):
             "exit_date": QDate.currentDate().toString("yyyy-MM-dd"),
             "status": "свободный"
         })
+        history_store.record_changes(self.room_data, old_values)
+        self.parent_window.undo_stack.push(RoomFieldsCommand(self.room_data, old_values, "очистка данных кабинета"))
         for label_text, widget in self.inputs.items():
             key = self.get_data_key(label_text)
             if key in self.room_data:
@@ -308,7 +381,7 @@ class RoomDialog(QDialog):
         self.parent_window.update_legend()
 
     def delete_room(self):
-        debug_log(f"Начало процесса удаления кабинета {self.room_data.get('number')}")
+        debug_log("Начало процесса удаления кабинета %s", self.room_data.get('number'))
         self.parent_window.delete_room_from_scene_and_data(self.room_data)
         self.reject()
 
@@ -325,27 +398,44 @@ class InstructionsDialog(QDialog):
         <h1 style='color: #444;'>Инструкция по использованию</h1>
         <p>Добро пожаловать в приложение для управления планом здания. Вот как им пользоваться:</p>
         
-        <h2>Кнопки этажей:</h2>
+        <h2>Здания и этажи:</h2>
         <ul>
-            <li><b>Цокольный этаж, 1 этаж, ...:</b> Используйте эти кнопки для переключения между этажами здания.</li>
+            <li><b>Здание / Этаж:</b> Выберите здание и этаж в списках над планом. Данные здания загружаются при его выборе.</li>
+            <li><b>Здания и этажи:</b> Добавление и переименование зданий, добавление, переименование и удаление этажей (удалить можно только этаж без кабинетов).</li>
         </ul>
         
         <h2>Управление планом:</h2>
         <ul>
-            <li><b>Увеличить / Уменьшить:</b> Изменение масштаба плана.</li>
+            <li><b>Увеличить / Уменьшить:</b> Изменение масштаба плана. Масштаб также меняется колесом мыши, прокруткой и щипком на тачпаде — плавно, относительно точки под курсором. Во время масштабирования мелкие подписи кабинетов временно скрываются.</li>
             <li><b>Подогнать под экран:</b> Автоматически масштабирует план, чтобы он полностью поместился в окно.</li>
             <li><b>Загрузить план:</b> Позволяет загрузить изображение (PNG, JPG, BMP) как план текущего этажа.</li>
+            <li><b>Слои:</b> Включение и выключение слоев пометок (двери, счетчики, пожарное оборудование, кабельные трассы) и добавление новых пометок. Правый клик по пометке удаляет ее.</li>
+            <li><b>Тепловая карта:</b> В меню «Слои» → «Тепловая карта» кабинеты этажа можно окрасить по числу дней без арендатора (с даты выезда последнего арендатора) или по числу дней до конца аренды занятых кабинетов. Легенда в строке состояния показывает интервалы и количество кабинетов в каждом; серым окрашены кабинеты, к которым режим не относится или у которых нет даты выезда.</li>
+            <li><b>Обзор этажа:</b> Уменьшенный план справа с рамкой видимой области. Клик или перетаскивание рамки перемещает план. Панель включается и выключается в меню «Слои».</li>
+            <li><b>Импорт:</b> Загрузка данных арендаторов из CSV или XLSX. Строки сопоставляются с кабинетами по этажу и номеру или по ИНН и проверяются так же, как в окне кабинета. Перед применением показывается сводка с ошибками; все изменения применяются и отменяются одной операцией.</li>
+            <li><b>Обзор здания:</b> Миниатюры всех этажей с кабинетами, закрашенными по статусам, и количеством кабинетов по статусам. Клик по миниатюре открывает этаж. Миниатюры рисуются в фоне и хранятся в папке <code>assets/overview</code>; заново рисуются только изменившиеся этажи.</li>
+            <li><b>Экспорт:</b> Сохранение планов выбранных этажей с кабинетами и легендой в PDF (страница на этаж) или PNG (файл на этаж). Окно можно не закрывать: экспорт идет в фоне. Тот же экспорт доступен из командной строки: <code>python -m stroycent.export -o планы.pdf</code>.</li>
+            <li><b>Снимки:</b> Резервные снимки данных здания делаются в фоне через заданное число минут (если данные изменились) и хранятся сжатыми в папке <code>snapshots</code> рядом с файлом данных: все снимки за последние часы и по одному в день за последние дни. В окне можно сделать снимок вручную, посмотреть, чем снимок отличается от текущих данных, и восстановить его; перед восстановлением текущие данные сохраняются в новый снимок.</li>
+            <li><b>Платежи:</b> Журнал начислений, оплат и потерь от простоя. Ставка аренды (руб. в месяц) указывается в окне кабинета, там же вносится оплата и виден остаток задолженности. Кнопка «Начислить аренду за месяц» начисляет аренду сданным кабинетам и учитывает простой свободных; повторное начисление за тот же месяц пропускается. Отчет показывает выручку, задолженность и простой по месяцам, этажам, статусам и типам оплаты. Журнал хранится в <code>building_ledger.json</code> рядом с файлом данных; оплаты загружаются из CSV/XLSX бухгалтерии и выгружаются в CSV.</li>
+            <li><b>API:</b> Включает локальный HTTP/JSON API (только 127.0.0.1, порт 8765) для скриптов учета и контроля доступа: кабинеты, этажи, статусы, поиск и сводные количества. Изменения кабинетов принимаются с токеном из файла <code>api_token.txt</code> рядом с файлом данных. Без интерфейса: <code>python -m stroycent.api</code>.</li>
+            <li><b>Нормализация контуров:</b> Координаты кабинетов сохраняются с округлением до 0,1 пикселя плана, повторяющиеся вершины и вершины на прямой удаляются. Контуры, нарисованные раньше, приводятся к тому же виду командой <code>python -m stroycent.normalize_geometry</code> (с <code>--dry-run</code> — только отчет).</li>
+            <li><b>F12:</b> Окно замеров производительности (время загрузки этажа, сохранения, отрисовки кадра и т.д.).</li>
+            <li><b>Отменить / Повторить (Ctrl+Z / Ctrl+Shift+Z):</b> Отмена и повтор добавления, удаления, изменения формы и данных кабинетов, а также изменения статусов.</li>
         </ul>
         
         <h2>Управление кабинетами:</h2>
         <ul>
             <li><b>Добавить кабинет:</b> Активирует режим рисования. Кликните левой кнопкой мыши по плану, чтобы добавить точки полигона. Правый клик завершает рисование и сохраняет новый кабинет.</li>
-            <li><b>Изменить статусы кабинетов:</b> Открывает диалог для добавления, изменения или удаления статусов (например, "свободный", "занят") и их цветов.</li>
+            <li><b>Номер кабинета:</b> Номер можно менять: кабинет определяется постоянным идентификатором, который присваивается при создании (в старых файлах — при первой загрузке), поэтому контур, история изменений, задолженность и слияние с другими копиями программы не теряют кабинет. Номер должен быть уникальным на этаже; повторы из старых файлов записываются в лог при загрузке.</li>
+            <li><b>Изменить статусы кабинетов:</b> Открывает диалог для добавления, изменения или удаления статусов (например, "свободный", "занят") и их цветов. При переименовании статуса кабинеты на всех этажах получают новое название, а при удалении — статус, который вы выберете.</li>
         </ul>
         
         <h2>Работа с полигоном кабинета:</h2>
         <ul>
             <li><b>Клик по кабинету:</b> Открывает модальное окно для ввода и редактирования информации о кабинете (номер, арендатор, даты, статус).</li>
+            <li><b>Найти кабинеты:</b> Ищет на загруженном плане замкнутые помещения и показывает их пунктиром. Снимите отметку с лишних помещений и нажмите «Добавить отмеченные» — они будут добавлены как свободные кабинеты (действие можно отменить).</li>
+            <li><b>Шкала времени:</b> Отметьте «Шкала времени» под планом и двигайте ползунок (шаг — день, кнопка «Сегодня» возвращает к текущей дате): занятые кабинеты, срок аренды которых на выбранную дату не начался или закончился, окрашиваются как свободные. Срок берется из дат заезда и выезда; пустая дата означает срок без ограничения.</li>
+            <li><b>Ctrl+клик / Shift+перетаскивание:</b> Выделение нескольких кабинетов (по одному или рамкой). Под планом появляется панель, которая меняет статус, тип оплаты или даты сразу у всех выделенных кабинетов одной операцией.</li>
             <li><b>В модальном окне:</b>
                 <ul>
                     <li><b>Сохранить:</b> Сохраняет введенные данные.</li>
@@ -381,6 +471,7 @@ class ReportDialog(QDialog):
         self.setLayout(layout)
         self.update_report()
         
+    @perf.timed("update_report")
     def update_report(self):
         html_content = ""
         total_rooms = 0
@@ -392,7 +483,7 @@ class ReportDialog(QDialog):
                 status = room_data.get("status", "свободный")
                 status_counts[status] = status_counts.get(status, 0) + 1
         
-        html_content += f"<h2>Сводка по всем кабинетам</h2>"
+        html_content += f"<h2>Сводка по всем кабинетам: {get_building()['name']}</h2>"
         html_content += f"<p>Всего кабинетов: <b>{total_rooms}</b></p>"
         
         if total_rooms > 0:
@@ -404,17 +495,13 @@ class ReportDialog(QDialog):
         
         html_content += "<h3>Разбивка по этажам:</h3>"
         
-        floor_names_map = {
-            "0": "Цокольный этаж", "1": "1 этаж", "2": "2 этаж",
-            "3": "3 этаж", "4": "4 этаж", "5": "5 этаж"
-        }
-        
-        sorted_floors = sorted(data_store["floors"].keys(), key=int)
+        # Этажи в порядке навигатора; этажи без описания в манифесте — в конце
+        sorted_floors = [floor["key"] for floor in building_floors() if floor["key"] in data_store["floors"]]
+        sorted_floors += [key for key in data_store["floors"] if key not in sorted_floors]
         
         for floor_key in sorted_floors:
             floor_data = data_store["floors"][floor_key]
             rooms_on_floor = floor_data.get("rooms", [])
-            floor_name = floor_names_map.get(floor_key, f"{floor_key} этаж")
             
             floor_status_counts = {status: 0 for status in data_store['statuses'].keys()}
             
@@ -422,7 +509,7 @@ class ReportDialog(QDialog):
                 status = room.get("status", "свободный")
                 floor_status_counts[status] = floor_status_counts.get(status, 0) + 1
             
-            html_content += f"<p><b>{floor_name}</b> (Всего кабинетов: {len(rooms_on_floor)})</p><ul>"
+            html_content += f"<p><b>{floor_name(floor_key)}</b> (Всего кабинетов: {len(rooms_on_floor)})</p><ul>"
             
             for status, count in floor_status_counts.items():
                 if count > 0:
@@ -431,3 +518,1034 @@ class ReportDialog(QDialog):
             html_content += "</ul>"
             
         self.report_text.setHtml(html_content)
+
+
+class PerfDialog(QDialog):
+    """Немодальное окно с замерами производительности и количеством элементов сцены."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent_window = parent
+        self.setWindowTitle("Производительность")
+        self.resize(600, 420)
+        self.setModal(False)
+
+        layout = QVBoxLayout()
+        self.enabled_checkbox = QCheckBox("Включить замеры")
+        self.enabled_checkbox.setChecked(perf.enabled)
+        self.enabled_checkbox.toggled.connect(perf.set_enabled)
+        layout.addWidget(self.enabled_checkbox)
+
+        self.scene_label = QLabel()
+        layout.addWidget(self.scene_label)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Операция", "Вызовов", "Последний, мс", "p95, мс", "Макс., мс"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        reset_btn = QPushButton("Сбросить")
+        export_btn = QPushButton("Экспорт в JSON")
+        close_btn = QPushButton("Закрыть")
+        reset_btn.clicked.connect(self.reset)
+        export_btn.clicked.connect(self.export)
+        close_btn.clicked.connect(self.hide)
+        buttons_layout.addWidget(reset_btn)
+        buttons_layout.addWidget(export_btn)
+        buttons_layout.addWidget(close_btn)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+        # Таблица обновляется только пока окно открыто
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start(1000)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def scene_counts(self):
+        items = self.parent_window.scene.items()
+        return {
+            "scene_items": len(items),
+            "text_items": sum(1 for item in items if isinstance(item, QGraphicsTextItem)),
+            "rooms": len(self.parent_window.room_items),
+            "layers": len(self.parent_window.layer_items),
+        }
+
+    def refresh(self):
+        counts = self.scene_counts()
+        self.scene_label.setText(
+            f"Элементов сцены: {counts['scene_items']} (текстовых: {counts['text_items']}), "
+            f"кабинетов: {counts['rooms']}, слоев: {counts['layers']}"
+        )
+        stats = perf.stats()
+        self.table.setRowCount(len(stats))
+        for row, (name, values) in enumerate(sorted(stats.items())):
+            cells = [name, str(values["count"]), f"{values['last_ms']:.2f}",
+                     f"{values['p95_ms']:.2f}", f"{values['max_ms']:.2f}"]
+            for column, text in enumerate(cells):
+                self.table.setItem(row, column, QTableWidgetItem(text))
+
+    def reset(self):
+        perf.reset()
+        self.refresh()
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Экспорт замеров", "perf_report.json", "JSON (*.json)")
+        if path:
+            perf.export_json(path, {"scene": self.scene_counts()})
+            self.parent_window.status.showMessage(f"Замеры сохранены: {path}")
+
+
+class _ExportSignals(QObject):
+    progress = Signal(int, int)
+    finished = Signal(list)
+    failed = Signal(str)
+
+
+class _ExportTask(QRunnable):
+    """Экспорт в пуле потоков: сами этажи рисуются в отдельных процессах."""
+
+    def __init__(self, jobs, output, fmt):
+        super().__init__()
+        self.jobs = jobs
+        self.output = output
+        self.fmt = fmt
+        self.signals = _ExportSignals()
+
+    def run(self):
+        try:
+            files = export.export_floors(self.jobs, self.output, self.fmt, progress=self.signals.progress.emit)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(files)
+
+
+class ExportDialog(QDialog):
+    """Немодальное окно экспорта планов этажей текущего здания в PNG или PDF."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent_window = parent
+        self.task = None
+        self.setWindowTitle("Экспорт планов этажей")
+        self.resize(460, 480)
+        self.setModal(False)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"Этажи здания «{get_building()['name']}»:"))
+        self.floor_list = QListWidget()
+        for floor in building_floors():
+            item = QListWidgetItem(floor["name"])
+            item.setData(Qt.UserRole, floor["key"])
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            self.floor_list.addItem(item)
+        layout.addWidget(self.floor_list)
+
+        options_layout = QGridLayout()
+        options_layout.addWidget(QLabel("Формат"), 0, 0)
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(["PDF (многостраничный)", "PNG (файл на этаж)"])
+        self.format_combo.currentIndexChanged.connect(self.update_output_suffix)
+        options_layout.addWidget(self.format_combo, 0, 1)
+        options_layout.addWidget(QLabel("Ширина, пикселей"), 1, 0)
+        self.width_spin = QSpinBox()
+        self.width_spin.setRange(800, 8000)
+        self.width_spin.setSingleStep(500)
+        self.width_spin.setValue(export.DEFAULT_WIDTH)
+        options_layout.addWidget(self.width_spin, 1, 1)
+        options_layout.addWidget(QLabel("Сохранить в"), 2, 0)
+        output_layout = QHBoxLayout()
+        self.output_edit = QLineEdit("планы_этажей.pdf")
+        browse_btn = QPushButton("Обзор...")
+        browse_btn.clicked.connect(self.choose_output)
+        output_layout.addWidget(self.output_edit)
+        output_layout.addWidget(browse_btn)
+        options_layout.addLayout(output_layout, 2, 1)
+        layout.addLayout(options_layout)
+
+        self.progress = QProgressBar()
+        self.progress.setValue(0)
+        layout.addWidget(self.progress)
+
+        buttons_layout = QHBoxLayout()
+        self.export_btn = QPushButton("Экспорт")
+        self.export_btn.clicked.connect(self.start_export)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.hide)
+        buttons_layout.addWidget(self.export_btn)
+        buttons_layout.addWidget(close_btn)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def is_pdf(self):
+        return self.format_combo.currentIndex() == 0
+
+    def update_output_suffix(self):
+        path = self.output_edit.text()
+        if self.is_pdf() and not path.lower().endswith(".pdf"):
+            self.output_edit.setText(path.rstrip("/\\") + ".pdf")
+        elif not self.is_pdf() and path.lower().endswith(".pdf"):
+            self.output_edit.setText(path[:-4])
+
+    def choose_output(self):
+        if self.is_pdf():
+            path, _ = QFileDialog.getSaveFileName(self, "Сохранить PDF", self.output_edit.text(), "PDF (*.pdf)")
+        else:
+            path = QFileDialog.getExistingDirectory(self, "Папка для PNG")
+        if path:
+            self.output_edit.setText(path)
+
+    def selected_floors(self):
+        keys = set()
+        for row in range(self.floor_list.count()):
+            item = self.floor_list.item(row)
+            if item.checkState() == Qt.Checked:
+                keys.add(item.data(Qt.UserRole))
+        return keys
+
+    def start_export(self):
+        if self.task is not None:
+            return
+        floor_keys = self.selected_floors()
+        output = self.output_edit.text().strip()
+        if not floor_keys or not output:
+            QMessageBox.warning(self, "Ошибка", "Выберите этажи и путь для сохранения.")
+            return
+        # Данные копируются в задания сразу, поэтому дальнейшая работа в окне не влияет на экспорт
+        jobs = export.build_jobs(floor_keys, width=self.width_spin.value())
+        self.task = _ExportTask(jobs, output, "pdf" if self.is_pdf() else "png")
+        self.task.signals.progress.connect(self.on_progress)
+        self.task.signals.finished.connect(self.on_finished)
+        self.task.signals.failed.connect(self.on_failed)
+        self.export_btn.setEnabled(False)
+        self.progress.setRange(0, len(jobs))
+        self.progress.setValue(0)
+        QThreadPool.globalInstance().start(self.task)
+        self.parent_window.status.showMessage(f"Экспорт этажей: 0/{len(jobs)}")
+
+    def on_progress(self, done, total):
+        self.progress.setValue(done)
+        self.parent_window.status.showMessage(f"Экспорт этажей: {done}/{total}")
+
+    def on_finished(self, files):
+        self.task = None
+        self.export_btn.setEnabled(True)
+        target = files[0] if len(files) == 1 else os.path.dirname(files[0]) if files else ""
+        self.parent_window.status.showMessage(f"Экспорт завершен: {target}")
+
+    def on_failed(self, error):
+        self.task = None
+        self.export_btn.setEnabled(True)
+        self.parent_window.status.showMessage("Ошибка экспорта.")
+        QMessageBox.warning(self, "Ошибка", f"Не удалось выполнить экспорт: {error}")
+
+
+class ImportDialog(QDialog):
+    """
+    Массовый импорт данных арендаторов из CSV/XLSX.
+    Сначала файл разбирается и показывается сводка с ошибками,
+    затем изменения применяются одной операцией.
+    """
+    MAX_SHOWN_ERRORS = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent_window = parent
+        self.result = None
+        self.setWindowTitle("Импорт данных арендаторов")
+        self.resize(640, 480)
+
+        layout = QVBoxLayout()
+        hint = QLabel("Столбцы: Этаж, Номер кабинета или ИНН арендатора, а также любые из полей "
+                      "окна кабинета (Имя арендатора, Юридическое наименование арендатора, "
+                      "Тип оплаты, Дата заезда, Дата выезда, Статус). Пустые ячейки не меняют данные.")
+        hint.setWordWrap(True)
+        layout.addWidget(hint)
+
+        file_layout = QHBoxLayout()
+        self.path_edit = QLineEdit()
+        self.path_edit.setReadOnly(True)
+        browse_btn = QPushButton("Выбрать файл...")
+        browse_btn.clicked.connect(self.choose_file)
+        file_layout.addWidget(self.path_edit)
+        file_layout.addWidget(browse_btn)
+        layout.addLayout(file_layout)
+
+        self.summary = QTextBrowser()
+        layout.addWidget(self.summary)
+
+        buttons_layout = QHBoxLayout()
+        self.apply_btn = QPushButton("Применить")
+        self.apply_btn.setEnabled(False)
+        self.apply_btn.clicked.connect(self.apply)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.apply_btn)
+        buttons_layout.addWidget(close_btn)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def choose_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Файл для импорта", "", "Таблицы (*.csv *.xlsx)")
+        if path:
+            self.path_edit.setText(path)
+            self.load(path)
+
+    def load(self, path):
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self.result = importer.plan_import(path)
+        except Exception as e:
+            self.result = None
+            self.summary.setHtml(f"<p><b>Не удалось прочитать файл:</b> {e}</p>")
+            self.apply_btn.setEnabled(False)
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        changes = self.result.changes
+        errors = self.result.errors
+        html = (f"<p>Строк в файле: <b>{self.result.rows}</b>, сопоставлено без ошибок: "
+                f"<b>{self.result.matched_rows}</b>.<br>Будет изменено кабинетов: <b>{len(changes)}</b>.</p>")
+        if errors:
+            html += f"<h3>Ошибки ({len(errors)}):</h3><ul>"
+            for row_number, message in errors[:self.MAX_SHOWN_ERRORS]:
+                html += f"<li>Строка {row_number}: {message}</li>"
+            if len(errors) > self.MAX_SHOWN_ERRORS:
+                html += f"<li>… и еще {len(errors) - self.MAX_SHOWN_ERRORS}</li>"
+            html += "</ul>"
+        self.summary.setHtml(html)
+        self.apply_btn.setEnabled(bool(changes))
+
+    def apply(self):
+        changes = self.result.changes if self.result else []
+        if not changes:
+            return
+        self.parent_window.apply_room_changes(changes, f"импорт из {os.path.basename(self.result.path)}")
+        self.parent_window.status.showMessage(f"Импорт завершен: изменено кабинетов {len(changes)}.")
+        self.accept()
+
+
+class BulkEditPanel(QWidget):
+    """
+    Панель группового редактирования выделенных на плане кабинетов
+    (Ctrl+клик или Shift+рамка). Выбранные поля меняются у всех кабинетов
+    одной операцией: одно сохранение, одно обновление сцены и легенды.
+    """
+    KEEP = "— не менять —"
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent_window = parent
+        self.rooms = []
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.count_label = QLabel()
+        layout.addWidget(self.count_label)
+
+        layout.addWidget(QLabel("Статус:"))
+        self.status_combo = QComboBox()
+        layout.addWidget(self.status_combo)
+
+        layout.addWidget(QLabel("Тип оплаты:"))
+        self.payment_combo = QComboBox()
+        self.payment_combo.addItem(self.KEEP)
+        self.payment_combo.addItems(PAYMENT_TYPES)
+        layout.addWidget(self.payment_combo)
+
+        self.entry_check = QCheckBox("Дата заезда:")
+        self.entry_edit = self._date_edit()
+        self.entry_check.toggled.connect(self.entry_edit.setEnabled)
+        layout.addWidget(self.entry_check)
+        layout.addWidget(self.entry_edit)
+
+        self.exit_check = QCheckBox("Дата выезда:")
+        self.exit_edit = self._date_edit()
+        self.exit_check.toggled.connect(self.exit_edit.setEnabled)
+        layout.addWidget(self.exit_check)
+        layout.addWidget(self.exit_edit)
+
+        apply_btn = QPushButton("Применить к выделенным")
+        apply_btn.clicked.connect(self.apply)
+        clear_btn = QPushButton("Снять выделение")
+        clear_btn.clicked.connect(self.parent_window.scene.clearSelection)
+        layout.addWidget(apply_btn)
+        layout.addWidget(clear_btn)
+        layout.addStretch()
+
+    def _date_edit(self):
+        widget = QDateEdit(QDate.currentDate())
+        widget.setCalendarPopup(True)
+        widget.setDisplayFormat("dd.MM.yyyy")
+        widget.setEnabled(False)
+        return widget
+
+    def set_rooms(self, rooms):
+        self.rooms = rooms
+        self.count_label.setText(f"Выбрано кабинетов: {len(rooms)}")
+        current = self.status_combo.currentText()
+        self.status_combo.clear()
+        self.status_combo.addItem(self.KEEP)
+        self.status_combo.addItems(list(data_store["statuses"].keys()))
+        self.status_combo.setCurrentText(current if current else self.KEEP)
+
+    def new_values(self):
+        values = {}
+        if self.status_combo.currentText() != self.KEEP:
+            values["status"] = self.status_combo.currentText()
+        if self.payment_combo.currentText() != self.KEEP:
+            values["payment_type"] = self.payment_combo.currentText()
+        if self.entry_check.isChecked():
+            values["entry_date"] = self.entry_edit.date().toString("yyyy-MM-dd")
+        if self.exit_check.isChecked():
+            values["exit_date"] = self.exit_edit.date().toString("yyyy-MM-dd")
+        return values
+
+    def apply(self):
+        values = self.new_values()
+        if not values or not self.rooms:
+            self.parent_window.status.showMessage("Выберите, какие поля изменить.")
+            return
+        changes = []
+        errors = []
+        for room_data in self.rooms:
+            # Проверяются только изменяемые поля (как при импорте)
+            room_errors = validate_changes(room_data, values, data_store["statuses"])
+            if room_errors:
+                errors.append(f"Кабинет {room_data.get('number')}: {room_errors[0]}")
+            else:
+                changes.append((room_data, {f: v for f, v in values.items() if room_data.get(f) != v}))
+        if errors:
+            QMessageBox.warning(self, "Ошибка", "Изменения не применены:\n" + "\n".join(errors[:20]))
+            return
+        changes = [(room_data, room_values) for room_data, room_values in changes if room_values]
+        self.parent_window.apply_room_changes(changes, f"групповое изменение кабинетов ({len(self.rooms)})")
+        self.parent_window.status.showMessage(f"Изменено кабинетов: {len(changes)}.")
+
+
+class TimelinePanel(QWidget):
+    """
+    Шкала времени под планом: при включенной шкале кабинеты этажа
+    окрашиваются по тому, сданы ли они на выбранную дату (по датам аренды).
+    Шаг ползунка — один день.
+    """
+    RANGE_DAYS = 5 * 365
+    date_changed = Signal(object)  # строка ISO или None, если шкала выключена
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.enable_check = QCheckBox("Шкала времени:")
+        self.enable_check.setToolTip("Показать, какие кабинеты сданы на выбранную дату")
+        self.enable_check.toggled.connect(self.on_toggled)
+        layout.addWidget(self.enable_check)
+
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setRange(-self.RANGE_DAYS, self.RANGE_DAYS)
+        self.slider.setPageStep(30)
+        self.slider.setEnabled(False)
+        self.slider.valueChanged.connect(self.on_value_changed)
+        layout.addWidget(self.slider, 1)
+
+        self.date_label = QLabel()
+        self.date_label.setMinimumWidth(220)
+        layout.addWidget(self.date_label)
+        today_btn = QPushButton("Сегодня")
+        today_btn.clicked.connect(lambda: self.slider.setValue(0))
+        layout.addWidget(today_btn)
+        self.update_label()
+
+    def current_date(self):
+        if not self.enable_check.isChecked():
+            return None
+        return QDate.currentDate().addDays(self.slider.value()).toString("yyyy-MM-dd")
+
+    def update_label(self, leased=None, total=None):
+        day = QDate.currentDate().addDays(self.slider.value())
+        text = day.toString("dd.MM.yyyy")
+        if leased is not None and self.enable_check.isChecked():
+            text += f" — сдано {leased} из {total}"
+        self.date_label.setText(text)
+
+    def on_toggled(self, checked):
+        self.slider.setEnabled(checked)
+        self.date_changed.emit(self.current_date())
+
+    def on_value_changed(self, value):
+        self.update_label()
+        if self.enable_check.isChecked():
+            self.date_changed.emit(self.current_date())
+
+
+class DetectionDialog(QDialog):
+    """
+    Немодальное окно автоматического поиска кабинетов на плане.
+    Поиск идет в фоне; найденные контуры показываются на плане пунктиром,
+    и пользователь отмечает, какие из них добавить как кабинеты.
+    """
+
+    def __init__(self, parent, plan_path, plan_size=None):
+        super().__init__(parent)
+        self.parent_window = parent
+        self.candidates = []
+        self.setWindowTitle("Поиск кабинетов на плане")
+        self.resize(360, 460)
+        self.setModal(False)
+
+        layout = QVBoxLayout()
+        self.info_label = QLabel("Идет поиск замкнутых помещений...")
+        self.info_label.setWordWrap(True)
+        layout.addWidget(self.info_label)
+        self.candidate_list = QListWidget()
+        self.candidate_list.itemChanged.connect(self.on_item_changed)
+        self.candidate_list.currentRowChanged.connect(self.on_current_changed)
+        layout.addWidget(self.candidate_list)
+
+        check_layout = QHBoxLayout()
+        check_all_btn = QPushButton("Отметить все")
+        check_all_btn.clicked.connect(lambda: self.set_all_checked(True))
+        uncheck_all_btn = QPushButton("Снять все")
+        uncheck_all_btn.clicked.connect(lambda: self.set_all_checked(False))
+        check_layout.addWidget(check_all_btn)
+        check_layout.addWidget(uncheck_all_btn)
+        layout.addLayout(check_layout)
+
+        buttons_layout = QHBoxLayout()
+        self.accept_btn = QPushButton("Добавить отмеченные")
+        self.accept_btn.setEnabled(False)
+        self.accept_btn.clicked.connect(self.add_checked)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.accept_btn)
+        buttons_layout.addWidget(close_btn)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+        self.finished.connect(self.parent_window.clear_room_candidates)
+
+        # Уже нарисованные кабинеты не предлагаются повторно
+        floor_rooms = data_store["floors"].get(str(parent.current_floor), {}).get("rooms", [])
+        existing = [room["points"] for room in floor_rooms if room.get("points")]
+        # Распознавание (и numpy) загружается только при открытии этого окна
+        from stroycent import detection
+        self.task = detection.DetectionTask(plan_path, plan_size, existing)
+        self.task.signals.finished.connect(self.on_finished)
+        self.task.signals.failed.connect(self.on_failed)
+        QThreadPool.globalInstance().start(self.task)
+        parent.status.showMessage("Поиск кабинетов на плане...")
+
+    def on_finished(self, candidates):
+        self.task = None
+        if not self.isVisible():
+            return
+        self.candidates = candidates
+        self.parent_window.show_room_candidates(candidates)
+        self.candidate_list.blockSignals(True)
+        for i, candidate in enumerate(candidates, 1):
+            item = QListWidgetItem(f"Помещение {i} — площадь {candidate['area']:.0f}")
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            self.candidate_list.addItem(item)
+        self.candidate_list.blockSignals(False)
+        self.accept_btn.setEnabled(bool(candidates))
+        if candidates:
+            self.info_label.setText(f"Найдено помещений: {len(candidates)}. Снимите отметку с лишних "
+                                    "и нажмите «Добавить отмеченные».")
+        else:
+            self.info_label.setText("Новых замкнутых помещений не найдено.")
+        self.parent_window.status.showMessage(f"Найдено помещений: {len(candidates)}.")
+
+    def on_failed(self, error):
+        self.task = None
+        self.info_label.setText(f"Не удалось выполнить поиск: {error}")
+        self.parent_window.status.showMessage("Ошибка поиска кабинетов.")
+
+    def on_item_changed(self, item):
+        row = self.candidate_list.row(item)
+        self.parent_window.set_candidate_checked(row, item.checkState() == Qt.Checked,
+                                                 row == self.candidate_list.currentRow())
+
+    def on_current_changed(self, row):
+        for i in range(self.candidate_list.count()):
+            checked = self.candidate_list.item(i).checkState() == Qt.Checked
+            self.parent_window.set_candidate_checked(i, checked, i == row)
+        if 0 <= row < len(self.parent_window.candidate_items):
+            self.parent_window.view.centerOn(self.parent_window.candidate_items[row])
+
+    def set_all_checked(self, checked):
+        for i in range(self.candidate_list.count()):
+            self.candidate_list.item(i).setCheckState(Qt.Checked if checked else Qt.Unchecked)
+
+    def add_checked(self):
+        polygons = [
+            candidate["points"] for i, candidate in enumerate(self.candidates)
+            if self.candidate_list.item(i).checkState() == Qt.Checked
+        ]
+        self.accept()
+        self.parent_window.add_detected_rooms(polygons)
+
+
+class OverviewDialog(QDialog):
+    """
+    Немодальное окно обзора здания: миниатюры всех этажей с количеством
+    кабинетов по статусам. Клик по миниатюре открывает этаж.
+    """
+    COLUMNS = 4
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent_window = parent
+        self.setWindowTitle("Обзор здания")
+        self.resize(1100, 700)
+        self.setModal(False)
+        self.buttons = {}
+        # Этаж -> хеш показанной миниатюры и номер последнего запроса
+        self.digests = {}
+        self.generations = {}
+        self.generation = 0
+        # Ссылки на задания держатся до их завершения, иначе их сигналы будут удалены
+        self.tasks = set()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(500)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+        layout = QVBoxLayout()
+        self.info_label = QLabel()
+        layout.addWidget(self.info_label)
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        grid_widget = QWidget()
+        self.grid = QGridLayout(grid_widget)
+        self.grid.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        scroll_area.setWidget(grid_widget)
+        layout.addWidget(scroll_area)
+
+        buttons_layout = QHBoxLayout()
+        refresh_btn = QPushButton("Обновить")
+        refresh_btn.clicked.connect(self.refresh)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.hide)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(refresh_btn)
+        buttons_layout.addWidget(close_btn)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    # Пока окно открыто, миниатюры обновляются после сохранений и смены здания
+    def showEvent(self, event):
+        for callbacks in (after_save_callbacks, merge_callbacks, building_switch_callbacks):
+            if self.schedule_refresh not in callbacks:
+                callbacks.append(self.schedule_refresh)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        for callbacks in (after_save_callbacks, merge_callbacks, building_switch_callbacks):
+            if self.schedule_refresh in callbacks:
+                callbacks.remove(self.schedule_refresh)
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def schedule_refresh(self):
+        self.refresh_timer.start()
+
+    def _rebuild_grid(self, jobs):
+        for button in self.buttons.values():
+            self.grid.removeWidget(button)
+            button.deleteLater()
+        self.buttons = {}
+        self.digests = {}
+        placeholder = QPixmap(overview.THUMBNAIL_WIDTH, overview.THUMBNAIL_WIDTH * 3 // 4)
+        placeholder.fill(Qt.lightGray)
+        for index, job in enumerate(jobs):
+            button = QToolButton()
+            button.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
+            button.setIconSize(placeholder.size())
+            button.setIcon(QIcon(placeholder))
+            button.setCheckable(True)
+            button.clicked.connect(lambda checked=False, floor_key=job["floor"]: self.open_floor(floor_key))
+            self.grid.addWidget(button, index // self.COLUMNS, index % self.COLUMNS)
+            self.buttons[job["floor"]] = button
+
+    def refresh(self):
+        """Пересчитывает количества и запускает обновление миниатюр в пуле потоков."""
+        jobs = overview.build_jobs()
+        if [job["floor"] for job in jobs] != list(self.buttons):
+            self._rebuild_grid(jobs)
+        self.generation += 1
+        total = {}
+        for job in jobs:
+            counts = overview.floor_counts(job)
+            for status, count in counts.items():
+                total[status] = total.get(status, 0) + count
+            button = self.buttons[job["floor"]]
+            lines = [f"{job['floor_name']} — кабинетов: {len(job['rooms'])}"]
+            lines += [f"{status}: {count}" for status, count in sorted(counts.items(), key=lambda item: -item[1])]
+            button.setText("\n".join(lines[:4]) + ("\n…" if len(lines) > 4 else ""))
+            button.setToolTip("\n".join(lines))
+            button.setChecked(job["floor"] == str(self.parent_window.current_floor))
+            self.generations[job["floor"]] = self.generation
+            task = overview.ThumbnailTask(job)
+            task.signals.ready.connect(partial(self.on_thumbnail_ready, task, self.generation))
+            task.signals.failed.connect(partial(self.on_thumbnail_failed, task))
+            self.tasks.add(task)
+            QThreadPool.globalInstance().start(task)
+        summary = ", ".join(f"{status}: {count}" for status, count in total.items())
+        self.info_label.setText(f"Здание «{get_building()['name']}», этажей: {len(jobs)}. {summary}")
+
+    def on_thumbnail_ready(self, task, generation, floor_key, digest, image):
+        self.tasks.discard(task)
+        button = self.buttons.get(floor_key)
+        # Результат устаревшего запроса или миниатюра не изменилась
+        if button is None or self.generations.get(floor_key) != generation or self.digests.get(floor_key) == digest:
+            return
+        self.digests[floor_key] = digest
+        button.setIcon(QIcon(QPixmap.fromImage(image)))
+
+    def on_thumbnail_failed(self, task, floor_key, error):
+        self.tasks.discard(task)
+        debug_log("Не удалось нарисовать миниатюру этажа %s: %s", floor_key, error)
+
+    def open_floor(self, floor_key):
+        for key, button in self.buttons.items():
+            button.setChecked(key == floor_key)
+        if floor_key != str(self.parent_window.current_floor):
+            self.parent_window.load_floor(floor_key)
+
+
+class SnapshotDialog(QDialog):
+    """
+    Снимки данных текущего здания: список, сводка выбранного снимка,
+    восстановление и настройки периода и хранения.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent_window = parent
+        self.manager = parent.snapshot_manager
+        self.directory = snapshots.get_snapshot_dir()
+        self.described_name = None
+        self.restoring = False
+        self.setWindowTitle("Снимки данных")
+        self.resize(620, 520)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"Снимки здания «{get_building()['name']}» (новые сверху):"))
+        self.snapshot_list = QListWidget()
+        self.snapshot_list.currentRowChanged.connect(self.on_current_changed)
+        layout.addWidget(self.snapshot_list)
+        self.info_label = QLabel("Выберите снимок, чтобы увидеть его содержимое.")
+        self.info_label.setWordWrap(True)
+        layout.addWidget(self.info_label)
+
+        settings = snapshots.get_settings()
+        settings_layout = QGridLayout()
+        settings_layout.addWidget(QLabel("Снимок каждые, минут (0 — только вручную)"), 0, 0)
+        self.interval_spin = QSpinBox()
+        self.interval_spin.setRange(0, 24 * 60)
+        self.interval_spin.setValue(settings["interval_minutes"])
+        settings_layout.addWidget(self.interval_spin, 0, 1)
+        settings_layout.addWidget(QLabel("Хранить все снимки, часов"), 1, 0)
+        self.keep_hours_spin = QSpinBox()
+        self.keep_hours_spin.setRange(1, 24 * 30)
+        self.keep_hours_spin.setValue(settings["keep_all_hours"])
+        settings_layout.addWidget(self.keep_hours_spin, 1, 1)
+        settings_layout.addWidget(QLabel("Хранить по одному снимку в день, дней"), 2, 0)
+        self.keep_days_spin = QSpinBox()
+        self.keep_days_spin.setRange(0, 3650)
+        self.keep_days_spin.setValue(settings["keep_daily_days"])
+        settings_layout.addWidget(self.keep_days_spin, 2, 1)
+        for spin in (self.interval_spin, self.keep_hours_spin, self.keep_days_spin):
+            spin.valueChanged.connect(self.save_settings)
+        layout.addLayout(settings_layout)
+
+        buttons_layout = QHBoxLayout()
+        self.take_btn = QPushButton("Сделать снимок")
+        self.take_btn.clicked.connect(lambda: self.manager.request(force=True))
+        self.restore_btn = QPushButton("Восстановить")
+        self.restore_btn.setEnabled(False)
+        self.restore_btn.clicked.connect(self.restore)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.take_btn)
+        buttons_layout.addWidget(self.restore_btn)
+        buttons_layout.addWidget(close_btn)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+        self.manager.taken.connect(self.on_snapshot_taken)
+        self.manager.described.connect(self.on_described)
+        self.finished.connect(self.disconnect_manager)
+        self.populate()
+
+    def disconnect_manager(self):
+        self.manager.taken.disconnect(self.on_snapshot_taken)
+        self.manager.described.disconnect(self.on_described)
+
+    def populate(self):
+        current = self.snapshot_list.currentItem()
+        current_name = current.data(Qt.UserRole) if current else None
+        self.snapshot_list.blockSignals(True)
+        self.snapshot_list.clear()
+        for snapshot in reversed(snapshots.list_snapshots(self.directory)):
+            kind = "полный" if snapshot["kind"] == "full" else "изменения"
+            item = QListWidgetItem(f"{snapshot['time'].strftime('%d.%m.%Y %H:%M:%S')} — {kind}, "
+                                   f"{snapshot['size'] / 1024:.0f} КБ")
+            item.setData(Qt.UserRole, snapshot["name"])
+            self.snapshot_list.addItem(item)
+            if snapshot["name"] == current_name:
+                self.snapshot_list.setCurrentItem(item)
+        self.snapshot_list.blockSignals(False)
+
+    def save_settings(self):
+        snapshots.save_settings({
+            "interval_minutes": self.interval_spin.value(),
+            "keep_all_hours": self.keep_hours_spin.value(),
+            "keep_daily_days": self.keep_days_spin.value(),
+        })
+        self.manager.apply_settings()
+
+    def on_current_changed(self, row):
+        self.described_name = None
+        self.restore_btn.setEnabled(False)
+        item = self.snapshot_list.item(row)
+        if item is None:
+            return
+        self.info_label.setText("Чтение снимка...")
+        self.manager.describe(item.data(Qt.UserRole))
+
+    def selected_name(self):
+        item = self.snapshot_list.currentItem()
+        return item.data(Qt.UserRole) if item else None
+
+    def on_described(self, name, summary, error):
+        if name != self.selected_name():
+            return
+        if error:
+            self.info_label.setText(f"Не удалось прочитать снимок: {error}")
+            return
+        self.described_name = name
+        self.info_label.setText(
+            f"Этажей: {summary['floors']}, кабинетов: {summary['rooms']}. По сравнению с текущими "
+            f"данными: изменено {summary['changed']}, добавлено после снимка {summary['added']}, "
+            f"удалено после снимка {summary['removed']}.")
+        self.restore_btn.setEnabled(not self.restoring)
+
+    def restore(self):
+        if self.described_name is None:
+            return
+        answer = QMessageBox.question(
+            self, "Подтверждение",
+            "Заменить данные здания данными выбранного снимка? Перед восстановлением "
+            "текущие данные сохраняются в новый снимок.")
+        if answer != QMessageBox.Yes:
+            return
+        self.restoring = True
+        self.restore_btn.setEnabled(False)
+        self.take_btn.setEnabled(False)
+        self.info_label.setText("Снимок текущих данных перед восстановлением...")
+        self.manager.request(force=True)
+
+    def on_snapshot_taken(self, snapshot):
+        # Пока в очереди есть снимок (в том числе снимок перед восстановлением), ждем его
+        if self.manager.busy():
+            return
+        if self.restoring:
+            self.restoring = False
+            # Восстановление читает не больше двух файлов: полный снимок и снимок изменений
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                data = snapshots.load_snapshot(self.directory, self.described_name)
+            except (OSError, ValueError) as e:
+                QApplication.restoreOverrideCursor()
+                self.take_btn.setEnabled(True)
+                QMessageBox.warning(self, "Ошибка", f"Не удалось прочитать снимок: {e}")
+                self.populate()
+                return
+            try:
+                self.parent_window.restore_snapshot_data(data)
+            finally:
+                QApplication.restoreOverrideCursor()
+            self.accept()
+            return
+        self.populate()
+
+
+class LedgerDialog(QDialog):
+    """
+    Журнал платежей здания: выручка, задолженность и потери от простоя
+    по месяцам и в разрезах, начисление аренды за месяц, обмен с бухгалтерией.
+    Отчет строится по помесячным итогам журнала.
+    """
+    MAX_SHOWN_ERRORS = 500
+    DIMENSION_TITLES = {"floor": "По этажам", "status": "По статусам", "payment_type": "По типам оплаты"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent_window = parent
+        self.setWindowTitle("Платежи и аренда")
+        self.resize(720, 560)
+
+        layout = QVBoxLayout()
+        month_layout = QHBoxLayout()
+        month_layout.addWidget(QLabel("Месяц:"))
+        self.month_combo = QComboBox()
+        self.month_combo.currentIndexChanged.connect(self.update_report)
+        month_layout.addWidget(self.month_combo, 1)
+        layout.addLayout(month_layout)
+
+        self.report_text = QTextBrowser()
+        layout.addWidget(self.report_text)
+
+        buttons_layout = QHBoxLayout()
+        accrue_btn = QPushButton("Начислить аренду за месяц")
+        accrue_btn.setToolTip("Начислить аренду сданным кабинетам и учесть простой свободных")
+        accrue_btn.clicked.connect(self.accrue)
+        import_btn = QPushButton("Импорт...")
+        import_btn.setToolTip("Загрузить оплаты из CSV или XLSX бухгалтерии")
+        import_btn.clicked.connect(self.import_entries)
+        export_btn = QPushButton("Экспорт...")
+        export_btn.setToolTip("Сохранить записи журнала в CSV для бухгалтерии")
+        export_btn.clicked.connect(self.export_entries)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.close)
+        for btn in (accrue_btn, import_btn, export_btn, close_btn):
+            buttons_layout.addWidget(btn)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+        self.populate()
+
+    def populate(self, month=None):
+        """Заполняет список месяцев журнала (текущий месяц есть всегда)."""
+        months = ledger_store.months()
+        current = QDate.currentDate().toString("yyyy-MM")
+        if current not in months:
+            months.append(current)
+        month = month or self.month_combo.currentData() or current
+        self.month_combo.blockSignals(True)
+        self.month_combo.clear()
+        for value in sorted(months, reverse=True):
+            self.month_combo.addItem(value, value)
+        self.month_combo.setCurrentIndex(max(0, self.month_combo.findData(month)))
+        self.month_combo.blockSignals(False)
+        self.update_report()
+
+    @staticmethod
+    def _money(value):
+        return f"{value:,.2f}".replace(",", " ")
+
+    def _row_name(self, dimension, value):
+        if dimension == "floor":
+            return floor_name(value)
+        return value or "не указан"
+
+    @perf.timed("update_ledger_report")
+    def update_report(self):
+        month = self.month_combo.currentData()
+        money = self._money
+        html = f"<h2>Платежи: {get_building()['name']}</h2>"
+        html += f"<p>Записей в журнале: <b>{len(ledger_store)}</b></p>"
+
+        rows = ledger_store.monthly()
+        if rows:
+            html += ("<h3>По месяцам:</h3><table border='1' cellspacing='0' cellpadding='3'>"
+                     "<tr><th>Месяц</th><th>Начислено</th><th>Оплачено</th>"
+                     "<th>Простой</th><th>Задолженность</th></tr>")
+            for row in reversed(rows):
+                html += (f"<tr><td>{row['month']}</td><td align='right'>{money(row['charge'])}</td>"
+                         f"<td align='right'>{money(row['payment'])}</td>"
+                         f"<td align='right'>{money(row['vacancy'])}</td>"
+                         f"<td align='right'>{money(row['arrears'])}</td></tr>")
+            html += "</table>"
+        else:
+            html += "<p>Журнал пуст. Укажите ставки аренды в окнах кабинетов и начислите аренду за месяц.</p>"
+
+        if month:
+            for dimension in ledger.DIMENSIONS:
+                values = ledger_store.breakdown(month, dimension)
+                if not values:
+                    continue
+                html += (f"<h3>{self.DIMENSION_TITLES[dimension]} за {month}:</h3>"
+                         "<table border='1' cellspacing='0' cellpadding='3'>"
+                         "<tr><th></th><th>Начислено</th><th>Оплачено</th><th>Простой</th></tr>")
+                for value, totals in sorted(values.items()):
+                    html += (f"<tr><td>{self._row_name(dimension, value)}</td>"
+                             f"<td align='right'>{money(totals.get('charge', 0.0))}</td>"
+                             f"<td align='right'>{money(totals.get('payment', 0.0))}</td>"
+                             f"<td align='right'>{money(totals.get('vacancy', 0.0))}</td></tr>")
+                html += "</table>"
+
+        debtors = ledger_store.debtors()
+        if debtors:
+            html += "<h3>Наибольшая задолженность:</h3><ul>"
+            labels = room_labels()
+            for key, amount in debtors:
+                floor_key, number = room_label(key, labels)
+                room = f"{floor_name(floor_key)}, кабинет {number}" if floor_key is not None else "Удаленный кабинет"
+                html += f"<li>{room}: <b>{money(amount)}</b></li>"
+            html += "</ul>"
+        self.report_text.setHtml(html)
+
+    def accrue(self):
+        month = self.month_combo.currentData()
+        reply = QMessageBox.question(self, "Начисление аренды",
+                                     f"Начислить аренду за {month} по текущим ставкам, статусам и датам аренды? "
+                                     "Кабинеты, по которым начисление за этот месяц уже есть, пропускаются.")
+        if reply != QMessageBox.Yes:
+            return
+        result = ledger_store.accrue_month(month)
+        ledger_store.flush()
+        self.populate(month)
+        self.parent_window.status.showMessage(
+            f"Аренда за {month}: начислено кабинетам {result['charged']} на {self._money(result['charge'])}, "
+            f"простой {result['vacant']} на {self._money(result['vacancy'])}, пропущено {result['skipped']}.")
+
+    def import_entries(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Файл бухгалтерии", "", "Таблицы (*.csv *.xlsx)")
+        if not path:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            result = ledger.plan_ledger_import(path)
+        except Exception as e:
+            QMessageBox.warning(self, "Импорт", f"Не удалось прочитать файл: {e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        text = f"Строк в файле: {result.rows}, записей к добавлению: {len(result.entries)}."
+        if result.errors:
+            lines = [f"Строка {row_number}: {message}" for row_number, message in result.errors[:self.MAX_SHOWN_ERRORS]]
+            if len(result.errors) > self.MAX_SHOWN_ERRORS:
+                lines.append(f"… и еще {len(result.errors) - self.MAX_SHOWN_ERRORS}")
+            text += f"\n\nОшибки ({len(result.errors)}):\n" + "\n".join(lines)
+        if not result.entries:
+            QMessageBox.information(self, "Импорт", text)
+            return
+        if QMessageBox.question(self, "Импорт", text + "\n\nДобавить записи в журнал?") != QMessageBox.Yes:
+            return
+        ledger_store.extend(result.entries)
+        ledger_store.flush()
+        self.populate()
+        self.parent_window.status.showMessage(f"В журнал добавлено записей: {len(result.entries)}.")
+
+    def export_entries(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Экспорт журнала", "платежи.csv", "CSV (*.csv)")
+        if not path:
+            return
+        try:
+            count = ledger_store.export_csv(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Экспорт", f"Не удалось сохранить файл: {e}")
+            return
+        self.parent_window.status.showMessage(f"Журнал сохранен: {path} (записей {count}).")
@@ -0,0 +1,317 @@
+"""
+Экспорт планов этажей (план, кабинеты с цветами статусов, подписи и легенда)
+в PNG или многостраничный PDF.
+
+Этажи рисуются без окна (QPainter на QImage) параллельно в отдельных
+процессах; PDF собирается из готовых страниц в вызывающем процессе.
+
+Запуск из командной строки:
+    python -m stroycent.export -o plans.pdf
+    python -m stroycent.export --floors 0,1,2 --format png -o export_dir
+    python -m stroycent.export --building all -o portfolio.pdf
+"""
+import os
+import re
+import sys
+import argparse
+import multiprocessing
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from PySide6.QtCore import Qt, QPointF, QRectF, QSizeF, QMarginsF
+from PySide6.QtGui import (QImage, QPainter, QColor, QBrush, QPen, QFont, QPolygonF, QFontMetrics,
+                           QPdfWriter, QPageSize, QPageLayout)
+
+DEFAULT_WIDTH = 3000
+HEADER_HEIGHT = 90
+LEGEND_ROW_HEIGHT = 60
+PDF_RESOLUTION = 150
+# Качество PNG в терминах Qt: чем выше, тем слабее (и быстрее) сжатие
+PNG_QUALITY = 80
+# Ширина страницы PDF, мм (длинная сторона A3); высота — по пропорциям этажа
+PDF_PAGE_WIDTH_MM = 420.0
+
+FALLBACK_COLORS = {"bg": "#B3808080", "text": "#000000"}
+
+_worker_app = None
+
+
+def _room_label(room):
+    renter_name = room.get("renter_name", "Нет арендатора")
+    if len(renter_name) > 20:
+        renter_name = renter_name[:17] + "..."
+    return f"Каб. № {room.get('number', 'N/A')}", renter_name
+
+
+def render_floor(job):
+    """
+    Рисует этаж в QImage шириной job["width"] пикселей: заголовок, план,
+    кабинеты с подписями (как в окне приложения) и легенду статусов.
+    """
+    plan_w, plan_h = job["plan_size"]
+    width = job["width"]
+    scale = width / plan_w
+    statuses = job["statuses"]
+
+    counts = {}
+    for room in job["rooms"]:
+        status = room.get("status", "свободный")
+        counts[status] = counts.get(status, 0) + 1
+
+    legend_font = QFont("Arial", 16)
+    metrics = QFontMetrics(legend_font)
+    legend_items = [(status, statuses.get(status, FALLBACK_COLORS), f"{status} ({counts.get(status, 0)})")
+                    for status in list(statuses) + [s for s in counts if s not in statuses]]
+    # Раскладываем легенду по строкам, чтобы она помещалась по ширине
+    rows = [[]]
+    x = 20
+    for item in legend_items:
+        item_width = 40 + metrics.horizontalAdvance(item[2]) + 30
+        if x + item_width > width - 20 and rows[-1]:
+            rows.append([])
+            x = 20
+        rows[-1].append((x, item))
+        x += item_width
+
+    plan_height = int(plan_h * scale)
+    image = QImage(width, HEADER_HEIGHT + plan_height + LEGEND_ROW_HEIGHT * len(rows) + 20,
+                   QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.white)
+    painter = QPainter(image)
+    painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform | QPainter.TextAntialiasing)
+
+    painter.setPen(Qt.black)
+    painter.setFont(QFont("Arial", 28, QFont.Bold))
+    painter.drawText(QRectF(20, 0, width - 40, HEADER_HEIGHT), Qt.AlignVCenter | Qt.AlignLeft,
+                     f"{job['building']} — {job['floor_name']}")
+    painter.setFont(QFont("Arial", 16))
+    painter.drawText(QRectF(20, 0, width - 40, HEADER_HEIGHT), Qt.AlignVCenter | Qt.AlignRight,
+                     date.today().strftime("%d.%m.%Y"))
+
+    painter.save()
+    painter.translate(0, HEADER_HEIGHT)
+    painter.scale(scale, scale)
+    plan_rect = QRectF(0, 0, plan_w, plan_h)
+    plan = QImage(job["plan_file"]) if job.get("plan_file") else QImage()
+    if plan.isNull():
+        painter.fillRect(plan_rect, Qt.lightGray)
+    else:
+        painter.drawImage(plan_rect, plan)
+
+    number_font = QFont("Arial", 30, QFont.Bold)
+    renter_font = QFont("Arial", 24, QFont.Bold)
+    number_height = QFontMetrics(number_font).height()
+    for room in job["rooms"]:
+        colors = statuses.get(room.get("status", "свободный"), FALLBACK_COLORS)
+        polygon = QPolygonF([QPointF(x, y) for x, y in room["points"]])
+        painter.setPen(QPen(Qt.black, 1 / scale))
+        painter.setBrush(QBrush(QColor(colors["bg"])))
+        painter.drawPolygon(polygon)
+        bounding_rect = polygon.boundingRect()
+        number_text, renter_name = _room_label(room)
+        painter.setPen(QColor(colors["text"]))
+        top_left = QPointF(bounding_rect.x() + 30, bounding_rect.y() + 30)
+        painter.setFont(number_font)
+        painter.drawText(QRectF(top_left, QSizeF(10000, number_height)), Qt.AlignLeft | Qt.AlignTop, number_text)
+        painter.setFont(renter_font)
+        painter.drawText(QRectF(top_left + QPointF(0, number_height + 10), QSizeF(10000, number_height)),
+                         Qt.AlignLeft | Qt.AlignTop, renter_name)
+    painter.restore()
+
+    painter.setFont(legend_font)
+    for row_index, row in enumerate(rows):
+        y = HEADER_HEIGHT + plan_height + 10 + row_index * LEGEND_ROW_HEIGHT
+        for x, (status, colors, text) in row:
+            painter.setPen(QPen(Qt.black, 1))
+            painter.setBrush(QColor(colors["bg"]))
+            painter.drawRoundedRect(QRectF(x, y + 15, 30, 30), 4, 4)
+            painter.setPen(Qt.black)
+            painter.drawText(QRectF(x + 40, y, width, LEGEND_ROW_HEIGHT), Qt.AlignVCenter | Qt.AlignLeft, text)
+    painter.end()
+    return image
+
+
+def _init_worker():
+    """Инициализация процесса-исполнителя: для шрифтов нужен QGuiApplication."""
+    global _worker_app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtGui import QGuiApplication
+    _worker_app = QGuiApplication.instance() or QGuiApplication([])
+
+
+def _render_job(job):
+    """
+    Рисует этаж. Для PNG файл сохраняется прямо в процессе-исполнителе;
+    для PDF возвращаются несжатые строки RGB888 (ширина, высота, байт в строке,
+    данные): сжатие PNG только ради передачи страницы заняло бы больше
+    времени, чем сама отрисовка.
+    """
+    image = render_floor(job).convertToFormat(QImage.Format_RGB888)
+    if job.get("output"):
+        if not image.save(job["output"], "PNG", PNG_QUALITY):
+            raise OSError(f"Не удалось сохранить {job['output']}")
+        return job["output"]
+    return image.width(), image.height(), image.bytesPerLine(), bytes(image.constBits())
+
+
+def _safe_name(name):
+    return re.sub(r"[^\w\-]+", "_", name).strip("_") or "floor"
+
+
+def build_jobs(floor_keys=None, building_ids=None, width=DEFAULT_WIDTH):
+    """
+    Собирает задания на отрисовку из данных зданий.
+
+    Для текущего здания используются данные в памяти, остальные здания
+    читаются из их файлов. Задания содержат только простые типы, чтобы
+    их можно было передать в другие процессы.
+    """
+    import json
+    from stroycent import assets
+    from stroycent.data_manager import (data_store, portfolio, get_building, building_data_path,
+                                        building_floors, DEFAULT_STATUSES)
+
+    jobs = []
+    for building_id in building_ids or [portfolio["current"]]:
+        building = get_building(building_id)
+        if building["id"] == portfolio["current"]:
+            data = data_store
+        else:
+            with open(building_data_path(building), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        statuses = dict(DEFAULT_STATUSES)
+        statuses.update(data.get("statuses", {}))
+        names = {floor["key"]: floor["name"] for floor in building_floors(building)}
+        keys = [floor["key"] for floor in building_floors(building)]
+        keys += [key for key in data.get("floors", {}) if key not in names]
+        for floor_key in keys:
+            if floor_keys is not None and floor_key not in floor_keys:
+                continue
+            floor_data = data.get("floors", {}).get(floor_key, {})
+            rooms = [{field: room.get(field) for field in ("number", "renter_name", "status", "points")
+                      if field in room}
+                     for room in floor_data.get("rooms", []) if room.get("points")]
+            plan_file, plan_size = None, None
+            asset = floor_data.get("plan_asset")
+            if asset and os.path.exists(assets.original_path(asset)):
+                plan_size = floor_data.get("plan_size") or assets.image_size(assets.original_path(asset))
+                plan_file, _ = assets.best_plan_file(asset, plan_size, width)
+            elif floor_data.get("plan_path") and os.path.exists(floor_data["plan_path"]):
+                plan_file = floor_data["plan_path"]
+                plan_size = assets.image_size(plan_file)
+            if not plan_size or min(plan_size) <= 0:
+                plan_size = [1000, 800]
+            jobs.append({
+                "building": building["name"],
+                "building_id": building["id"],
+                "floor": floor_key,
+                "floor_name": names.get(floor_key, f"{floor_key} этаж"),
+                "rooms": rooms,
+                "statuses": statuses,
+                "plan_file": plan_file,
+                "plan_asset": asset if plan_file and asset else None,
+                "plan_size": list(plan_size),
+                "width": width,
+            })
+    return jobs
+
+
+def export_floors(jobs, output, fmt="pdf", workers=None, progress=None):
+    """
+    Рисует этажи в процессах-исполнителях и сохраняет результат.
+
+    fmt="png": output — папка, для каждого этажа создается отдельный файл.
+    fmt="pdf": output — путь к многостраничному PDF (страница на этаж).
+    progress(готово, всего) вызывается по мере готовности этажей.
+    Возвращает список созданных файлов.
+    """
+    if not jobs:
+        return []
+    if fmt == "png":
+        os.makedirs(output, exist_ok=True)
+        for index, job in enumerate(jobs, 1):
+            job["output"] = os.path.join(
+                output, f"{index:02d}_{_safe_name(job['building'])}_{_safe_name(job['floor_name'])}.png")
+
+    def counted(results):
+        for done, result in enumerate(results, 1):
+            if progress:
+                progress(done, len(jobs))
+            yield result
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers == 1:
+        _init_worker()
+        results = counted(_render_job(job) for job in jobs)
+        return list(results) if fmt == "png" else _write_pdf(output, results)
+    # spawn: дочерние процессы не наследуют состояние Qt родителя
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+        # map отдает страницы по порядку, как только готова очередная,
+        # поэтому PDF пишется параллельно с отрисовкой следующих этажей
+        results = counted(pool.map(_render_job, jobs))
+        return list(results) if fmt == "png" else _write_pdf(output, results)
+
+
+def _write_pdf(path, pages):
+    """Собирает PDF из готовых страниц, размер страницы — по пропорциям этажа."""
+    writer = QPdfWriter(path)
+    writer.setResolution(PDF_RESOLUTION)
+    writer.setTitle("Планы этажей")
+    painter = None
+    for width, height, bytes_per_line, data in pages:
+        image = QImage(data, width, height, bytes_per_line, QImage.Format_RGB888)
+        page_size = QPageSize(QSizeF(PDF_PAGE_WIDTH_MM, PDF_PAGE_WIDTH_MM * height / width),
+                              QPageSize.Millimeter)
+        writer.setPageLayout(QPageLayout(page_size, QPageLayout.Portrait, QMarginsF(0, 0, 0, 0)))
+        if painter is None:
+            painter = QPainter(writer)
+        else:
+            writer.newPage()
+        target = QRectF(0, 0, writer.width(), writer.height())
+        painter.drawImage(target, image)
+    if painter is not None:
+        painter.end()
+    return [path]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Экспорт планов этажей в PNG или PDF")
+    parser.add_argument("-o", "--output", required=True, help="PDF-файл или папка для PNG")
+    parser.add_argument("--format", choices=("pdf", "png"), help="По умолчанию — по расширению output")
+    parser.add_argument("--building", help="Идентификатор здания или all; по умолчанию — текущее здание")
+    parser.add_argument("--floors", help="Ключи этажей через запятую; по умолчанию — все этажи")
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH, help="Ширина изображения этажа, пикселей")
+    parser.add_argument("--workers", type=int, help="Количество процессов; по умолчанию — по числу ядер")
+    args = parser.parse_args(argv)
+
+    _init_worker()
+    from stroycent.data_manager import portfolio
+
+    fmt = args.format or ("pdf" if args.output.lower().endswith(".pdf") else "png")
+    known = [building["id"] for building in portfolio["buildings"]]
+    if args.building and args.building != "all" and args.building not in known:
+        print(f"Здание {args.building} не найдено. Доступные здания: {', '.join(known)}")
+        return 1
+    if args.building == "all":
+        building_ids = [building["id"] for building in portfolio["buildings"]]
+    else:
+        building_ids = [args.building] if args.building else None
+    floor_keys = set(args.floors.split(",")) if args.floors else None
+    jobs = build_jobs(floor_keys, building_ids, args.width)
+    if not jobs:
+        print("Нет этажей для экспорта.")
+        return 1
+
+    def report(done, total):
+        print(f"\rЭтажей готово: {done}/{total}", end="", flush=True)
+
+    files = export_floors(jobs, args.output, fmt, args.workers, report)
+    print()
+    for path in files:
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
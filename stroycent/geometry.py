@@ -0,0 +1,119 @@
+"""
+Вспомогательные функции для полигонов кабинетов.
+Точки — списки [x, y] в координатах плана, как в building_data.json.
+"""
+
+
+def polygon_area(points):
+    """Площадь многоугольника (формула шнурования), всегда неотрицательная."""
+    area = 0.0
+    for i, (x0, y0) in enumerate(points):
+        x1, y1 = points[(i + 1) % len(points)]
+        area += x0 * y1 - x1 * y0
+    return abs(area) / 2
+
+
+def point_in_polygon(x, y, points):
+    """Лежит ли точка внутри многоугольника (правило четности пересечений)."""
+    inside = False
+    count = len(points)
+    for i in range(count):
+        x0, y0 = points[i]
+        x1, y1 = points[i - 1]
+        if (y0 > y) != (y1 > y) and x < (x1 - x0) * (y - y0) / (y1 - y0) + x0:
+            inside = not inside
+    return inside
+
+
+def _segment_distance2(px, py, ax, ay, bx, by):
+    """Квадрат расстояния от точки до отрезка."""
+    dx = bx - ax
+    dy = by - ay
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return (px - ax) ** 2 + (py - ay) ** 2
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length2))
+    return (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+
+
+def simplify_polyline(points, tolerance):
+    """
+    Упрощение ломаной алгоритмом Дугласа — Пекера: удаляются вершины,
+    которые отклоняются от упрощенной линии не больше чем на tolerance.
+    Концы ломаной сохраняются. Рекурсия заменена стеком.
+    """
+    if len(points) < 3:
+        return list(points)
+    tolerance2 = tolerance * tolerance
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = points[first]
+        bx, by = points[last]
+        farthest = -1
+        max_distance2 = tolerance2
+        for i in range(first + 1, last):
+            distance2 = _segment_distance2(points[i][0], points[i][1], ax, ay, bx, by)
+            if distance2 > max_distance2:
+                farthest = i
+                max_distance2 = distance2
+        if farthest >= 0:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify_polygon(points, tolerance):
+    """
+    Упрощение замкнутого многоугольника. Контур делится на две ломаные по
+    первой вершине и наиболее удаленной от нее, каждая упрощается отдельно.
+    """
+    if len(points) < 4:
+        return list(points)
+    x0, y0 = points[0]
+    split = max(range(len(points)), key=lambda i: (points[i][0] - x0) ** 2 + (points[i][1] - y0) ** 2)
+    if split == 0:
+        return [points[0]]
+    first = simplify_polyline(points[:split + 1], tolerance)
+    second = simplify_polyline(points[split:] + [points[0]], tolerance)
+    return first[:-1] + second[:-1]
+
+
+# Допуск удаления лишних вершин при сохранении контура кабинета, пикселей плана
+NORMALIZE_TOLERANCE = 1.0
+# Знаков после запятой в сохраняемых координатах
+COORDINATE_PRECISION = 1
+
+
+def quantize(value, precision=COORDINATE_PRECISION):
+    """Округляет координату; целые значения хранятся как int (короче в JSON)."""
+    value = round(value, precision)
+    return int(value) if float(value).is_integer() else value
+
+
+def normalize_polygon(points, tolerance=NORMALIZE_TOLERANCE, precision=COORDINATE_PRECISION):
+    """
+    Приводит контур к виду для хранения: координаты округляются до precision
+    знаков, совпадающие соседние вершины и вершины, лежащие на прямой между
+    соседями (с допуском tolerance), удаляются. Если после упрощения остается
+    меньше трех вершин, возвращается контур только с округлением.
+    """
+    rounded = []
+    for x, y in points:
+        point = [quantize(x, precision), quantize(y, precision)]
+        if not rounded or point != rounded[-1]:
+            rounded.append(point)
+    while len(rounded) > 1 and rounded[-1] == rounded[0]:
+        rounded.pop()
+    if len(rounded) < 4:
+        return rounded
+    simplified = simplify_polygon(rounded, tolerance)
+    # Первая вершина в simplify_polygon сохраняется всегда — проверяется отдельно
+    if len(simplified) > 3:
+        (px, py), (ax, ay), (bx, by) = simplified[0], simplified[-1], simplified[1]
+        if _segment_distance2(px, py, ax, ay, bx, by) <= tolerance * tolerance:
+            simplified = simplified[1:]
+    return simplified if len(simplified) >= 3 else rounded
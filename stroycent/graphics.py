@@ -1,8 +1,12 @@
-from PySide6.QtWidgets import QGraphicsView, QGraphicsPolygonItem, QGraphicsEllipseItem, QGraphicsTextItem, QGraphicsItem
-from PySide6.QtCore import Qt, QPointF, Signal, QObject
-from PySide6.QtGui import QPen, QBrush, QColor, QPolygonF, QPainterPath, QFont
+from PySide6.QtWidgets import (QGraphicsView, QGraphicsPolygonItem, QGraphicsEllipseItem, QGraphicsItem,
+                               QWidget)
+from PySide6.QtCore import Qt, QPointF, QRectF, QSizeF, QSize, Signal, QObject, QTimer, QEvent
+from PySide6.QtGui import (QPen, QBrush, QColor, QPolygonF, QPainterPath, QFont, QPainterPathStroker, QImage,
+                           QPainter, QTransform)
 from functools import partial
 from stroycent.utils import debug_log
+from stroycent import perf
+import time
 
 class DraggablePointItem(QObject, QGraphicsEllipseItem):
     point_moved = Signal(int, QPointF)
@@ -28,8 +32,263 @@ class DraggablePointItem(QObject, QGraphicsEllipseItem):
             self.point_moved.emit(self.index, new_pos)
         super().mouseReleaseEvent(event)
 
+# Слои пометок на плане: ключ -> название, цвет и условное обозначение
+ANNOTATION_LAYERS = {
+    "doors": {"name": "Двери", "color": "#8B4513", "symbol": "Д"},
+    "meters": {"name": "Счетчики", "color": "#1E90FF", "symbol": "С"},
+    "fire": {"name": "Пожарное оборудование", "color": "#DC143C", "symbol": "П"},
+    "cabling": {"name": "Кабельные трассы", "color": "#FF8C00", "symbol": "К"},
+}
+
+MARKER_SIZE = 36
+
+
+class AnnotationLayerItem(QGraphicsItem):
+    """
+    Слой пометок этажа, нарисованный одним элементом сцены.
+
+    Все отметки (точки) и трассы (ломаные) слоя рисуются в одном paint(),
+    а результат кэшируется Qt (DeviceCoordinateCache). Поэтому включение,
+    выключение или изменение одного слоя не перерисовывает остальные слои
+    и не требует перезагрузки этажа.
+    """
+
+    def __init__(self, layer_key, annotations, on_remove=None):
+        super().__init__()
+        self.layer_key = layer_key
+        self.style = ANNOTATION_LAYERS.get(layer_key, {"name": layer_key, "color": "#000000", "symbol": "?"})
+        self.annotations = []
+        self.on_remove = on_remove
+        self._shape = QPainterPath()
+        self._rect = QRectF()
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        self.setZValue(10)
+        self.setAcceptedMouseButtons(Qt.RightButton)
+        self.set_annotations(annotations)
+
+    def set_annotations(self, annotations):
+        """Заменяет содержимое слоя; перерисовывается только этот слой."""
+        self.prepareGeometryChange()
+        self.annotations = annotations
+        path = QPainterPath()
+        for annotation in annotations:
+            if annotation.get("kind") == "route":
+                route = QPainterPath()
+                points = annotation.get("points", [])
+                if points:
+                    route.moveTo(*points[0])
+                    for x, y in points[1:]:
+                        route.lineTo(x, y)
+                stroker = QPainterPathStroker()
+                stroker.setWidth(12)
+                path.addPath(stroker.createStroke(route))
+            else:
+                x, y = annotation.get("pos", [0, 0])
+                path.addEllipse(QPointF(x, y), MARKER_SIZE / 2, MARKER_SIZE / 2)
+        self._shape = path
+        self._rect = path.boundingRect().adjusted(-4, -4, 4, 4)
+        self.update()
+
+    def boundingRect(self):
+        return self._rect
+
+    def shape(self):
+        return self._shape
+
+    def paint(self, painter, option, widget=None):
+        color = QColor(self.style["color"])
+        route_pen = QPen(color, 6, Qt.DashLine, Qt.RoundCap, Qt.RoundJoin)
+        marker_pen = QPen(Qt.white, 2)
+        font = QFont("Arial", 14, QFont.Bold)
+        painter.setFont(font)
+        for annotation in self.annotations:
+            if annotation.get("kind") == "route":
+                points = [QPointF(x, y) for x, y in annotation.get("points", [])]
+                painter.setPen(route_pen)
+                painter.setBrush(Qt.NoBrush)
+                painter.drawPolyline(points)
+            else:
+                x, y = annotation.get("pos", [0, 0])
+                rect = QRectF(x - MARKER_SIZE / 2, y - MARKER_SIZE / 2, MARKER_SIZE, MARKER_SIZE)
+                painter.setPen(marker_pen)
+                painter.setBrush(color)
+                painter.drawEllipse(rect)
+                painter.drawText(rect, Qt.AlignCenter, self.style["symbol"])
+
+    def annotation_at(self, pos):
+        """Возвращает пометку под точкой (в координатах сцены) или None."""
+        for annotation in reversed(self.annotations):
+            if annotation.get("kind") == "route":
+                route = QPainterPath()
+                points = annotation.get("points", [])
+                route.moveTo(*points[0])
+                for x, y in points[1:]:
+                    route.lineTo(x, y)
+                stroker = QPainterPathStroker()
+                stroker.setWidth(12)
+                if stroker.createStroke(route).contains(pos):
+                    return annotation
+            else:
+                x, y = annotation.get("pos", [0, 0])
+                if (x - pos.x()) ** 2 + (y - pos.y()) ** 2 <= (MARKER_SIZE / 2) ** 2:
+                    return annotation
+        return None
+
+    def mousePressEvent(self, event):
+        annotation = self.annotation_at(event.scenePos())
+        if annotation is not None and self.on_remove:
+            self.on_remove(self.layer_key, annotation)
+        else:
+            event.ignore()
+
+
+# Пределы масштаба: не меньше доли масштаба "план во все окно" и не больше пикселей экрана на пиксель плана
+ZOOM_MIN_FIT = 0.5
+ZOOM_MAX = 8.0
+# Множитель масштаба на щелчок колеса (120 единиц angleDelta) и на пиксель прокрутки тачпада
+WHEEL_STEP = 1.1
+PIXEL_STEP = 1.002
+# Кадр анимации, мс, и доля оставшегося до цели масштаба, проходимая за кадр
+ZOOM_FRAME_MS = 16
+ZOOM_SMOOTHING = 0.45
+# Пауза ввода, после которой жест считается законченным, мс
+GESTURE_IDLE_MS = 200
+# Подписи ниже этой высоты на экране, пикселей, во время жеста не рисуются
+GESTURE_LABEL_MIN_PX = 12
+# Подписи кабинетов — над полигонами (0), но под слоями пометок (10)
+LABEL_Z = 1
+
+
+class LabelLayer(QGraphicsItem):
+    """
+    Невидимый родитель подписей кабинетов одной высоты: во время жеста
+    масштабирования мелкие подписи скрываются всем слоем, без обхода сцены.
+    """
+
+    def __init__(self, height):
+        super().__init__()
+        self.height = height
+        self.setFlag(QGraphicsItem.ItemHasNoContents, True)
+        self.setZValue(LABEL_Z)
+
+    def boundingRect(self):
+        return QRectF()
+
+    def paint(self, painter, option, widget=None):
+        pass
+
+
+class ZoomController(QObject):
+    """
+    Плавное масштабирование вида. События колеса, тачпада и щипка между
+    кадрами только накапливаются в целевой масштаб, а преобразование вида
+    меняется не чаще раза в кадр с приближением к цели; точка плана под
+    курсором (или центром щипка) остается на месте.
+
+    На время жеста (от первого события до паузы ввода) вид рисуется
+    с пониженным качеством (сигналы gesture_started / gesture_finished).
+    """
+    gesture_started = Signal()
+    gesture_finished = Signal()
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.active = False
+        self.target = None
+        self.anchor_view = QPointF()
+        self.anchor_scene = QPointF()
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setInterval(ZOOM_FRAME_MS)
+        self._frame_timer.timeout.connect(self._step)
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(GESTURE_IDLE_MS)
+        self._idle_timer.timeout.connect(self._finish)
+
+    def scale(self):
+        return abs(self.view.transform().m11())
+
+    def limits(self):
+        """Наименьший и наибольший допустимый масштаб для текущего плана и окна."""
+        plan = self.view.plan_rect()
+        viewport = self.view.viewport().rect()
+        if plan.isEmpty() or viewport.isEmpty():
+            return ZOOM_MAX / 1000, ZOOM_MAX
+        fit = min(viewport.width() / plan.width(), viewport.height() / plan.height())
+        return min(fit * ZOOM_MIN_FIT, ZOOM_MAX), ZOOM_MAX
+
+    def _clamp(self, scale):
+        low, high = self.limits()
+        return min(max(scale, low), high)
+
+    def _set_anchor(self, anchor):
+        self.anchor_view = QPointF(anchor) if anchor is not None else QPointF(self.view.viewport().rect().center())
+        self.anchor_scene = self.view.mapToScene(self.anchor_view.toPoint())
+
+    def add_factor(self, factor, anchor=None):
+        """Добавляет к целевому масштабу множитель; anchor — точка в координатах окна вида."""
+        if not self.active:
+            self.active = True
+            self.target = self.scale()
+            self.gesture_started.emit()
+        self.target = self._clamp(self.target * factor)
+        self._set_anchor(anchor)
+        if not self._frame_timer.isActive():
+            self._frame_timer.start()
+        self._idle_timer.start()
+
+    def add_wheel(self, event):
+        """Колесо мыши (angleDelta) или тачпад (pixelDelta, если он есть)."""
+        pixels = event.pixelDelta().y()
+        if pixels:
+            factor = PIXEL_STEP ** pixels
+        else:
+            factor = WHEEL_STEP ** (event.angleDelta().y() / 120)
+        if factor != 1:
+            self.add_factor(factor, event.position())
+
+    def zoom_now(self, factor, anchor=None):
+        """Сразу меняет масштаб (с учетом пределов), без анимации."""
+        self._set_anchor(anchor)
+        current = self.scale()
+        self.target = self._clamp(current * factor)
+        self._apply(self.target / current)
+
+    def _step(self):
+        current = self.scale()
+        ratio = self.target / current
+        if abs(ratio - 1) < 0.002:
+            self._frame_timer.stop()
+        else:
+            ratio **= ZOOM_SMOOTHING
+        self._apply(ratio)
+        if not self._frame_timer.isActive() and not self._idle_timer.isActive():
+            self._finish()
+
+    def _apply(self, factor):
+        if factor == 1:
+            return
+        view = self.view
+        view.scale(factor, factor)
+        # Прокрутка возвращает точку плана под курсор
+        delta = view.mapFromScene(self.anchor_scene) - self.anchor_view.toPoint()
+        view.horizontalScrollBar().setValue(view.horizontalScrollBar().value() + delta.x())
+        view.verticalScrollBar().setValue(view.verticalScrollBar().value() + delta.y())
+        view.zoom_changed.emit()
+
+    def _finish(self):
+        if self._frame_timer.isActive() or not self.active:
+            # Анимация еще идет: жест закончится с ее последним кадром
+            return
+        self.active = False
+        self.gesture_finished.emit()
+
+
 class DrawingGraphicsView(QGraphicsView):
     drawing_finished = Signal(object)
+    point_picked = Signal(QPointF)
+    zoom_changed = Signal()
 
     def __init__(self, scene, main_window, parent=None):
         super().__init__(scene, parent)
@@ -39,18 +298,138 @@ class DrawingGraphicsView(QGraphicsView):
         self.drawing_points = []
         self.drawing_path_item = None
         self.point_items = []
+        self.min_points = 3
+        self.closed_path = True
+        self.is_picking_point = False
+        self.plan_pixmap = None
+        self.plan_size = QSizeF()
 
-        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        # Точку, которая остается на месте при масштабировании, выбирает ZoomController
+        self.setTransformationAnchor(QGraphicsView.NoAnchor)
         self.setDragMode(QGraphicsView.ScrollHandDrag)
+        # План рисуется как фон один раз и кэшируется, слои и кабинеты — поверх
+        self.setCacheMode(QGraphicsView.CacheBackground)
+
+        self.zoom = ZoomController(self)
+        self.zoom.gesture_started.connect(partial(self.set_gesture_quality, True))
+        self.zoom.gesture_finished.connect(partial(self.set_gesture_quality, False))
+        self._render_hints = None
+        self._gesture_hidden = []
+        self._label_layers = {}  # высота подписи -> LabelLayer
+        self.viewport().grabGesture(Qt.PinchGesture)
+
+    def set_plan_pixmap(self, pixmap, plan_size=None):
+        """
+        Устанавливает изображение плана этажа как фон сцены.
+        plan_size — размер оригинала: уменьшенная копия растягивается на него,
+        поэтому координаты кабинетов не зависят от выбранной копии.
+        """
+        self.plan_pixmap = pixmap
+        self.plan_size = QSizeF(*plan_size) if plan_size else QSizeF(pixmap.size())
+        self.scene().setSceneRect(self.plan_rect())
+        self.resetCachedContent()
+        self.viewport().update()
+
+    def plan_rect(self):
+        return QRectF(QPointF(0, 0), self.plan_size) if self.plan_pixmap else QRectF()
+
+    def drawBackground(self, painter, rect):
+        super().drawBackground(painter, rect)
+        if self.plan_pixmap:
+            target = self.plan_rect().intersected(rect)
+            if not target.isEmpty():
+                sx = self.plan_pixmap.width() / self.plan_size.width()
+                sy = self.plan_pixmap.height() / self.plan_size.height()
+                source = QRectF(target.x() * sx, target.y() * sy, target.width() * sx, target.height() * sy)
+                painter.drawPixmap(target, self.plan_pixmap, source)
+
+    def zoom_by(self, factor, animated=False):
+        """Масштабирует относительно центра окна в пределах ZOOM_MIN_FIT…ZOOM_MAX."""
+        if animated:
+            self.zoom.add_factor(factor)
+        else:
+            self.zoom.zoom_now(factor)
+
+    def set_gesture_quality(self, gesture):
+        """
+        Во время жеста масштабирования план рисуется без сглаживания,
+        а подписи мельче GESTURE_LABEL_MIN_PX на экране (их раскладка —
+        основная часть времени кадра) скрываются. После жеста возвращается
+        полное качество.
+        """
+        if gesture:
+            self._render_hints = self.renderHints()
+            self.setRenderHints(QPainter.RenderHints())
+            scale = self.zoom.scale()
+            for layer in self._label_layers.values():
+                if layer.isVisible() and layer.height * scale < GESTURE_LABEL_MIN_PX:
+                    layer.setVisible(False)
+                    self._gesture_hidden.append(layer)
+        else:
+            if self._render_hints is not None:
+                self.setRenderHints(self._render_hints)
+                self._render_hints = None
+            for layer in self._gesture_hidden:
+                layer.setVisible(True)
+            self._gesture_hidden = []
+        self.viewport().update()
+
+    def add_label(self, item):
+        """Добавляет подпись кабинета на сцену в слой подписей той же высоты."""
+        height = round(item.boundingRect().height())
+        layer = self._label_layers.get(height)
+        if layer is None:
+            layer = LabelLayer(height)
+            self.scene().addItem(layer)
+            self._label_layers[height] = layer
+        item.setParentItem(layer)
+
+    def forget_scene_items(self):
+        """Вызывается перед очисткой сцены: слои подписей удаляются вместе с ней."""
+        self._gesture_hidden = []
+        self._label_layers = {}
+
+    def viewportEvent(self, event):
+        if event.type() == QEvent.Gesture and not self.is_drawing:
+            pinch = event.gesture(Qt.PinchGesture)
+            if pinch is not None:
+                if pinch.changeFlags() & pinch.ChangeFlag.ScaleFactorChanged:
+                    center = self.viewport().mapFromGlobal(pinch.centerPoint().toPoint())
+                    self.zoom.add_factor(pinch.scaleFactor(), QPointF(center))
+                event.accept(pinch)
+                return True
+        if event.type() == QEvent.NativeGesture and not self.is_drawing:
+            # Щипок на тачпаде macOS приходит как собственный жест системы
+            if event.gestureType() == Qt.ZoomNativeGesture:
+                self.zoom.add_factor(1 + event.value(), event.position())
+                return True
+        return super().viewportEvent(event)
+
+    def start_point_picking(self):
+        """Следующий левый клик по плану вернет точку через сигнал point_picked."""
+        self.is_picking_point = True
+        self.setDragMode(QGraphicsView.NoDrag)
+        self.viewport().setCursor(Qt.CrossCursor)
+
+    def stop_point_picking(self):
+        self.is_picking_point = False
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.viewport().unsetCursor()
+
+    def paintEvent(self, event):
+        if not perf.enabled:
+            super().paintEvent(event)
+            return
+        start = time.perf_counter()
+        super().paintEvent(event)
+        perf.record("frame", time.perf_counter() - start)
 
     def wheelEvent(self, event):
         if self.is_drawing:
             return
-        zoom_factor = 1.1
-        if event.angleDelta().y() > 0:
-            self.scale(zoom_factor, zoom_factor)
-        else:
-            self.scale(1 / zoom_factor, 1 / zoom_factor)
+        # События копятся до следующего кадра анимации
+        self.zoom.add_wheel(event)
+        event.accept()
 
     def keyPressEvent(self, event):
         if self.is_drawing and event.key() == Qt.Key_Backspace:
@@ -67,8 +446,10 @@ class DrawingGraphicsView(QGraphicsView):
         else:
             super().keyPressEvent(event)
 
-    def start_drawing_mode(self, initial_points=None):
+    def start_drawing_mode(self, initial_points=None, min_points=3, closed=True):
         self.is_drawing = True
+        self.min_points = min_points
+        self.closed_path = closed
         self.drawing_points = initial_points if initial_points else []
         self.setDragMode(QGraphicsView.NoDrag)
         self.clear_drawing_items()
@@ -93,7 +474,7 @@ class DrawingGraphicsView(QGraphicsView):
             path.moveTo(self.drawing_points[0])
             for p in self.drawing_points[1:]:
                 path.lineTo(p)
-            if len(self.drawing_points) > 1:
+            if len(self.drawing_points) > 1 and self.closed_path:
                 path.lineTo(self.drawing_points[0])
         self.drawing_path_item.setPath(path)
 
@@ -126,11 +507,11 @@ class DrawingGraphicsView(QGraphicsView):
             if event.button() == Qt.LeftButton:
                 scene_pos = self.mapToScene(event.pos())
                 self.drawing_points.append(scene_pos)
-                debug_log(f"Добавлена точка: ({scene_pos.x()}, {scene_pos.y()})")
+                debug_log("Добавлена точка: (%s, %s)", scene_pos.x(), scene_pos.y())
                 self.update_drawing_path()
                 self.update_point_items()
             elif event.button() == Qt.RightButton:
-                if len(self.drawing_points) > 2:
+                if len(self.drawing_points) >= self.min_points:
                     self.drawing_finished.emit(self.drawing_points)
                     self.is_drawing = False
                     self.drawing_points = []
@@ -138,5 +519,220 @@ class DrawingGraphicsView(QGraphicsView):
                     self.setDragMode(QGraphicsView.ScrollHandDrag)
                 else:
                     self.main_window.status.showMessage("Недостаточно точек для полигона. Попробуйте еще раз.")
+        elif self.is_picking_point and event.button() == Qt.LeftButton:
+            self.stop_point_picking()
+            self.point_picked.emit(self.mapToScene(event.pos()))
+        elif event.button() == Qt.LeftButton and event.modifiers() & Qt.ShiftModifier:
+            # Shift + перетаскивание — выделение кабинетов рамкой (с Ctrl — добавление к выделению)
+            self.setDragMode(QGraphicsView.RubberBandDrag)
+            super().mousePressEvent(event)
         else:
             super().mousePressEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        if self.dragMode() == QGraphicsView.RubberBandDrag and not self.is_drawing:
+            self.setDragMode(QGraphicsView.ScrollHandDrag)
+
+
+# Длинная сторона изображения миникарты, пикселей
+MINIMAP_SIZE = 256
+# Сторона ячейки сетки, по которой ищутся кабинеты в перерисовываемой области, пикселей миникарты
+MINIMAP_CELL = 16
+
+
+class MinimapWidget(QWidget):
+    """
+    Миникарта этажа: весь план с заливкой кабинетов и рамка видимой области.
+
+    План и кабинеты рисуются один раз в уменьшенное изображение (кэш).
+    При изменении кабинета перерисовывается только его участок кэша, причем
+    изменения, пришедшие подряд (загрузка этажа, пакетное обновление),
+    объединяются в одну перерисовку. При прокрутке и масштабировании
+    рисуются только готовое изображение и рамка. Перетаскивание рамки
+    (или клик) прокручивает план.
+    """
+
+    def __init__(self, view, parent=None):
+        super().__init__(parent)
+        self.view = view
+        self.plan_image = None
+        self.plan_size = QSizeF()
+        self.scale = 1.0
+        self.cache = QImage()
+        # Кабинеты: ключ -> (полигон в координатах плана, его границы, цвет заливки)
+        self.rooms = {}
+        # Сетка ячеек миникарты: (столбец, строка) -> ключи кабинетов, задевающих ячейку
+        self._grid = {}
+        self._dirty = QRectF()
+        self._full_redraw = True
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self.flush)
+        self._dragging = False
+        self.setMinimumSize(MINIMAP_SIZE, MINIMAP_SIZE * 3 // 4)
+        self.setCursor(Qt.PointingHandCursor)
+
+        view.horizontalScrollBar().valueChanged.connect(self.update)
+        view.verticalScrollBar().valueChanged.connect(self.update)
+        view.zoom_changed.connect(self.update)
+
+    def sizeHint(self):
+        return QSize(MINIMAP_SIZE, MINIMAP_SIZE * 3 // 4)
+
+    # --- Кэш ---
+
+    def set_plan(self, pixmap, plan_size):
+        """Новый план этажа (уменьшенная копия или сам план) и размер плана в координатах сцены."""
+        self.plan_size = QSizeF(plan_size)
+        if pixmap is None or pixmap.isNull() or self.plan_size.isEmpty():
+            self.plan_image = None
+            self.cache = QImage()
+            self.update()
+            return
+        scale = MINIMAP_SIZE / max(self.plan_size.width(), self.plan_size.height())
+        if scale != self.scale:
+            self.scale = scale
+            self._rebuild_grid()
+        size = QSize(max(1, round(self.plan_size.width() * self.scale)),
+                     max(1, round(self.plan_size.height() * self.scale)))
+        self.plan_image = pixmap.toImage().scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        self.cache = QImage(size, QImage.Format_ARGB32_Premultiplied)
+        self._full_redraw = True
+        self._schedule()
+
+    def clear_rooms(self):
+        self.rooms.clear()
+        self._grid.clear()
+        self._full_redraw = True
+        self._schedule()
+
+    def _cells(self, rect):
+        """Ячейки сетки, которые задевает прямоугольник в координатах плана."""
+        size = MINIMAP_CELL / self.scale
+        for column in range(int(rect.left() // size), int(rect.right() // size) + 1):
+            for row in range(int(rect.top() // size), int(rect.bottom() // size) + 1):
+                yield column, row
+
+    def _rebuild_grid(self):
+        self._grid.clear()
+        for key, (_, bounds, _) in self.rooms.items():
+            for cell in self._cells(bounds):
+                self._grid.setdefault(cell, set()).add(key)
+
+    def update_room(self, key, polygon, color):
+        """Добавляет или обновляет кабинет; перерисуется только его участок."""
+        old = self.remove_room(key)
+        bounds = polygon.boundingRect()
+        self.rooms[key] = (QPolygonF(polygon), bounds, QColor(color))
+        for cell in self._cells(bounds):
+            self._grid.setdefault(cell, set()).add(key)
+        self._mark_dirty(bounds.united(old[1]) if old else bounds)
+
+    def set_room_color(self, key, color):
+        """Меняет только цвет кабинета: сетка и контур не пересчитываются."""
+        entry = self.rooms.get(key)
+        if entry is None or entry[2] == color:
+            return
+        self.rooms[key] = (entry[0], entry[1], QColor(color))
+        self._mark_dirty(entry[1])
+
+    def remove_room(self, key):
+        old = self.rooms.pop(key, None)
+        if old:
+            for cell in self._cells(old[1]):
+                keys = self._grid.get(cell)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._grid[cell]
+            self._mark_dirty(old[1])
+        return old
+
+    def _mark_dirty(self, rect):
+        self._dirty = self._dirty.united(rect) if not self._dirty.isNull() else QRectF(rect)
+        self._schedule()
+
+    def _schedule(self):
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(0)
+
+    def flush(self):
+        """Перерисовывает в кэше измененную область (в координатах плана)."""
+        if self.plan_image is None:
+            self._dirty = QRectF()
+            return
+        if self._full_redraw:
+            dirty = QRectF(QPointF(0, 0), self.plan_size)
+        else:
+            # Запас в пиксель миникарты на сглаживание краев
+            margin = 1 / self.scale
+            dirty = self._dirty.adjusted(-margin, -margin, margin, margin)
+        self._dirty = QRectF()
+        self._full_redraw = False
+        if dirty.isEmpty():
+            return
+        target = QTransform.fromScale(self.scale, self.scale).mapRect(dirty).toAlignedRect()
+        target = target.intersected(self.cache.rect())
+        painter = QPainter(self.cache)
+        painter.setClipRect(target)
+        painter.drawImage(target, self.plan_image, target)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.scale(self.scale, self.scale)
+        area = QRectF(target.x() / self.scale, target.y() / self.scale,
+                      target.width() / self.scale, target.height() / self.scale)
+        if self._full_redraw_area(area):
+            rooms = self.rooms.values()
+        else:
+            keys = set()
+            for cell in self._cells(area):
+                keys.update(self._grid.get(cell, ()))
+            rooms = [self.rooms[key] for key in keys]
+        for polygon, bounds, color in rooms:
+            if bounds.intersects(area):
+                painter.setBrush(color)
+                painter.drawPolygon(polygon)
+        painter.end()
+        self.update()
+
+    def _full_redraw_area(self, area):
+        return area.width() * area.height() * 4 >= self.plan_size.width() * self.plan_size.height()
+
+    # --- Отображение ---
+
+    def _offset(self):
+        return QPointF((self.width() - self.cache.width()) / 2, (self.height() - self.cache.height()) / 2)
+
+    def visible_rect(self):
+        """Видимая область плана в координатах миникарты."""
+        scene_rect = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+        offset = self._offset()
+        return QRectF(scene_rect.x() * self.scale + offset.x(), scene_rect.y() * self.scale + offset.y(),
+                      scene_rect.width() * self.scale, scene_rect.height() * self.scale)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#2b2b2b"))
+        if self.cache.isNull():
+            return
+        painter.drawImage(self._offset(), self.cache)
+        painter.setPen(QPen(QColor("#ff3030"), 2))
+        painter.setBrush(QColor(255, 48, 48, 40))
+        painter.drawRect(self.visible_rect().intersected(QRectF(self.rect()).adjusted(1, 1, -1, -1)))
+
+    def _center_view(self, pos):
+        offset = self._offset()
+        self.view.centerOn((pos.x() - offset.x()) / self.scale, (pos.y() - offset.y()) / self.scale)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and not self.cache.isNull():
+            self._dragging = True
+            self._center_view(event.position())
+
+    def mouseMoveEvent(self, event):
+        if self._dragging:
+            self._center_view(event.position())
+
+    def mouseReleaseEvent(self, event):
+        self._dragging = False
@@ -0,0 +1,147 @@
+"""
+Тепловая карта этажа: кабинеты окрашиваются по числу дней без арендатора
+или по числу дней до конца аренды.
+
+Значения для всех кабинетов этажа считаются одним проходом numpy по датам
+аренды и хранятся до изменения кабинета: измененный кабинет пересчитывается
+отдельно, весь этаж — при смене режима, этажа или дня. Цвет берется
+по интервалу значений, поэтому при включении и выключении карты меняются
+только кисти существующих элементов сцены. numpy загружается при первом
+включении карты, а не при запуске программы.
+"""
+from datetime import date
+from stroycent.data_manager import room_id
+from stroycent.history import is_occupied
+
+# Режимы: границы интервалов в днях, подписи и цвета интервалов (по возрастанию значения)
+MODES = {
+    "vacancy": {
+        "name": "Дней без арендатора",
+        "bins": (30, 90, 180, 365),
+        "labels": ("до 30 дн.", "30–90 дн.", "90–180 дн.", "180–365 дн.", "больше года"),
+        "colors": ("#B3FFF3B0", "#B3FFD166", "#B3FF9F43", "#B3EE5A24", "#B3B71540"),
+    },
+    "lease_end": {
+        "name": "Дней до конца аренды",
+        "bins": (30, 90, 180, 365),
+        "labels": ("до 30 дн.", "30–90 дн.", "90–180 дн.", "180–365 дн.", "больше года"),
+        "colors": ("#B3E74C3C", "#B3F39C12", "#B3F1C40F", "#B3A3CB38", "#B327AE60"),
+    },
+}
+# Кабинеты, к которым режим не относится (занятые для простоя, свободные для срока аренды) или без даты
+NO_DATA_COLOR = "#80C0C0C0"
+NO_DATA_LABEL = "нет данных"
+
+
+def _dates(rooms, field):
+    """Даты поля кабинетов в виде массива datetime64[D]; пустые и некорректные — NaT."""
+    import numpy as np
+    values = [room.get(field) or "" for room in rooms]
+    try:
+        return np.array(values, dtype="datetime64[D]")
+    except ValueError:
+        result = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[D]")
+        for i, value in enumerate(values):
+            try:
+                result[i] = np.datetime64(value, "D")
+            except ValueError:
+                pass
+        return result
+
+
+def compute(rooms, mode, today=None):
+    """
+    Дни и номера интервалов для списка кабинетов одним векторным проходом.
+    Возвращает (days, buckets): days — float с NaN, где значения нет,
+    buckets — int8 с -1 для кабинетов без значения.
+    """
+    import numpy as np
+    bins = MODES[mode]["bins"]
+    today = np.datetime64(today or date.today().isoformat(), "D")
+    exit_dates = _dates(rooms, "exit_date")
+    occupied = np.array([is_occupied(room) for room in rooms], dtype=bool)
+    if mode == "vacancy":
+        # Простой считается с даты выезда последнего арендатора
+        days = (today - exit_dates).astype("float64")
+        applicable = ~occupied
+    else:
+        days = (exit_dates - today).astype("float64")
+        applicable = occupied
+    applicable &= ~np.isnat(exit_dates)
+    days = np.where(applicable, np.maximum(days, 0), np.nan)
+    buckets = np.where(applicable, np.digitize(np.nan_to_num(days), bins), -1).astype(np.int8)
+    return days, buckets
+
+
+class HeatmapOverlay:
+    """Режим тепловой карты и кэш значений кабинетов текущего этажа."""
+
+    def __init__(self):
+        self.mode = None
+        self.rooms = []
+        self._key = None
+        self._days = None
+        self._buckets = None
+        self._index = {}  # идентификатор кабинета (room_id) -> строка массивов
+
+    def set_rooms(self, rooms):
+        self.rooms = rooms
+        self._key = None
+
+    def set_mode(self, mode):
+        self.mode = mode
+
+    def refresh(self):
+        """Сбрасывает кэш, если наступил другой день (значения считаются от текущей даты)."""
+        if self._key is not None and self._key[1] != date.today().isoformat():
+            self._key = None
+
+    def _ensure(self):
+        if self._key is not None and self._key[0] == self.mode:
+            return
+        today = date.today().isoformat()
+        self._days, self._buckets = compute(self.rooms, self.mode, today)
+        self._index = {room_id(room_data): i for i, room_data in enumerate(self.rooms)}
+        self._key = (self.mode, today)
+
+    def room_changed(self, room_data):
+        """Пересчитывает значение одного кабинета в кэше."""
+        i = self._index.get(room_id(room_data))
+        if self._key is None or i is None:
+            return
+        days, buckets = compute([room_data], self.mode, self._key[1])
+        self._days[i] = days[0]
+        self._buckets[i] = buckets[0]
+
+    def room_removed(self, room_data):
+        """Кабинет удален: его строка остается в массивах, поэтому этаж пересчитывается при следующем запросе."""
+        self._index.pop(room_id(room_data), None)
+        self._key = None
+
+    def value(self, room_data):
+        """(дни, номер интервала) кабинета; кабинеты, добавленные после расчета, считаются отдельно."""
+        self._ensure()
+        i = self._index.get(room_id(room_data))
+        if i is None:
+            days, buckets = compute([room_data], self.mode, self._key[1])
+            return days[0], int(buckets[0])
+        return self._days[i], int(self._buckets[i])
+
+    def color(self, room_data):
+        bucket = self.value(room_data)[1]
+        return MODES[self.mode]["colors"][bucket] if bucket >= 0 else NO_DATA_COLOR
+
+    def legend(self):
+        """Интервалы текущего режима: [(цвет, подпись, количество кабинетов), ...]."""
+        self.refresh()
+        self._ensure()
+        if len(self._index) != len(self.rooms):
+            # Кабинеты добавлены или удалены после расчета: этаж пересчитывается целиком
+            self._key = None
+            self._ensure()
+        mode = MODES[self.mode]
+        import numpy as np
+        counts = np.bincount(self._buckets.astype(np.int64) + 1, minlength=len(mode["colors"]) + 1)
+        items = [(color, label, int(count)) for color, label, count in zip(mode["colors"], mode["labels"], counts[1:])]
+        items.append((NO_DATA_COLOR, NO_DATA_LABEL, int(counts[0])))
+        return items
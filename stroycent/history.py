@@ -0,0 +1,504 @@
+import time
+import bisect
+from datetime import date, datetime
+from stroycent.data_manager import (data_store, get_history_file_path, room_id, room_ids_by_key, status_id,
+                                    DEFAULT_STATUSES, after_save_callbacks, merge_callbacks,
+                                    building_switch_callbacks)
+from stroycent.utils import info_log
+from stroycent.journal import JournalFile
+
+# Поля кабинета, изменения которых попадают в историю
+TRACKED_FIELDS = ("number", "status", "inn", "client_name", "renter_name",
+                  "payment_type", "entry_date", "exit_date", "rent")
+
+# Идентификаторы статусов, которые считаются занятостью и свободными площадями в отчетах.
+# Идентификатор статуса не меняется при переименовании (см. DEFAULT_STATUSES)
+OCCUPIED_STATUS_IDS = ("occupied", "leaving")
+VACANT_STATUS_IDS = ("free",)
+
+# 2 — кабинеты в событиях указаны идентификаторами (room_id), а не ключами "этаж:номер";
+# 3 — срезы считают кабинеты по идентификаторам статусов, а не по названиям
+HISTORY_FORMAT_VERSION = 3
+COLUMNS = ("ts", "room", "floor", "field", "old", "new")
+
+
+def is_occupied(room_data, statuses=None):
+    """Занят ли кабинет по своему статусу (по идентификатору статуса, а не по названию)."""
+    return status_id(room_data.get("status") or "свободный", statuses) in OCCUPIED_STATUS_IDS
+
+
+def is_vacant(room_data, statuses=None):
+    return status_id(room_data.get("status") or "свободный", statuses) in VACANT_STATUS_IDS
+
+
+def _day_key(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def _month_key(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m")
+
+
+class HistoryStore:
+    """
+    Журнал изменений кабинетов, который только дополняется.
+
+    События хранятся по столбцам (ts, room, floor, field, old, new);
+    строковые значения заменяются индексами в общем словаре строк,
+    поэтому повторяющиеся номера, статусы и названия занимают место один раз.
+
+    Параллельно поддерживаются срезы состояния на конец каждого дня и месяца
+    (количество кабинетов по статусам на каждом этаже), поэтому запросы
+    за длинные периоды не переигрывают события. Срезы считают кабинеты
+    по идентификаторам статусов, поэтому переименование статуса их не меняет.
+
+    На диске журнал — основа и дописываемые сегменты (stroycent.journal):
+    каждое сохранение дописывает только новые события и срезы. События
+    других процессов, открывших то же здание, приходят из их сегментов,
+    а текущее количество кабинетов по статусам после слияния данных
+    сверяется с самими данными (resync).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = JournalFile(path)
+        self.strings = []
+        self._string_index = {}
+        self.columns = {name: [] for name in COLUMNS}
+        # Текущее количество кабинетов: {этаж: {идентификатор статуса: количество}}
+        self.state = {}
+        # Идентификаторы всех встречавшихся названий статусов: события переименования
+        # записываются, когда прежнего названия уже нет в списке статусов
+        self._status_ids = {}
+        self.rollups = {"day": {}, "month": {}}
+        self._rollup_keys = {"day": [], "month": []}
+        # Еще не записанные события и ключи измененных срезов
+        self._pending = []
+        self._pending_rollups = {"day": set(), "month": set()}
+        # Наблюдатели за изменениями кабинетов (индексы): объекты с методами
+        # room_created(кабинет), room_deleted(кабинет), room_changed(кабинет, прежние значения)
+        self.listeners = []
+
+    # --- Хранение ---
+
+    @classmethod
+    def open(cls, path, data):
+        """Загружает журнал из файла или создает новый по текущим данным."""
+        store = cls(path)
+        store._remember_statuses(data.get("statuses", {}))
+        base, records = store.file.read()
+        if base is not None and base.get("version", 1) < HISTORY_FORMAT_VERSION:
+            with store.file.lock():
+                # Файл перечитывается под блокировкой: его мог перевести другой процесс
+                base, records = store.file.read()
+                store._load(base)
+                for record in records:
+                    store._apply_record(record)
+                version = base.get("version", 1)
+                if version < 2:
+                    store._migrate_room_keys(data)
+                if version < 3:
+                    store._migrate_status_keys(data)
+                if version < HISTORY_FORMAT_VERSION:
+                    store.file.compact(store._raw())
+        elif base is None:
+            store.seed(data)
+        else:
+            store._load(base)
+            for record in records:
+                store._apply_record(record)
+        store.resync(data)
+        return store
+
+    def reopen(self, path, data):
+        """Переключает журнал на другое здание, сохранив несохраненные события."""
+        self.flush()
+        store = HistoryStore.open(path, data)
+        store.listeners = self.listeners
+        self.__dict__.update(store.__dict__)
+
+    def _load(self, raw):
+        self.strings = raw.get("strings", [])
+        self._string_index = {s: i for i, s in enumerate(self.strings)}
+        for name in COLUMNS:
+            self.columns[name] = raw.get("columns", {}).get(name, [])
+        self.state = raw.get("state", {})
+        self.rollups = raw.get("rollups", {"day": {}, "month": {}})
+        for granularity in ("day", "month"):
+            self.rollups.setdefault(granularity, {})
+            self._rollup_keys[granularity] = sorted(self.rollups[granularity])
+
+    def _migrate_room_keys(self, data):
+        """
+        Переводит события с ключей "этаж:номер" на идентификаторы кабинетов.
+        События просматриваются от новых к старым, чтобы пройти смены номера
+        назад: до смены кабинет носил прежний номер. Ключи удаленных кабинетов
+        и неоднозначные номера остаются как есть.
+        """
+        ids = room_ids_by_key(data)
+        columns = self.columns
+        rooms = list(columns["room"])
+        for i in range(len(rooms) - 1, -1, -1):
+            key = self._value(columns["room"][i])
+            field = self._value(columns["field"][i])
+            if field == "number":
+                # Событие записано под прежним номером; после него кабинет носит новый
+                new_key = f"{self._value(columns['floor'][i])}:{self._value(columns['new'][i])}"
+                identifier = ids.pop(new_key, None)
+                if identifier is not None:
+                    ids[key] = identifier
+            identifier = ids.get(key)
+            if identifier is not None:
+                rooms[i] = self._intern(identifier)
+            if field == "status" and (columns["old"][i] < 0 or columns["new"][i] < 0):
+                # Создание или удаление: раньше этот номер мог носить другой кабинет
+                ids.pop(key, None)
+        columns["room"] = rooms
+        info_log("История изменений переведена на идентификаторы кабинетов: %s", self.path)
+
+    def _migrate_status_keys(self, data):
+        """
+        Переводит срезы с названий статусов на их идентификаторы. Названия
+        встроенных статусов, которых уже нет в списке, получают встроенные
+        идентификаторы; прочие неизвестные названия остаются как есть.
+        """
+        names = {name: colors["id"] for name, colors in DEFAULT_STATUSES.items()}
+        names.update(self._status_ids)
+
+        def convert(snapshot):
+            result = {}
+            for floor, counts in snapshot.items():
+                floor_counts = result.setdefault(floor, {})
+                for name, count in counts.items():
+                    key = names.get(name, name)
+                    floor_counts[key] = floor_counts.get(key, 0) + count
+            return result
+
+        self.state = convert(self.state)
+        for snapshots in self.rollups.values():
+            for key, snapshot in snapshots.items():
+                snapshots[key] = convert(snapshot)
+        info_log("Срезы истории изменений переведены на идентификаторы статусов: %s", self.path)
+
+    def _raw(self):
+        return {
+            "version": HISTORY_FORMAT_VERSION,
+            "strings": self.strings,
+            "columns": self.columns,
+            "state": self.state,
+            "rollups": self.rollups,
+        }
+
+    def _apply_record(self, record):
+        """Вносит сегмент, записанный другим процессом (или до запуска)."""
+        for event in record.get("events", []):
+            self._insert(*event)
+        for granularity, snapshots in record.get("rollups", {}).items():
+            for key, snapshot in snapshots.items():
+                # Свой несохраненный срез того же дня новее
+                if key not in self._pending_rollups[granularity]:
+                    self._set_rollup(granularity, key, snapshot)
+
+    def _reload(self):
+        """Журнал сжат другим процессом: перечитывается, несохраненные события добавляются заново."""
+        base, records = self.file.read()
+        if base is None:
+            # Основа удалена или повреждена: она будет перезаписана из памяти
+            return
+        store = HistoryStore(self.path)
+        store.file = self.file
+        store._load(base)
+        for record in records:
+            store._apply_record(record)
+        for event in self._pending:
+            store._insert(*event)
+        for granularity, keys in self._pending_rollups.items():
+            for key in keys:
+                store._set_rollup(granularity, key, self.rollups[granularity][key])
+        store.state = self.state
+        store._status_ids = self._status_ids
+        store._pending = self._pending
+        store._pending_rollups = self._pending_rollups
+        store.listeners = self.listeners
+        self.__dict__.update(store.__dict__)
+
+    def flush(self):
+        """
+        Дописывает несохраненные события сегментом. Под блокировкой журнала
+        сначала читаются сегменты других процессов, а при разрастании файла
+        сегментов журнал сжимается в основу.
+        """
+        with self.file.lock():
+            records = self.file.read_new()
+            if records is None:
+                self._reload()
+            else:
+                for record in records:
+                    self._apply_record(record)
+            if self._pending or any(self._pending_rollups.values()):
+                self.file.append({
+                    "events": self._pending,
+                    "rollups": {granularity: {key: self.rollups[granularity][key] for key in keys}
+                                for granularity, keys in self._pending_rollups.items() if keys},
+                })
+                self._pending = []
+                self._pending_rollups = {"day": set(), "month": set()}
+            if self.file.needs_compaction():
+                self.file.compact(self._raw())
+
+    def seed(self, data, ts=None):
+        """Фиксирует текущее состояние здания как начальную точку отсчета."""
+        self._remember_statuses(data.get("statuses", {}))
+        self.state = _count_statuses(data)
+        self._update_rollups(ts)
+
+    def resync(self, data, ts=None):
+        """
+        Сверяет текущее количество кабинетов по статусам с данными здания:
+        после слияния с изменениями другого процесса или восстановления снимка.
+        """
+        self._remember_statuses(data.get("statuses", {}))
+        state = _count_statuses(data)
+        if state != self.state:
+            self.state = state
+            self._update_rollups(ts)
+
+    # --- Запись событий ---
+
+    def _intern(self, value):
+        if value is None:
+            return -1
+        value = str(value)
+        index = self._string_index.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self._string_index[value] = index
+        return index
+
+    def _value(self, index):
+        return None if index < 0 else self.strings[index]
+
+    def _insert(self, ts, room, floor, field, old, new):
+        """Вставляет событие в столбцы с сохранением порядка по времени."""
+        ts_column = self.columns["ts"]
+        values = (ts, self._intern(room), self._intern(floor), self._intern(field),
+                  self._intern(old), self._intern(new))
+        if not ts_column or ts_column[-1] <= ts:
+            for name, value in zip(COLUMNS, values):
+                self.columns[name].append(value)
+        else:
+            # Событие другого процесса раньше уже записанных: вставка по месту
+            position = bisect.bisect_right(ts_column, ts)
+            for name, value in zip(COLUMNS, values):
+                self.columns[name].insert(position, value)
+
+    def append(self, room, floor, field, old, new, ts=None):
+        """Добавляет одно событие в журнал."""
+        ts = int(ts if ts is not None else time.time())
+        event = [ts] + [None if value is None else str(value) for value in (room, floor, field, old, new)]
+        self._insert(*event)
+        self._pending.append(event)
+        if field == "status":
+            self._apply_status_change(str(floor), old, new)
+            self._update_rollups(ts)
+
+    def _remember_statuses(self, statuses):
+        self._status_ids.update((name, colors.get("id") or name) for name, colors in statuses.items())
+
+    def _status_key(self, name):
+        """Идентификатор статуса для срезов; переименованный статус находится по прежнему названию."""
+        key = status_id(name)
+        if key == name:
+            return self._status_ids.get(name, name)
+        self._status_ids[name] = key
+        return key
+
+    def _apply_status_change(self, floor, old, new):
+        counts = self.state.setdefault(floor, {})
+        old = None if old is None else self._status_key(old)
+        new = None if new is None else self._status_key(new)
+        if old is not None:
+            counts[old] = max(counts.get(old, 0) - 1, 0)
+            if not counts[old]:
+                del counts[old]
+        if new is not None:
+            counts[new] = counts.get(new, 0) + 1
+
+    def _set_rollup(self, granularity, key, snapshot):
+        if key not in self.rollups[granularity]:
+            bisect.insort(self._rollup_keys[granularity], key)
+        self.rollups[granularity][key] = snapshot
+
+    def _update_rollups(self, ts=None):
+        ts = int(ts if ts is not None else time.time())
+        snapshot = {floor: dict(counts) for floor, counts in self.state.items()}
+        for granularity, key in (("day", _day_key(ts)), ("month", _month_key(ts))):
+            self._set_rollup(granularity, key, snapshot)
+            self._pending_rollups[granularity].add(key)
+
+    def record_created(self, room_data, ts=None):
+        """Регистрирует появление нового кабинета."""
+        key = room_id(room_data)
+        floor = room_data.get("floor")
+        self.append(key, floor, "status", None, room_data.get("status", "свободный"), ts)
+        for field in TRACKED_FIELDS:
+            if field != "status" and room_data.get(field) not in (None, ""):
+                self.append(key, floor, field, None, room_data.get(field), ts)
+        for listener in self.listeners:
+            listener.room_created(room_data)
+
+    def record_deleted(self, room_data, ts=None):
+        """Регистрирует удаление кабинета."""
+        self.append(room_id(room_data), room_data.get("floor"), "status",
+                    room_data.get("status", "свободный"), None, ts)
+        for listener in self.listeners:
+            listener.room_deleted(room_data)
+
+    def record_changes(self, room_data, old_values, ts=None):
+        """
+        Сравнивает отслеживаемые поля кабинета с их прежними значениями
+        и добавляет событие на каждое изменившееся поле.
+        """
+        floor = room_data.get("floor")
+        key = room_id(room_data)
+        for field in TRACKED_FIELDS:
+            old = old_values.get(field)
+            new = room_data.get(field)
+            default = "свободный" if field == "status" else ""
+            old = old if old is not None else default
+            new = new if new is not None else default
+            if old != new:
+                self.append(key, floor, field, old, new, ts)
+        for listener in self.listeners:
+            listener.room_changed(room_data, old_values)
+
+    # --- Запросы ---
+
+    def events(self, room=None, start=None, end=None):
+        """Перебирает события журнала (словари) с необязательным фильтром."""
+        ts_column = self.columns["ts"]
+        first = 0 if start is None else bisect.bisect_left(ts_column, _to_timestamp(start))
+        last = len(ts_column) if end is None else bisect.bisect_right(ts_column, _to_timestamp(end, end_of_day=True))
+        room_index = self._string_index.get(room) if room is not None else None
+        if room is not None and room_index is None:
+            return
+        for i in range(first, last):
+            if room_index is not None and self.columns["room"][i] != room_index:
+                continue
+            yield {
+                "ts": ts_column[i],
+                "room": self._value(self.columns["room"][i]),
+                "floor": self._value(self.columns["floor"][i]),
+                "field": self._value(self.columns["field"][i]),
+                "old": self._value(self.columns["old"][i]),
+                "new": self._value(self.columns["new"][i]),
+            }
+
+    def status_counts(self, when, floor=None, granularity="day"):
+        """
+        Количество кабинетов по идентификаторам статусов на конец дня (или месяца) `when`.
+        Если этаж не указан, суммируется по всему зданию.
+        """
+        key = when.strftime("%Y-%m-%d" if granularity == "day" else "%Y-%m")
+        keys = self._rollup_keys[granularity]
+        pos = bisect.bisect_right(keys, key)
+        if pos == 0:
+            return {}
+        snapshot = self.rollups[granularity][keys[pos - 1]]
+        if floor is not None:
+            return dict(snapshot.get(str(floor), {}))
+        totals = {}
+        for counts in snapshot.values():
+            for status, count in counts.items():
+                totals[status] = totals.get(status, 0) + count
+        return totals
+
+    def occupancy(self, start, end, floor=None, granularity="month"):
+        """
+        Занятость и свободные площади за период по дням или месяцам.
+
+        Возвращает список словарей:
+        {"period", "occupied", "vacant", "total", "occupancy_rate"},
+        где значения взяты на конец каждого периода.
+        """
+        result = []
+        for period_end, label, rollup in _periods(_to_date(start), _to_date(end), granularity):
+            counts = self.status_counts(period_end, floor, rollup)
+            occupied = sum(counts.get(s, 0) for s in OCCUPIED_STATUS_IDS)
+            vacant = sum(counts.get(s, 0) for s in VACANT_STATUS_IDS)
+            total = sum(counts.values())
+            result.append({
+                "period": label,
+                "occupied": occupied,
+                "vacant": vacant,
+                "total": total,
+                "occupancy_rate": occupied / total if total else 0.0,
+            })
+        return result
+
+    def vacancy(self, start, end, floor=None, granularity="month"):
+        """Доля свободных кабинетов за период: [(период, доля), ...]."""
+        return [
+            (row["period"], row["vacant"] / row["total"] if row["total"] else 0.0)
+            for row in self.occupancy(start, end, floor, granularity)
+        ]
+
+
+def _count_statuses(data):
+    """Количество кабинетов по статусам на каждом этаже: {этаж: {идентификатор статуса: количество}}."""
+    state = {}
+    statuses = data.get("statuses", {})
+    for floor_key, floor_data in data.get("floors", {}).items():
+        counts = state.setdefault(str(floor_key), {})
+        for room in floor_data.get("rooms", []):
+            status = status_id(room.get("status", "свободный"), statuses)
+            counts[status] = counts.get(status, 0) + 1
+    return state
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+
+def _to_timestamp(value, end_of_day=False):
+    if isinstance(value, (int, float)):
+        return value
+    d = _to_date(value)
+    moment = datetime(d.year, d.month, d.day, 23, 59, 59) if end_of_day else datetime(d.year, d.month, d.day)
+    return moment.timestamp()
+
+
+def _periods(start, end, granularity):
+    """
+    Перебирает (последний день периода, подпись, срез) от start до end включительно.
+    Для неполного последнего месяца используется дневной срез.
+    """
+    if granularity == "day":
+        current = start
+        while current <= end:
+            yield current, current.strftime("%Y-%m-%d"), "day"
+            current = date.fromordinal(current.toordinal() + 1)
+    elif granularity == "month":
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            month_end = date.fromordinal(date(next_year, next_month, 1).toordinal() - 1)
+            if month_end <= end:
+                yield month_end, f"{year:04d}-{month:02d}", "month"
+            else:
+                yield end, f"{year:04d}-{month:02d}", "day"
+            year, month = next_year, next_month
+    else:
+        raise ValueError(f"Неизвестная детализация: {granularity}")
+
+
+# Журнал текущего здания; сохраняется вместе с основным файлом данных
+history_store = HistoryStore.open(get_history_file_path(), data_store)
+after_save_callbacks.append(history_store.flush)
+merge_callbacks.append(lambda: history_store.resync(data_store))
+building_switch_callbacks.append(lambda: history_store.reopen(get_history_file_path(), data_store))
@@ -0,0 +1,226 @@
+"""
+Массовый импорт данных арендаторов из CSV или XLSX.
+
+Файл читается построчно (XLSX — через openpyxl в режиме только для чтения),
+строки сопоставляются с кабинетами по паре (этаж, номер) или по ИНН и
+проверяются теми же правилами, что и окно кабинета. Ошибки собираются,
+а не прерывают импорт. plan_import ничего не меняет в данных: изменения
+применяются одной транзакцией через MainWindow.apply_room_changes.
+"""
+import os
+import re
+import csv
+from functools import lru_cache
+from datetime import date, datetime
+from stroycent.data_manager import data_store, building_floors, validate_changes
+
+# Поля, которые может изменить импорт
+IMPORT_FIELDS = ("inn", "client_name", "renter_name", "payment_type", "entry_date", "exit_date", "status", "rent")
+
+# Заголовки столбцов (без учета регистра): подписи окна кабинета и ключи данных
+COLUMN_ALIASES = {
+    "этаж": "floor",
+    "floor": "floor",
+    "номер кабинета": "number",
+    "номер": "number",
+    "кабинет": "number",
+    "number": "number",
+    "инн арендатора": "inn",
+    "инн": "inn",
+    "inn": "inn",
+    "имя арендатора": "client_name",
+    "client_name": "client_name",
+    "юридическое наименование арендатора": "renter_name",
+    "арендатор": "renter_name",
+    "renter_name": "renter_name",
+    "тип оплаты": "payment_type",
+    "payment_type": "payment_type",
+    "дата заезда": "entry_date",
+    "entry_date": "entry_date",
+    "дата выезда": "exit_date",
+    "exit_date": "exit_date",
+    "статус": "status",
+    "status": "status",
+    "ставка аренды": "rent",
+    "ставка": "rent",
+    "rent": "rent",
+}
+
+# ГГГГ-ММ-ДД или ДД.ММ.ГГГГ (также ДД/ММ/ГГГГ и двузначный год)
+ISO_DATE_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+DMY_DATE_RE = re.compile(r"(\d{1,2})[./](\d{1,2})[./](\d{2}|\d{4})")
+
+
+class ImportResult:
+    """Итог разбора файла: изменения по кабинетам и ошибки по строкам."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.matched_rows = 0
+        # {id(кабинета): (кабинет, {поле: новое значение})} — строки одного кабинета объединяются
+        self._changes = {}
+        self.errors = []
+
+    @property
+    def changes(self):
+        """Список (кабинет, {поле: значение}) только с действительно меняющимися полями."""
+        result = []
+        for room, values in self._changes.values():
+            values = {field: value for field, value in values.items() if room.get(field) != value}
+            if values:
+                result.append((room, values))
+        return result
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+def _iter_csv(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _iter_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Для импорта XLSX нужен пакет openpyxl (pip install openpyxl).")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_rows(path):
+    """Перебирает строки файла (списки значений) без загрузки файла целиком."""
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        return _iter_xlsx(path)
+    return _iter_csv(path)
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # Числа из таблиц (ИНН, номера) приходят как float
+        value = int(value)
+    return str(value).strip()
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(text):
+    # strptime на десятках тысяч строк заметно медленнее разбора регулярным выражением
+    match = ISO_DATE_RE.fullmatch(text)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = DMY_DATE_RE.fullmatch(text)
+        if not match:
+            # Некорректную дату отклонит validate_room
+            return text
+        day, month, year = match.groups()
+        if len(year) == 2:
+            year = "20" + year
+    try:
+        return date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        return text
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return _parse_date_text(_text(value))
+
+
+def _build_indexes(data):
+    by_number = {}
+    by_inn = {}
+    for floor_key, floor_data in data.get("floors", {}).items():
+        for room in floor_data.get("rooms", []):
+            by_number[(str(floor_key), str(room.get("number", "")))] = room
+            if room.get("inn"):
+                by_inn.setdefault(str(room["inn"]), []).append(room)
+    return by_number, by_inn
+
+
+def _floor_lookup():
+    """Этаж можно указать ключом ("1") или названием ("1 этаж")."""
+    lookup = {}
+    for floor in building_floors():
+        lookup[floor["key"]] = floor["key"]
+        lookup[floor["name"].strip().lower()] = floor["key"]
+    return lookup
+
+
+def plan_import(path, data=None):
+    """
+    Разбирает файл и сопоставляет строки с кабинетами, не меняя данные.
+    Возвращает ImportResult.
+    """
+    data = data_store if data is None else data
+    result = ImportResult(path)
+    by_number, by_inn = _build_indexes(data)
+    floors = _floor_lookup()
+    statuses = data.get("statuses", {})
+    rows = iter_rows(path)
+
+    header = next(rows, None)
+    columns = [COLUMN_ALIASES.get(_text(name).lower()) for name in header or []]
+    if "number" not in columns and "inn" not in columns:
+        result.add_error(1, "Не найден столбец «Номер кабинета» или «ИНН арендатора».")
+        return result
+
+    for row_number, row in enumerate(rows, 2):
+        values = {}
+        for column, value in zip(columns, row):
+            if column:
+                values[column] = _date(value) if column in ("entry_date", "exit_date") else _text(value)
+        if not any(values.values()):
+            continue
+        result.rows += 1
+
+        floor_value = values.pop("floor", "")
+        number = values.pop("number", "")
+        if number:
+            floor_key = floors.get(floor_value.lower(), floor_value)
+            room = by_number.get((floor_key, number))
+            targets = [room] if room else []
+            if not targets:
+                result.add_error(row_number, f"Кабинет {number} на этаже «{floor_value}» не найден.")
+                continue
+        elif values.get("inn"):
+            targets = by_inn.get(values["inn"], [])
+            if not targets:
+                result.add_error(row_number, f"Кабинеты арендатора с ИНН {values['inn']} не найдены.")
+                continue
+        else:
+            result.add_error(row_number, "Не указан номер кабинета или ИНН.")
+            continue
+
+        # Пустые ячейки не затирают существующие значения
+        new_values = {field: value for field, value in values.items() if field in IMPORT_FIELDS and value}
+        row_ok = True
+        for room in targets:
+            staged = result._changes.setdefault(id(room), (room, {}))[1]
+            # Проверяются только изменяемые поля: старые данные кабинета не мешают импорту
+            errors = validate_changes(dict(room, **staged), new_values, statuses)
+            if errors:
+                row_ok = False
+                for message in errors:
+                    result.add_error(row_number, f"Кабинет {room.get('number')}: {message}")
+                continue
+            staged.update(new_values)
+        if row_ok:
+            result.matched_rows += 1
+    return result
@@ -0,0 +1,137 @@
+"""
+Файлы журналов, которые только дополняются (история изменений, платежи).
+
+Журнал хранится в двух файлах: основа <имя>.json — сжатое состояние
+(столбцы со словарем строк и итоги) — и <имя>.json.log, в который каждое
+сохранение дописывает одну строку JSON с новыми записями (сегмент).
+Сохранение стоит столько, сколько в нем новых записей; основа
+перезаписывается (сжатие) только когда файл сегментов вырастает
+до четверти ее размера.
+
+Процессы, открывшие одно здание, дописывают сегменты под блокировкой
+data_file_lock и перед записью читают чужие сегменты, появившиеся
+с прошлого раза, поэтому ничьи записи не теряются. Основа и файл
+сегментов помечены общим поколением: после сжатия файл сегментов
+заменяется новым с другим поколением, и процесс, увидевший это,
+перечитывает журнал целиком.
+"""
+import os
+import json
+import uuid
+from stroycent.data_manager import data_file_lock
+from stroycent.utils import error_log
+
+# Файл сегментов сжимается в основу, когда он больше 1/COMPACT_RATIO основы и порога
+COMPACT_MIN_BYTES = 256 * 1024
+COMPACT_RATIO = 4
+
+
+class JournalFile:
+    """Основа и файл сегментов одного журнала; позиция чтения сегментов своя у каждого процесса."""
+
+    def __init__(self, path):
+        self.path = path
+        self.log_path = path + ".log"
+        self.generation = None
+        self._offset = 0
+        self._stale = False
+
+    def lock(self):
+        return data_file_lock(self.path)
+
+    def read(self):
+        """
+        Читает основу и все ее сегменты: (основа или None, [сегменты]).
+        Файл сегментов другого поколения (сжатие прервано после записи основы)
+        уже учтен в основе и пропускается.
+        """
+        base = None
+        corrupt = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    base = json.load(f)
+            except (OSError, ValueError) as e:
+                error_log("Ошибка загрузки журнала %s: %s", self.path, e)
+                corrupt = True
+        self.generation = base.get("generation") if base else None
+        self._offset = 0
+        records = self.read_new()
+        # Основа перезаписывается при первом сохранении, если она повреждена
+        # или сегменты другого поколения (тогда они не дописываются)
+        self._stale = corrupt or records is None
+        return base, records or []
+
+    def read_new(self):
+        """Сегменты, дописанные с прошлого чтения; None, если журнал с тех пор сжат."""
+        try:
+            f = open(self.log_path, "rb")
+        except FileNotFoundError:
+            return [] if self.generation is None else None
+        with f:
+            header = f.readline()
+            try:
+                generation = json.loads(header).get("generation")
+            except ValueError:
+                generation = None
+            if generation != self.generation:
+                return None
+            f.seek(max(self._offset, len(header)))
+            chunk = f.read()
+        # Строка без перевода строки еще дописывается (или запись прервана) и читается позже
+        end = chunk.rfind(b"\n") + 1
+        self._offset = max(self._offset, len(header)) + end
+        records = []
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                error_log("Поврежденный сегмент журнала пропущен: %s", self.log_path)
+        return records
+
+    def append(self, record):
+        """Дописывает сегмент (вызывается под блокировкой после read_new)."""
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with open(self.log_path, "ab") as f:
+            if f.tell() and self._offset < f.tell():
+                # Хвост прерванной записи: сегмент начинается с новой строки
+                line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            self._offset = f.tell()
+
+    def needs_compaction(self):
+        if self._stale:
+            return True
+        try:
+            base_size = os.path.getsize(self.path)
+        except OSError:
+            return True
+        try:
+            log_size = os.path.getsize(self.log_path)
+        except OSError:
+            return True
+        return log_size > max(COMPACT_MIN_BYTES, base_size // COMPACT_RATIO)
+
+    def compact(self, raw):
+        """
+        Записывает основу со всеми записями и начинает пустой файл сегментов
+        нового поколения (вызывается под блокировкой, когда все сегменты прочитаны).
+        """
+        generation = uuid.uuid4().hex
+        raw = dict(raw, generation=generation)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(raw, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        header = json.dumps({"generation": generation}).encode("utf-8") + b"\n"
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+        os.replace(tmp_path, self.log_path)
+        self.generation = generation
+        self._offset = len(header)
+        self._stale = False
@@ -0,0 +1,497 @@
+"""
+Ставки аренды и журнал платежей здания.
+
+Ставка хранится в кабинете (поле "rent", руб. в месяц), а начисления,
+оплаты и потери от простоя — в журнале building_ledger.json рядом с файлом
+данных. Журнал, как и история изменений, только дополняется: исправления
+вносятся записями с отрицательной суммой. Записи хранятся по столбцам
+со словарем строк, а на диск каждое сохранение дописывает только новые
+записи сегментом (stroycent.journal) — под блокировкой и после чтения
+записей других процессов, открывших то же здание.
+
+Вместе с записями поддерживаются помесячные итоги по этажам, статусам
+и типам оплаты и остатки задолженности по кабинетам, поэтому отчеты
+о выручке, задолженности и потерях от простоя строятся по итогам,
+без обхода журнала.
+"""
+import csv
+from datetime import date
+from stroycent.data_manager import (data_store, get_ledger_file_path, room_id, room_ids_by_key, building_floors,
+                                    after_save_callbacks, building_switch_callbacks, PAYMENT_TYPES)
+from stroycent.history import is_occupied
+from stroycent.journal import JournalFile
+from stroycent.importer import iter_rows, _text, _date
+from stroycent.utils import info_log
+
+# 2 — кабинеты в записях указаны идентификаторами (room_id), а не ключами "этаж:номер"
+LEDGER_FORMAT_VERSION = 2
+COLUMNS = ("date", "floor", "room", "kind", "amount", "payment_type", "status", "comment")
+
+# Виды записей: начисление аренды, оплата, потери от простоя (ставка свободного кабинета)
+KINDS = {"charge": "начисление", "payment": "оплата", "vacancy": "простой"}
+# Разрезы помесячных итогов
+DIMENSIONS = ("floor", "status", "payment_type")
+
+# Заголовки CSV (экспорт и импорт для бухгалтерии); при импорте регистр не важен
+CSV_HEADER = ("Дата", "Этаж", "Кабинет", "Вид", "Сумма", "Тип оплаты", "Статус", "Комментарий")
+CSV_COLUMNS = {
+    "дата": "date", "date": "date",
+    "этаж": "floor", "floor": "floor",
+    "кабинет": "room", "номер кабинета": "room", "room": "room",
+    "вид": "kind", "kind": "kind",
+    "сумма": "amount", "amount": "amount",
+    "тип оплаты": "payment_type", "payment_type": "payment_type",
+    "статус": "status", "status": "status",
+    "комментарий": "comment", "comment": "comment",
+}
+
+
+def parse_amount(value):
+    """Сумма из текста ("45 000,50") или числа; None, если это не число."""
+    if isinstance(value, (int, float)):
+        return round(float(value), 2)
+    text = str(value or "").replace(" ", "").replace(" ", "").replace(",", ".")
+    try:
+        return round(float(text), 2)
+    except ValueError:
+        return None
+
+
+def room_rent(room_data):
+    """Ставка аренды кабинета в месяц (0, если не задана)."""
+    return parse_amount(room_data.get("rent")) or 0.0
+
+
+def month_bounds(month):
+    """Первый и последний день месяца "ГГГГ-ММ" в виде строк ISO."""
+    year, number = int(month[:4]), int(month[5:7])
+    next_first = date(year + 1, 1, 1) if number == 12 else date(year, number + 1, 1)
+    return f"{month}-01", date.fromordinal(next_first.toordinal() - 1).isoformat()
+
+
+def is_leased(room_data, month):
+    """
+    Сдан ли кабинет в месяце: статус означает занятость, а срок аренды
+    (если даты заданы) пересекается с месяцем.
+    """
+    if not is_occupied(room_data):
+        return False
+    first, last = month_bounds(month)
+    entry_date = room_data.get("entry_date") or ""
+    exit_date = room_data.get("exit_date") or ""
+    return entry_date <= last and (not exit_date or exit_date >= first)
+
+
+def room_labels(data=None):
+    """Этаж и номер кабинетов по ключу записей журнала: {room_id: (этаж, номер)}."""
+    data = data_store if data is None else data
+    return {room_id(room): (str(floor_key), str(room.get("number", "")))
+            for floor_key, floor_data in data.get("floors", {}).items() for room in floor_data.get("rooms", [])}
+
+
+def room_label(key, labels):
+    """
+    (этаж, номер) кабинета по ключу записи. Ключи "этаж:номер", которые
+    не удалось перевести на идентификаторы, разбираются; для удаленных
+    кабинетов возвращается (None, None).
+    """
+    if key in labels:
+        return labels[key]
+    floor_key, separator, number = key.partition(":")
+    return (floor_key, number) if separator else (None, None)
+
+
+def _add(totals, kind, amount):
+    totals[kind] = round(totals.get(kind, 0.0) + amount, 2)
+
+
+class LedgerStore:
+    """Журнал начислений и оплат с помесячными итогами и остатками по кабинетам."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = JournalFile(path)
+        self.strings = []
+        self._string_index = {}
+        self.columns = {name: [] for name in COLUMNS}
+        # {месяц: {"total": {вид: сумма}, "floor"|"status"|"payment_type": {значение: {вид: сумма}}}}
+        self.rollups = {}
+        # Задолженность по кабинетам: {идентификатор кабинета: начислено - оплачено}
+        self.balances = {}
+        # Начисленные месяцы (начисление или простой) по кабинетам: {(месяц, идентификатор кабинета)}
+        self._accrued = set()
+        # Еще не записанные записи (значения в порядке COLUMNS)
+        self._pending = []
+
+    # --- Хранение ---
+
+    @classmethod
+    def open(cls, path, data):
+        store = cls(path)
+        base, records = store.file.read()
+        if base is not None and base.get("version", 1) < 2:
+            with store.file.lock():
+                # Файл перечитывается под блокировкой: его мог перевести другой процесс
+                base, records = store.file.read()
+                store._load(base)
+                for record in records:
+                    store._apply_record(record)
+                if base.get("version", 1) < 2:
+                    store._migrate_room_keys(data)
+                    store.file.compact(store._raw())
+            return store
+        if base is not None:
+            store._load(base)
+        for record in records:
+            store._apply_record(record)
+        return store
+
+    def reopen(self, path, data):
+        """Переключает журнал на другое здание, сохранив несохраненные записи."""
+        self.flush()
+        self.__dict__.update(LedgerStore.open(path, data).__dict__)
+
+    def _migrate_room_keys(self, data):
+        """Переводит записи с ключей "этаж:номер" на идентификаторы кабинетов и пересчитывает остатки."""
+        ids = room_ids_by_key(data)
+        strings = self.strings
+        self.columns["room"] = [self._intern(ids.get(strings[index], strings[index])) for index in self.columns["room"]]
+        self._rebuild_totals()
+        self._accrued = {(month, ids.get(key, key)) for month, key in self._accrued}
+        info_log("Журнал платежей переведен на идентификаторы кабинетов: %s", self.path)
+
+    def _load(self, raw):
+        self.strings = raw.get("strings", [])
+        self._string_index = {s: i for i, s in enumerate(self.strings)}
+        for name in COLUMNS:
+            self.columns[name] = raw.get("columns", {}).get(name, [])
+        if raw.get("version") == LEDGER_FORMAT_VERSION and "rollups" in raw and "balances" in raw:
+            self.rollups = raw["rollups"]
+            self.balances = raw["balances"]
+        else:
+            self._rebuild_totals()
+        dates, rooms, kinds = self.columns["date"], self.columns["room"], self.columns["kind"]
+        accrual_kinds = {self._string_index.get("charge"), self._string_index.get("vacancy")}
+        self._accrued = {(self.strings[dates[i]][:7], self.strings[rooms[i]])
+                         for i in range(len(dates)) if kinds[i] in accrual_kinds}
+
+    def _rebuild_totals(self):
+        """Полный пересчет итогов — только при загрузке файла без них."""
+        self.rollups = {}
+        self.balances = {}
+        for entry in self.entries():
+            self._update_totals(entry)
+
+    def _raw(self):
+        return {
+            "version": LEDGER_FORMAT_VERSION,
+            "strings": self.strings,
+            "columns": self.columns,
+            "rollups": self.rollups,
+            "balances": self.balances,
+        }
+
+    def _apply_record(self, record):
+        """Вносит сегмент, записанный другим процессом (или до запуска)."""
+        for values in record.get("entries", []):
+            self._add_entry(dict(zip(COLUMNS, values)))
+
+    def _reload(self):
+        """Журнал сжат другим процессом: перечитывается, несохраненные записи добавляются заново."""
+        base, records = self.file.read()
+        if base is None:
+            # Основа удалена или повреждена: она будет перезаписана из памяти
+            return
+        store = LedgerStore(self.path)
+        store.file = self.file
+        store._load(base)
+        for record in records:
+            store._apply_record(record)
+        for values in self._pending:
+            store._add_entry(dict(zip(COLUMNS, values)))
+        store._pending = self._pending
+        self.__dict__.update(store.__dict__)
+
+    def _read_segments(self):
+        """Забирает записи других процессов (под блокировкой журнала)."""
+        records = self.file.read_new()
+        if records is None:
+            self._reload()
+        else:
+            for record in records:
+                self._apply_record(record)
+
+    def _write_segment(self):
+        """Дописывает несохраненные записи (под блокировкой, после _read_segments)."""
+        if self._pending:
+            self.file.append({"entries": self._pending})
+            self._pending = []
+        if self.file.needs_compaction():
+            self.file.compact(self._raw())
+
+    def flush(self):
+        """Дописывает несохраненные записи на диск и забирает записи других процессов."""
+        with self.file.lock():
+            self._read_segments()
+            self._write_segment()
+
+    # --- Запись ---
+
+    def _intern(self, value):
+        value = "" if value is None else str(value)
+        index = self._string_index.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self._string_index[value] = index
+        return index
+
+    def _update_totals(self, entry):
+        kind, amount = entry["kind"], entry["amount"]
+        month = self.rollups.setdefault(entry["date"][:7], {"total": {}, "floor": {}, "status": {}, "payment_type": {}})
+        _add(month["total"], kind, amount)
+        for dimension in DIMENSIONS:
+            _add(month[dimension].setdefault(entry[dimension] or "—", {}), kind, amount)
+        if kind == "charge":
+            self.balances[entry["room"]] = round(self.balances.get(entry["room"], 0.0) + amount, 2)
+        elif kind == "payment":
+            self.balances[entry["room"]] = round(self.balances.get(entry["room"], 0.0) - amount, 2)
+
+    def _add_entry(self, entry):
+        entry = dict(entry, amount=round(float(entry["amount"]), 2))
+        for name in COLUMNS:
+            self.columns[name].append(entry["amount"] if name == "amount" else self._intern(entry.get(name)))
+        self._update_totals(entry)
+        if entry["kind"] in ("charge", "vacancy"):
+            self._accrued.add((entry["date"][:7], entry["room"]))
+        return entry
+
+    def append(self, entry):
+        """
+        Добавляет запись: {"date", "floor", "room", "kind", "amount",
+        "payment_type", "status", "comment"}; "room" — идентификатор кабинета (room_id).
+        """
+        entry = self._add_entry(entry)
+        self._pending.append([entry["amount"] if name == "amount" else "" if entry.get(name) is None
+                              else str(entry[name]) for name in COLUMNS])
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def add_payment(self, room_data, amount, when=None, comment=""):
+        """Записывает оплату кабинета (тип оплаты — из кабинета)."""
+        self.append({
+            "date": (when or date.today()).isoformat(),
+            "floor": str(room_data.get("floor", "")),
+            "room": room_id(room_data),
+            "kind": "payment",
+            "amount": amount,
+            "payment_type": room_data.get("payment_type", ""),
+            "status": room_data.get("status", "свободный"),
+            "comment": comment,
+        })
+
+    def accrue_month(self, month, data=None):
+        """
+        Начисляет аренду за месяц "ГГГГ-ММ" сданным кабинетам со ставкой
+        и записывает потери от простоя по остальным кабинетам со ставкой.
+        Кабинеты, по которым за месяц уже есть начисление, пропускаются.
+        Начисление идет под блокировкой журнала и сразу записывается, поэтому
+        два процесса не начислят один месяц дважды.
+        Возвращает {"charged", "vacant", "skipped", "charge", "vacancy"}.
+        """
+        with self.file.lock():
+            self._read_segments()
+            result = self._accrue(month, data_store if data is None else data)
+            self._write_segment()
+        return result
+
+    def _accrue(self, month, data):
+        result = {"charged": 0, "vacant": 0, "skipped": 0, "charge": 0.0, "vacancy": 0.0}
+        first, _ = month_bounds(month)
+        for floor_key, floor_data in data.get("floors", {}).items():
+            for room in floor_data.get("rooms", []):
+                rent = room_rent(room)
+                if rent <= 0:
+                    continue
+                key = room_id(room)
+                if (month, key) in self._accrued:
+                    result["skipped"] += 1
+                    continue
+                kind = "charge" if is_leased(room, month) else "vacancy"
+                self.append({
+                    "date": first,
+                    "floor": str(floor_key),
+                    "room": key,
+                    "kind": kind,
+                    "amount": rent,
+                    "payment_type": room.get("payment_type", "") if kind == "charge" else "",
+                    "status": room.get("status", "свободный"),
+                    "comment": "",
+                })
+                result["charged" if kind == "charge" else "vacant"] += 1
+                result[kind] = round(result[kind] + rent, 2)
+        return result
+
+    # --- Запросы ---
+
+    def __len__(self):
+        return len(self.columns["date"])
+
+    def entries(self, start=None, end=None):
+        """Перебирает записи (словари) с датой в диапазоне [start, end] (строки ISO)."""
+        strings = self.strings
+        columns = self.columns
+        for i in range(len(columns["date"])):
+            entry_date = strings[columns["date"][i]]
+            if (start and entry_date < start) or (end and entry_date > end):
+                continue
+            yield {
+                "date": entry_date,
+                "floor": strings[columns["floor"][i]],
+                "room": strings[columns["room"][i]],
+                "kind": strings[columns["kind"][i]],
+                "amount": columns["amount"][i],
+                "payment_type": strings[columns["payment_type"][i]],
+                "status": strings[columns["status"][i]],
+                "comment": strings[columns["comment"][i]],
+            }
+
+    def months(self):
+        return sorted(self.rollups)
+
+    def monthly(self):
+        """
+        Итоги по месяцам: [{"month", "charge", "payment", "vacancy", "arrears"}, ...],
+        где arrears — задолженность на конец месяца (начислено минус оплачено с начала журнала).
+        """
+        rows = []
+        arrears = 0.0
+        for month in self.months():
+            total = self.rollups[month]["total"]
+            arrears = round(arrears + total.get("charge", 0.0) - total.get("payment", 0.0), 2)
+            rows.append({
+                "month": month,
+                "charge": total.get("charge", 0.0),
+                "payment": total.get("payment", 0.0),
+                "vacancy": total.get("vacancy", 0.0),
+                "arrears": arrears,
+            })
+        return rows
+
+    def breakdown(self, month, dimension):
+        """Итоги месяца в разрезе "floor", "status" или "payment_type": {значение: {вид: сумма}}."""
+        return self.rollups.get(month, {}).get(dimension, {})
+
+    def debtors(self, limit=20):
+        """Кабинеты с наибольшей задолженностью: [(ключ кабинета (room_id), сумма), ...]."""
+        owing = [(key, balance) for key, balance in self.balances.items() if balance > 0]
+        owing.sort(key=lambda item: -item[1])
+        return owing[:limit]
+
+    def balance(self, room_data):
+        return self.balances.get(room_id(room_data), 0.0)
+
+    # --- Обмен с бухгалтерией ---
+
+    def export_csv(self, path, start=None, end=None):
+        """Сохраняет записи в CSV (разделитель ";", UTF-8 с BOM для Excel). Возвращает число записей."""
+        names = {floor["key"]: floor["name"] for floor in building_floors()}
+        labels = room_labels()
+        count = 0
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(CSV_HEADER)
+            for entry in self.entries(start, end):
+                number = room_label(entry["room"], labels)[1] or ""
+                writer.writerow([entry["date"], names.get(entry["floor"], entry["floor"]), number,
+                                 KINDS.get(entry["kind"], entry["kind"]), f"{entry['amount']:.2f}",
+                                 entry["payment_type"], entry["status"], entry["comment"]])
+                count += 1
+        return count
+
+
+class LedgerImportResult:
+    """Итог разбора файла бухгалтерии: записи для журнала и ошибки по строкам."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.entries = []
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+def plan_ledger_import(path, data=None):
+    """
+    Разбирает CSV или XLSX с записями журнала, не меняя журнал.
+    Строки сопоставляются с кабинетами по этажу (ключ или название) и номеру;
+    вид по умолчанию — оплата. Возвращает LedgerImportResult.
+    """
+    data = data_store if data is None else data
+    result = LedgerImportResult(path)
+    floors = {}
+    for floor in building_floors():
+        floors[floor["key"]] = floor["key"]
+        floors[floor["name"].strip().lower()] = floor["key"]
+    rooms = {(str(floor_key), str(room.get("number", ""))): room
+             for floor_key, floor_data in data.get("floors", {}).items() for room in floor_data.get("rooms", [])}
+    kinds = {name: kind for kind, name in KINDS.items()}
+    kinds.update({kind: kind for kind in KINDS})
+
+    rows = iter_rows(path)
+    header = next(rows, None)
+    columns = [CSV_COLUMNS.get(_text(name).lower()) for name in header or []]
+    if not {"date", "room", "amount"} <= set(columns):
+        result.add_error(1, "Нужны столбцы «Дата», «Кабинет» и «Сумма».")
+        return result
+
+    for row_number, row in enumerate(rows, 2):
+        values = {column: value for column, value in zip(columns, row) if column}
+        if not any(_text(value) for value in values.values()):
+            continue
+        result.rows += 1
+        entry_date = _date(values.get("date"))
+        try:
+            date.fromisoformat(entry_date)
+        except ValueError:
+            result.add_error(row_number, f"Некорректная дата: {_text(values.get('date'))}.")
+            continue
+        floor_value = _text(values.get("floor"))
+        number = _text(values.get("room"))
+        room = rooms.get((floors.get(floor_value.lower(), floor_value), number))
+        if room is None:
+            result.add_error(row_number, f"Кабинет {number} на этаже «{floor_value}» не найден.")
+            continue
+        kind = kinds.get(_text(values.get("kind")).lower() or "payment")
+        if kind is None:
+            result.add_error(row_number, f"Неизвестный вид записи: {_text(values.get('kind'))}.")
+            continue
+        amount = parse_amount(values.get("amount"))
+        if amount is None:
+            result.add_error(row_number, f"Некорректная сумма: {_text(values.get('amount'))}.")
+            continue
+        payment_type = _text(values.get("payment_type")) or room.get("payment_type", "")
+        if payment_type and payment_type not in PAYMENT_TYPES:
+            result.add_error(row_number, f"Неизвестный тип оплаты: {payment_type}.")
+            continue
+        result.entries.append({
+            "date": entry_date,
+            "floor": str(room.get("floor", "")),
+            "room": room_id(room),
+            "kind": kind,
+            "amount": amount,
+            "payment_type": payment_type,
+            "status": _text(values.get("status")) or room.get("status", "свободный"),
+            "comment": _text(values.get("comment")),
+        })
+    return result
+
+
+# Журнал текущего здания; сохраняется вместе с основным файлом данных
+ledger_store = LedgerStore.open(get_ledger_file_path(), data_store)
+after_save_callbacks.append(ledger_store.flush)
+building_switch_callbacks.append(lambda: ledger_store.reopen(get_ledger_file_path(), data_store))
@@ -0,0 +1,109 @@
+"""
+Однократная нормализация контуров всех кабинетов в файлах данных зданий.
+
+Новые и измененные контуры нормализуются при сохранении
+(geometry.normalize_polygon); эта команда приводит к тому же виду контуры,
+нарисованные раньше, и сообщает, сколько вершин и байт файла удалось
+сэкономить. Перед записью сохраняется копия файла с расширением .bak.
+Повторный запуск ничего не меняет.
+
+Запуск из командной строки:
+    python -m stroycent.normalize_geometry
+    python -m stroycent.normalize_geometry --building all --dry-run
+    python -m stroycent.normalize_geometry --tolerance 2 --precision 0
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+from stroycent.geometry import normalize_polygon, NORMALIZE_TOLERANCE, COORDINATE_PRECISION
+from stroycent.data_manager import portfolio, get_building, building_data_path, data_file_lock
+
+
+def normalize_rooms(data, tolerance=NORMALIZE_TOLERANCE, precision=COORDINATE_PRECISION):
+    """
+    Нормализует контуры кабинетов в данных здания на месте.
+    Возвращает {"rooms", "changed", "vertices_before", "vertices_after"}.
+    """
+    report = {"rooms": 0, "changed": 0, "vertices_before": 0, "vertices_after": 0}
+    for floor_data in data.get("floors", {}).values():
+        for room in floor_data.get("rooms", []):
+            points = room.get("points")
+            if not points:
+                continue
+            normalized = normalize_polygon(points, tolerance, precision)
+            if len(normalized) < 3:
+                # Вырожденный контур оставляется как есть: его исправит пользователь
+                normalized = points
+            report["rooms"] += 1
+            report["vertices_before"] += len(points)
+            report["vertices_after"] += len(normalized)
+            if normalized != points:
+                room["points"] = normalized
+                report["changed"] += 1
+    return report
+
+
+def migrate_file(path, tolerance=NORMALIZE_TOLERANCE, precision=COORDINATE_PRECISION, dry_run=False):
+    """
+    Нормализует файл данных здания под блокировкой файла. Работающие
+    приложения подхватят изменения как правку другого процесса.
+    Возвращает отчет normalize_rooms с размерами файла до и после.
+    """
+    with data_file_lock(path):
+        bytes_before = os.path.getsize(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        report = normalize_rooms(data, tolerance, precision)
+        if report["changed"]:
+            data["version"] = data.get("version", 0) + 1
+        # Формат записи тот же, что у save_data
+        text = json.dumps(data, indent=4, ensure_ascii=False)
+        report["bytes_before"] = bytes_before
+        report["bytes_after"] = len(text.encode("utf-8")) if report["changed"] else bytes_before
+        if report["changed"] and not dry_run:
+            shutil.copyfile(path, path + ".bak")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нормализация контуров кабинетов в файлах данных")
+    parser.add_argument("--building", help="Идентификатор здания или all; по умолчанию — текущее здание")
+    parser.add_argument("--tolerance", type=float, default=NORMALIZE_TOLERANCE,
+                        help="Допуск удаления вершин, пикселей плана")
+    parser.add_argument("--precision", type=int, default=COORDINATE_PRECISION,
+                        help="Знаков после запятой в координатах")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать отчет, не меняя файлы")
+    args = parser.parse_args(argv)
+
+    known = [building["id"] for building in portfolio["buildings"]]
+    if args.building and args.building != "all" and args.building not in known:
+        print(f"Здание {args.building} не найдено. Доступные здания: {', '.join(known)}")
+        return 1
+    if args.building == "all":
+        buildings = portfolio["buildings"]
+    else:
+        buildings = [get_building(args.building or portfolio["current"])]
+
+    for building in buildings:
+        path = building_data_path(building)
+        if not os.path.exists(path):
+            continue
+        report = migrate_file(path, args.tolerance, args.precision, args.dry_run)
+        saved_bytes = report["bytes_before"] - report["bytes_after"]
+        saved_vertices = report["vertices_before"] - report["vertices_after"]
+        print(f"{building['name']}: кабинетов {report['rooms']}, изменено {report['changed']}; "
+              f"вершин {report['vertices_before']} -> {report['vertices_after']} (-{saved_vertices}); "
+              f"размер файла {report['bytes_before']} -> {report['bytes_after']} байт (-{saved_bytes})")
+    if args.dry_run:
+        print("Пробный запуск: файлы не изменены.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Обзор здания: миниатюры всех этажей с кабинетами, закрашенными по статусам.
+
+Задания на отрисовку собираются так же, как для экспорта (export.build_jobs),
+а миниатюры рисуются в пуле потоков. Готовые миниатюры хранятся на диске
+в папке assets/overview под именем, включающим хеш данных этажа и плана,
+поэтому заново рисуются только этажи, которые изменились.
+"""
+import os
+import json
+import hashlib
+from PySide6.QtCore import Qt, QObject, QRunnable, QPointF, QRectF, Signal
+from PySide6.QtGui import QImage, QPainter, QColor, QPen, QPolygonF
+from stroycent import assets
+from stroycent import export
+from stroycent.utils import debug_log
+
+# Ширина миниатюры этажа, пикселей
+THUMBNAIL_WIDTH = 240
+# Меняется вместе с отрисовкой миниатюр, чтобы старые файлы кэша не использовались
+CACHE_VERSION = 1
+
+
+def get_cache_dir():
+    return os.path.join(assets.get_assets_dir(), "overview")
+
+
+def build_jobs():
+    """Задания на отрисовку миниатюр всех этажей текущего здания (только в потоке интерфейса)."""
+    return export.build_jobs(width=THUMBNAIL_WIDTH)
+
+
+def floor_counts(job):
+    """Количество кабинетов этажа по статусам."""
+    counts = {}
+    for room in job["rooms"]:
+        status = room.get("status", "свободный")
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+def _plan_identity(job):
+    # Имя плана в хранилище — хеш содержимого; у старых планов вне хранилища — время изменения и размер
+    if job.get("plan_asset"):
+        return job["plan_asset"]
+    if job.get("plan_file") and os.path.exists(job["plan_file"]):
+        stat = os.stat(job["plan_file"])
+        return [job["plan_file"], stat.st_mtime_ns, stat.st_size]
+    return None
+
+
+def floor_hash(job):
+    """Хеш всего, что видно на миниатюре: кабинетов, цветов статусов и плана."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([
+        CACHE_VERSION,
+        job["width"],
+        job["plan_size"],
+        _plan_identity(job),
+        [[room.get("status"), room["points"]] for room in job["rooms"]],
+        {status: colors.get("bg") for status, colors in job["statuses"].items()},
+    ], ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _cache_prefix(job):
+    return f"{export._safe_name(job['building_id'])}_{export._safe_name(job['floor'])}_"
+
+
+def cache_path(job, digest):
+    return os.path.join(get_cache_dir(), f"{_cache_prefix(job)}{digest[:32]}.png")
+
+
+def _prune_cache(job, keep):
+    """Удаляет устаревшие миниатюры этого этажа."""
+    prefix = _cache_prefix(job)
+    for name in os.listdir(get_cache_dir()):
+        if name.startswith(prefix) and name.endswith(".png") and os.path.join(get_cache_dir(), name) != keep:
+            try:
+                os.remove(os.path.join(get_cache_dir(), name))
+            except OSError:
+                pass
+
+
+def render_thumbnail(job):
+    """Рисует план этажа с кабинетами без подписей и легенды."""
+    plan_w, plan_h = job["plan_size"]
+    scale = job["width"] / plan_w
+    image = QImage(job["width"], max(1, round(plan_h * scale)), QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.white)
+    painter = QPainter(image)
+    painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+    painter.scale(scale, scale)
+    plan = QImage(job["plan_file"]) if job.get("plan_file") else QImage()
+    if plan.isNull():
+        painter.fillRect(QRectF(0, 0, plan_w, plan_h), Qt.lightGray)
+    else:
+        painter.drawImage(QRectF(0, 0, plan_w, plan_h), plan)
+    painter.setPen(QPen(Qt.black, 0))
+    brushes = {}
+    for room in job["rooms"]:
+        status = room.get("status", "свободный")
+        if status not in brushes:
+            brushes[status] = QColor(job["statuses"].get(status, export.FALLBACK_COLORS)["bg"])
+        painter.setBrush(brushes[status])
+        painter.drawPolygon(QPolygonF([QPointF(x, y) for x, y in room["points"]]))
+    painter.end()
+    return image
+
+
+def load_thumbnail(job):
+    """
+    Миниатюра этажа из кэша или, если данные изменились, нарисованная заново.
+    Возвращает (хеш, QImage).
+    """
+    digest = floor_hash(job)
+    path = cache_path(job, digest)
+    image = QImage(path) if os.path.exists(path) else QImage()
+    if not image.isNull():
+        return digest, image
+    image = render_thumbnail(job)
+    os.makedirs(get_cache_dir(), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if image.save(tmp_path, "PNG"):
+        os.replace(tmp_path, path)
+        _prune_cache(job, path)
+    debug_log("Миниатюра этажа %s нарисована заново", job["floor"])
+    return digest, image
+
+
+class _ThumbnailSignals(QObject):
+    ready = Signal(str, str, QImage)
+    failed = Signal(str, str)
+
+
+class ThumbnailTask(QRunnable):
+    """Миниатюра этажа в пуле потоков: сигнал ready(этаж, хеш, изображение)."""
+
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.signals = _ThumbnailSignals()
+
+    def run(self):
+        try:
+            digest, image = load_thumbnail(self.job)
+        except Exception as e:
+            self.signals.failed.emit(self.job["floor"], str(e))
+            return
+        self.signals.ready.emit(self.job["floor"], digest, image)
@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import functools
+from collections import deque
+
+# Замеры включаются переменной STROYCENT_PERF=1 или из окна производительности.
+# В выключенном состоянии обертка только проверяет этот флаг.
+enabled = os.environ.get("STROYCENT_PERF") == "1"
+
+# Сколько последних замеров хранится для каждой операции
+MAX_SAMPLES = 500
+
+_samples = {}
+_counts = {}
+
+
+def set_enabled(value):
+    global enabled
+    enabled = bool(value)
+
+
+def record(name, seconds):
+    """Добавляет замер длительности операции (в секундах)."""
+    samples = _samples.get(name)
+    if samples is None:
+        samples = _samples[name] = deque(maxlen=MAX_SAMPLES)
+    samples.append(seconds)
+    _counts[name] = _counts.get(name, 0) + 1
+
+
+def timed(name):
+    """Декоратор: измеряет длительность вызова, если замеры включены."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def stats():
+    """
+    Сводка по операциям: {имя: {"count", "last_ms", "mean_ms", "p95_ms", "max_ms"}}.
+    """
+    result = {}
+    for name, samples in _samples.items():
+        values = sorted(samples)
+        result[name] = {
+            "count": _counts.get(name, 0),
+            "last_ms": samples[-1] * 1000 if samples else 0.0,
+            "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+            "p95_ms": _percentile(values, 0.95) * 1000,
+            "max_ms": values[-1] * 1000 if values else 0.0,
+        }
+    return result
+
+
+def reset():
+    _samples.clear()
+    _counts.clear()
+
+
+def export_json(path, extra=None):
+    """Сохраняет текущие замеры (и дополнительные сведения) в JSON-файл."""
+    report = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "enabled": enabled,
+        "timings": stats(),
+    }
+    if extra:
+        report.update(extra)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    return report
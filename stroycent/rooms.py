@@ -0,0 +1,89 @@
+"""
+Номера кабинетов: индекс «этаж и номер → кабинет» для проверки
+уникальности номера на этаже.
+
+Кабинет определяется постоянным идентификатором "id" (data_manager.room_id),
+который не меняется при смене номера; номер — отображаемое поле.
+Индекс, как и индекс статусов, обновляется по событиям журнала изменений
+(history_store), поэтому проверка номера не обходит этаж.
+"""
+from stroycent.data_manager import data_store, room_id, merge_callbacks, building_switch_callbacks
+from stroycent.history import history_store
+from stroycent.utils import info_log
+
+
+def _number_key(floor, number):
+    return str(floor), str(number or "").strip()
+
+
+class RoomNumberIndex:
+    """Индекс {(этаж, номер): {идентификатор кабинета: кабинет}} по всем этажам здания."""
+
+    def __init__(self, data):
+        self.data = data
+        self._rooms = {}
+        self.rebuild()
+
+    def rebuild(self):
+        """Полное перестроение: после загрузки, смены здания и слияния с другим процессом."""
+        self._rooms = {}
+        for floor_key, floor_data in self.data.get("floors", {}).items():
+            for room_data in floor_data.get("rooms", []):
+                self._add(room_data, room_data.get("floor", floor_key), room_data.get("number"))
+        for (floor, number), rooms in self.duplicates():
+            # Повторы из старых файлов не исправляются молча: их видно в логе и при сохранении кабинета
+            info_log("На этаже %s несколько кабинетов с номером %s: %d", floor, number, len(rooms))
+
+    def _add(self, room_data, floor, number):
+        self._rooms.setdefault(_number_key(floor, number), {})[room_id(room_data)] = room_data
+
+    def _remove(self, room_data, floor, number):
+        key = _number_key(floor, number)
+        rooms = self._rooms.get(key)
+        if rooms is not None:
+            rooms.pop(room_id(room_data), None)
+            if not rooms:
+                del self._rooms[key]
+
+    def rooms(self, floor, number):
+        """Кабинеты этажа с этим номером (обычно не больше одного)."""
+        return list(self._rooms.get(_number_key(floor, number), {}).values())
+
+    def conflict(self, room_data, number):
+        """Другой кабинет того же этажа с номером number или None."""
+        for other in self.rooms(room_data.get("floor"), number):
+            if room_id(other) != room_id(room_data):
+                return other
+        return None
+
+    def duplicates(self):
+        """Номера, которые на этаже носят несколько кабинетов: [((этаж, номер), [кабинеты]), ...]."""
+        return [(key, list(rooms.values())) for key, rooms in self._rooms.items() if len(rooms) > 1]
+
+    # --- Наблюдатель журнала изменений ---
+
+    def room_created(self, room_data):
+        self._add(room_data, room_data.get("floor"), room_data.get("number"))
+
+    def room_deleted(self, room_data):
+        self._remove(room_data, room_data.get("floor"), room_data.get("number"))
+
+    def room_changed(self, room_data, old_values):
+        old = old_values.get("number", room_data.get("number"))
+        if _number_key(0, old) != _number_key(0, room_data.get("number")):
+            self._remove(room_data, room_data.get("floor"), old)
+            self._add(room_data, room_data.get("floor"), room_data.get("number"))
+
+
+def validate_room_number(room_data, number):
+    """Ошибки номера кабинета с учетом других кабинетов этажа (пустой список, если ошибок нет)."""
+    if number_index.conflict(room_data, number) is not None:
+        return [f"Кабинет с номером {str(number).strip()} уже есть на этом этаже."]
+    return []
+
+
+# Индекс текущего здания
+number_index = RoomNumberIndex(data_store)
+history_store.listeners.append(number_index)
+merge_callbacks.append(number_index.rebuild)
+building_switch_callbacks.append(number_index.rebuild)
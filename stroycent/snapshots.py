@@ -0,0 +1,373 @@
+"""
+Автоматические снимки файла данных здания.
+
+Снимки лежат в папке snapshots/<имя файла данных> рядом с файлом данных
+и сжаты gzip. Полный снимок — весь файл данных; снимок изменений хранит
+только кабинеты, отличающиеся от последнего полного снимка (неизменные
+кабинеты записываются номером позиции в полном снимке), поэтому любой
+снимок восстанавливается чтением не больше двух файлов.
+
+Снимок снимается с файла на диске (он заменяется при сохранении целиком
+и всегда согласован) в отдельном процессе: разбор большого JSON в потоке
+удерживал бы GIL и останавливал интерфейс. Данные в памяти не используются.
+Поэтому модуль не импортирует data_manager на верхнем уровне — дочерний
+процесс не должен читать данные здания при импорте (по той же причине
+main.py, который дочерний процесс тоже импортирует, подключает приложение
+только в основном процессе; см. tests/test_worker_imports.py). Старые снимки
+удаляются по правилам хранения: все снимки за последние часы, по одному
+в день за последние дни.
+"""
+import os
+import re
+import gzip
+import json
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PySide6.QtCore import QObject, QTimer, Signal
+from stroycent.utils import debug_log, error_log
+
+# Настройки по умолчанию (хранятся в portfolio.json в разделе "snapshots")
+DEFAULT_SETTINGS = {
+    "interval_minutes": 10,  # Период снимков; 0 — только вручную
+    "keep_all_hours": 24,    # Сколько часов хранятся все снимки
+    "keep_daily_days": 30,   # Сколько дней хранится по одному снимку в день
+}
+# Полный снимок делается после стольких снимков изменений подряд
+FULL_EVERY = 24
+# Если снимок изменений больше этой доли файла данных, вместо него делается полный
+MAX_DELTA_RATIO = 0.5
+
+TIME_FORMAT = "%Y%m%d-%H%M%S"
+_NAME_RE = re.compile(r"(\d{8}-\d{6})_(full|delta-(\d{8}-\d{6}))\.json\.gz")
+
+
+# Последний полный снимок в памяти процесса-исполнителя: {имя: данные}
+_base_cache = {}
+
+
+def get_settings():
+    from stroycent.data_manager import portfolio
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(portfolio.get("snapshots", {}))
+    return settings
+
+
+def save_settings(settings):
+    from stroycent.data_manager import portfolio, save_portfolio
+    portfolio["snapshots"] = {key: settings[key] for key in DEFAULT_SETTINGS}
+    save_portfolio()
+
+
+def get_snapshot_dir(data_file=None):
+    if data_file is None:
+        from stroycent.data_manager import get_data_file_path
+        data_file = get_data_file_path()
+    stem = os.path.splitext(os.path.basename(data_file))[0]
+    return os.path.join(os.path.dirname(data_file), "snapshots", stem)
+
+
+def list_snapshots(directory):
+    """
+    Снимки в папке от старых к новым: [{"name", "time", "kind", "base", "size", "source_mtime"}, ...].
+    Для снимка изменений "base" — имя его полного снимка, "source_mtime" —
+    время изменения файла данных, с которого снят снимок.
+    """
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for entry in os.scandir(directory):
+        match = _NAME_RE.fullmatch(entry.name)
+        if not match:
+            continue
+        stamp, kind, base = match.groups()
+        snapshots.append({
+            "name": entry.name,
+            "time": datetime.strptime(stamp, TIME_FORMAT),
+            "kind": "full" if kind == "full" else "delta",
+            "base": f"{base}_full.json.gz" if base else None,
+            "size": entry.stat().st_size,
+            "source_mtime": entry.stat().st_mtime_ns,
+        })
+    snapshots.sort(key=lambda snapshot: snapshot["name"])
+    return snapshots
+
+
+def _room_key(room):
+    # Номер кабинета может повторяться на разных этажах, но этажи сравниваются по отдельности
+    return room.get("id") or room.get("number")
+
+
+def compute_delta(base, data):
+    """
+    Изменения data относительно полного снимка base. Этажи и кабинеты
+    перечисляются в порядке data; кабинет, не изменившийся с base,
+    записывается индексом в списке кабинетов того же этажа base.
+    """
+    base_floors = base.get("floors", {})
+    floors = {}
+    for floor_key, floor_data in data.get("floors", {}).items():
+        base_rooms = base_floors.get(floor_key, {}).get("rooms", [])
+        positions = {_room_key(room): index for index, room in enumerate(base_rooms)}
+        rooms = []
+        for room in floor_data.get("rooms", []):
+            index = positions.get(_room_key(room))
+            rooms.append(index if index is not None and base_rooms[index] == room else room)
+        floors[floor_key] = {
+            "fields": {key: value for key, value in floor_data.items() if key != "rooms"},
+            "rooms": rooms,
+        }
+    return {"data": {key: value for key, value in data.items() if key != "floors"}, "floors": floors}
+
+
+def apply_delta(base, delta):
+    """Восстанавливает данные из полного снимка и снимка изменений."""
+    data = dict(delta["data"])
+    data["floors"] = {}
+    base_floors = base.get("floors", {})
+    for floor_key, floor_delta in delta["floors"].items():
+        base_rooms = base_floors.get(floor_key, {}).get("rooms", [])
+        floor_data = dict(floor_delta["fields"])
+        floor_data["rooms"] = [base_rooms[room] if isinstance(room, int) else room for room in floor_delta["rooms"]]
+        data["floors"][floor_key] = floor_data
+    return data
+
+
+def _read(directory, name):
+    with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write(directory, name, text, source_mtime):
+    path = os.path.join(directory, name)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(text)
+    # Время изменения снимка — время изменения файла данных: по нему видно, изменился ли файл
+    os.utime(tmp_path, ns=(source_mtime, source_mtime))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(directory, name, cache=None):
+    """
+    Данные здания на момент снимка. cache — словарь {имя полного снимка: данные}
+    для повторного использования прочитанного полного снимка.
+    """
+    match = _NAME_RE.fullmatch(name)
+    if not match:
+        raise ValueError(f"Неизвестный снимок {name}")
+    if match.group(2) == "full":
+        return _read(directory, name)
+    base_name = f"{match.group(3)}_full.json.gz"
+    if cache is not None and base_name in cache:
+        base = cache[base_name]
+    else:
+        base = _read(directory, base_name)
+        if cache is not None:
+            cache.clear()
+            cache[base_name] = base
+    return apply_delta(base, _read(directory, name))
+
+
+def take_snapshot(data_file, directory, cache=None, force=False, now=None):
+    """
+    Делает снимок файла данных, если файл изменился после последнего снимка
+    (или force). Возвращает описание снимка из list_snapshots или None.
+    cache — как в load_snapshot: последний полный снимок остается в памяти.
+    """
+    if not os.path.exists(data_file):
+        return None
+    now = now or datetime.now()
+    snapshots = list_snapshots(directory)
+    stat = os.stat(data_file)
+    if snapshots and not force and stat.st_mtime_ns == snapshots[-1]["source_mtime"]:
+        return None
+    stamp = now.strftime(TIME_FORMAT)
+    if any(snapshot["name"].startswith(stamp) for snapshot in snapshots):
+        return None
+    with open(data_file, "rb") as f:
+        raw = f.read()
+    data = json.loads(raw)
+
+    fulls = [snapshot for snapshot in snapshots if snapshot["kind"] == "full"]
+    deltas_since_full = len(snapshots) - snapshots.index(fulls[-1]) - 1 if fulls else 0
+    text = None
+    if fulls and deltas_since_full < FULL_EVERY:
+        base_name = fulls[-1]["name"]
+        try:
+            if cache is None or base_name not in cache:
+                base = _read(directory, base_name)
+                if cache is not None:
+                    cache.clear()
+                    cache[base_name] = base
+            else:
+                base = cache[base_name]
+            text = json.dumps(compute_delta(base, data), ensure_ascii=False, separators=(",", ":"))
+            name = f"{stamp}_delta-{base_name[:15]}.json.gz"
+        except (OSError, ValueError) as e:
+            error_log("Не удалось прочитать полный снимок %s: %s", base_name, e)
+            text = None
+        if text is not None and len(text) > len(raw) * MAX_DELTA_RATIO:
+            text = None
+    if text is None:
+        name = f"{stamp}_full.json.gz"
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        if cache is not None:
+            cache.clear()
+            cache[name] = data
+    os.makedirs(directory, exist_ok=True)
+    _write(directory, name, text, stat.st_mtime_ns)
+    debug_log("Снимок данных: %s", name)
+    return next(snapshot for snapshot in list_snapshots(directory) if snapshot["name"] == name)
+
+
+def prune_snapshots(directory, settings=None, now=None):
+    """
+    Удаляет снимки, не попадающие под правила хранения. Полные снимки,
+    на которых основаны оставшиеся снимки изменений, не удаляются.
+    Возвращает список удаленных имен.
+    """
+    settings = settings or get_settings()
+    now = now or datetime.now()
+    snapshots = list_snapshots(directory)
+    if not snapshots:
+        return []
+    keep = {snapshots[-1]["name"]}
+    recent = now - timedelta(hours=settings["keep_all_hours"])
+    daily = now - timedelta(days=settings["keep_daily_days"])
+    days = set()
+    for snapshot in reversed(snapshots):
+        if snapshot["time"] >= recent:
+            keep.add(snapshot["name"])
+        elif snapshot["time"] >= daily and snapshot["time"].date() not in days:
+            days.add(snapshot["time"].date())
+            keep.add(snapshot["name"])
+    keep |= {snapshot["base"] for snapshot in snapshots if snapshot["name"] in keep and snapshot["base"]}
+    removed = []
+    for snapshot in snapshots:
+        if snapshot["name"] not in keep:
+            try:
+                os.remove(os.path.join(directory, snapshot["name"]))
+                removed.append(snapshot["name"])
+            except OSError as e:
+                error_log("Не удалось удалить снимок %s: %s", snapshot["name"], e)
+    return removed
+
+
+def describe_snapshot(directory, name, data_file):
+    """
+    Сводка снимка для окна снимков: этажи и кабинеты снимка и отличия
+    от файла данных data_file. Возвращает словарь с количествами.
+    """
+    data = load_snapshot(directory, name, _base_cache)
+    with open(data_file, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    summary = {"floors": len(data.get("floors", {})), "rooms": 0, "changed": 0, "added": 0, "removed": 0}
+    current_floors = current.get("floors", {})
+    for floor_key in set(data.get("floors", {})) | set(current_floors):
+        rooms = {_room_key(room): room for room in data.get("floors", {}).get(floor_key, {}).get("rooms", [])}
+        now = {_room_key(room): room for room in current_floors.get(floor_key, {}).get("rooms", [])}
+        summary["rooms"] += len(rooms)
+        summary["changed"] += sum(1 for key, room in rooms.items() if key in now and now[key] != room)
+        summary["added"] += sum(1 for key in now if key not in rooms)
+        summary["removed"] += sum(1 for key in rooms if key not in now)
+    return summary
+
+
+def _snapshot_job(data_file, directory, force, settings):
+    """Задание процесса-исполнителя: снимок и удаление старых снимков."""
+    snapshot = take_snapshot(data_file, directory, _base_cache, force)
+    prune_snapshots(directory, settings)
+    return snapshot
+
+
+class SnapshotManager(QObject):
+    """
+    Снимки текущего здания по таймеру и по запросу. Снимки и чтение снимков
+    выполняются по одному в процессе-исполнителе, который запускается при
+    первом снимке и держит в памяти последний полный снимок.
+
+    taken(описание или None) приходит после каждого снимка (запрос во время
+    снимка выполняется после него), described(имя, сводка или None, ошибка) —
+    после чтения снимка для окна снимков.
+    """
+    taken = Signal(object)
+    described = Signal(str, object, str)
+    # Результат задания из потока исполнителя: (вид, аргумент, результат, ошибка)
+    _done = Signal(str, object, object, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = None
+        self._broken = False
+        self._running = False
+        self._queued = None
+        self._done.connect(self._on_done)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.request)
+        self.apply_settings()
+
+    def apply_settings(self):
+        minutes = get_settings()["interval_minutes"]
+        if minutes > 0:
+            self.timer.start(int(minutes * 60 * 1000))
+        else:
+            self.timer.stop()
+
+    def busy(self):
+        return self._running
+
+    def _submit(self, kind, argument, function, *args):
+        if self._broken:
+            # Процесс-исполнитель завершился аварийно: создается новый
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._broken = False
+        if self._executor is None:
+            # spawn: дочерний процесс не наследует состояние Qt родителя
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+        def done(future):
+            try:
+                self._done.emit(kind, argument, future.result(), "")
+            except Exception as e:
+                self._broken = self._broken or isinstance(e, BrokenProcessPool)
+                self._done.emit(kind, argument, None, str(e) or type(e).__name__)
+
+        try:
+            self._executor.submit(function, *args).add_done_callback(done)
+        except BrokenProcessPool as e:
+            self._broken = True
+            self._done.emit(kind, argument, None, str(e))
+
+    def request(self, force=False):
+        """Запускает снимок в фоне или ставит его в очередь за текущим."""
+        from stroycent.data_manager import get_data_file_path
+        if self._running:
+            self._queued = bool(self._queued) or force
+            return
+        self._running = True
+        self._submit("snapshot", None, _snapshot_job, get_data_file_path(), get_snapshot_dir(), force, get_settings())
+
+    def describe(self, name):
+        """Читает снимок в процессе-исполнителе; результат — сигнал described."""
+        from stroycent.data_manager import get_data_file_path
+        self._submit("describe", name, describe_snapshot, get_snapshot_dir(), name, get_data_file_path())
+
+    def _on_done(self, kind, argument, result, error):
+        if kind == "describe":
+            self.described.emit(argument, result, error)
+            return
+        self._running = False
+        if error:
+            error_log("Ошибка создания снимка данных: %s", error)
+        if self._queued is not None:
+            force, self._queued = self._queued, None
+            self.request(force)
+        self.taken.emit(result)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
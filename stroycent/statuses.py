@@ -0,0 +1,122 @@
+"""
+Статусы кабинетов: обратный индекс «статус → кабинеты» и каскадное
+переименование и удаление статусов.
+
+Кабинеты по-прежнему хранят название статуса (так файл данных остается
+читаемым и совместимым с импортом, экспортом и другими процессами),
+а у каждого статуса есть постоянный "id", который не меняется при
+переименовании: по нему отчеты, начисления и шкала времени определяют
+занятость кабинета (stroycent.history.is_occupied). Индекс обновляется по событиям журнала изменений
+(history_store), поэтому переименование или удаление статуса затрагивает
+только кабинеты этого статуса на всех этажах, без обхода всего здания.
+"""
+from stroycent.data_manager import (data_store, new_status_id, ensure_status_ids, merge_callbacks,
+                                    building_switch_callbacks)
+from stroycent.history import history_store, TRACKED_FIELDS
+
+DEFAULT_ROOM_STATUS = "свободный"
+
+
+def _status(room_data):
+    return room_data.get("status") or DEFAULT_ROOM_STATUS
+
+
+class StatusIndex:
+    """Обратный индекс {название статуса: {id(кабинета): кабинет}} по всем этажам здания."""
+
+    def __init__(self, data):
+        self.data = data
+        self._rooms = {}
+        self.rebuild()
+
+    def rebuild(self):
+        """Полное перестроение: после загрузки, смены здания и слияния с другим процессом."""
+        ensure_status_ids(self.data.setdefault("statuses", {}))
+        self._rooms = {}
+        for floor_data in self.data.get("floors", {}).values():
+            for room_data in floor_data.get("rooms", []):
+                self._add(room_data, _status(room_data))
+
+    def _add(self, room_data, status):
+        self._rooms.setdefault(status, {})[id(room_data)] = room_data
+
+    def _remove(self, room_data, status):
+        rooms = self._rooms.get(status)
+        if rooms is not None:
+            rooms.pop(id(room_data), None)
+            if not rooms:
+                del self._rooms[status]
+
+    def rooms(self, status):
+        """Кабинеты со статусом (список, его можно менять во время обхода)."""
+        return list(self._rooms.get(status, {}).values())
+
+    def count(self, status):
+        return len(self._rooms.get(status, ()))
+
+    def counts(self):
+        """Количество кабинетов по статусам, включая статусы, которых нет в списке."""
+        return {status: len(rooms) for status, rooms in self._rooms.items()}
+
+    # --- Наблюдатель журнала изменений ---
+
+    def room_created(self, room_data):
+        self._add(room_data, _status(room_data))
+
+    def room_deleted(self, room_data):
+        self._remove(room_data, _status(room_data))
+
+    def room_changed(self, room_data, old_values):
+        old = old_values.get("status") or DEFAULT_ROOM_STATUS
+        new = _status(room_data)
+        if old != new:
+            self._remove(room_data, old)
+            self._add(room_data, new)
+
+
+def set_room_status(room_data, status):
+    """Меняет статус кабинета с записью в журнал (и, через него, в индекс)."""
+    old_values = {field: room_data.get(field) for field in TRACKED_FIELDS}
+    room_data["status"] = status
+    history_store.record_changes(room_data, old_values)
+
+
+def _replace_entry(old_name, new_name, colors):
+    """Заменяет запись статуса, сохраняя ее место в списке."""
+    items = [(new_name, colors) if name == old_name else (name, value)
+             for name, value in data_store["statuses"].items()]
+    data_store["statuses"].clear()
+    data_store["statuses"].update(items)
+
+
+def rename_status(old_name, new_name, colors):
+    """
+    Переименовывает статус и/или меняет его цвета. Кабинеты статуса
+    получают новое название. Возвращает список этих кабинетов.
+    """
+    status_id = data_store["statuses"][old_name].get("id") or new_status_id()
+    _replace_entry(old_name, new_name, dict(colors, id=status_id))
+    rooms = status_index.rooms(old_name)
+    if new_name != old_name:
+        for room_data in rooms:
+            set_room_status(room_data, new_name)
+    return rooms
+
+
+def remove_status(name, replacement):
+    """
+    Удаляет статус; его кабинеты получают статус replacement.
+    Возвращает список переназначенных кабинетов.
+    """
+    rooms = status_index.rooms(name)
+    for room_data in rooms:
+        set_room_status(room_data, replacement)
+    data_store["statuses"].pop(name, None)
+    return rooms
+
+
+# Индекс текущего здания
+status_index = StatusIndex(data_store)
+history_store.listeners.append(status_index)
+merge_callbacks.append(status_index.rebuild)
+building_switch_callbacks.append(status_index.rebuild)
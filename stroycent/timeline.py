@@ -0,0 +1,168 @@
+"""
+Шкала времени: какие кабинеты этажа сданы на выбранную дату.
+
+Сроки аренды кабинетов с занятым статусом (дата заезда — дата выезда,
+пустая дата — без ограничения) хранятся в дереве интервалов с центрами,
+поэтому запрос "сданы на дату" стоит O(log n + k), где k — число сданных
+кабинетов. При переходе к другой дате возвращаются только кабинеты,
+состояние которых изменилось, — перекрашиваются только они.
+"""
+from stroycent.data_manager import room_id
+from stroycent.history import is_occupied
+
+# Границы для пустых дат; даты сравниваются как строки ISO
+OPEN_START = "0000-00-00"
+OPEN_END = "9999-12-31"
+
+
+def lease_interval(room_data):
+    """Срок аренды кабинета (начало, конец) в виде строк ISO или None, если кабинет не сдан."""
+    if not is_occupied(room_data):
+        return None
+    start = room_data.get("entry_date") or OPEN_START
+    end = room_data.get("exit_date") or OPEN_END
+    if end < start:
+        return None
+    return start, end
+
+
+class _Node:
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, center, by_start, by_end, left, right):
+        self.center = center
+        self.by_start = by_start
+        self.by_end = by_end
+        self.left = left
+        self.right = right
+
+
+class IntervalTree:
+    """
+    Статическое дерево интервалов с центрами. Интервалы — кортежи
+    (начало, конец, значение) с включенными границами; строится за O(n log n).
+    """
+
+    def __init__(self, intervals):
+        intervals = list(intervals)
+        self.size = len(intervals)
+        self._root = self._build(intervals)
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def _build(cls, intervals):
+        if not intervals:
+            return None
+        points = sorted(point for start, end, _ in intervals for point in (start, end))
+        center = points[len(points) // 2]
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        return _Node(center,
+                     sorted(here, key=lambda interval: interval[0]),
+                     sorted(here, key=lambda interval: interval[1], reverse=True),
+                     cls._build(left), cls._build(right))
+
+    def at(self, point):
+        """Перебирает значения интервалов, содержащих точку."""
+        node = self._root
+        while node is not None:
+            if point < node.center:
+                # Все интервалы узла заканчиваются не раньше центра
+                for start, _, value in node.by_start:
+                    if start > point:
+                        break
+                    yield value
+                node = node.left
+            elif point > node.center:
+                for _, end, value in node.by_end:
+                    if end < point:
+                        break
+                    yield value
+                node = node.right
+            else:
+                for _, _, value in node.by_start:
+                    yield value
+                return
+
+
+class LeaseTimeline:
+    """
+    Сданные на дату кабинеты этажа. Дерево строится по списку кабинетов
+    этажа при первом запросе и заново — после изменения кабинетов.
+    """
+
+    def __init__(self):
+        self.rooms = []
+        self.date = None
+        self._tree = None
+        self._leased = {}  # идентификатор кабинета (room_id) -> кабинет
+
+    def set_rooms(self, rooms):
+        """Новый список кабинетов (при смене этажа)."""
+        self.rooms = rooms
+        self._tree = None
+        self._leased = {}
+        if self.date is not None:
+            self.set_date(self.date)
+
+    def _build(self):
+        intervals = []
+        for room_data in self.rooms:
+            interval = lease_interval(room_data)
+            if interval:
+                intervals.append((interval[0], interval[1], room_data))
+        self._tree = IntervalTree(intervals)
+
+    def set_date(self, day):
+        """
+        Переходит к дате (строка ISO) и возвращает кабинеты, которые
+        на эту дату сданы или свободны иначе, чем на предыдущую.
+        """
+        if self.date is None:
+            # Без шкалы все кабинеты с занятым статусом показаны как сданные
+            previous = {room_id(room_data): room_data for room_data in self.rooms
+                        if is_occupied(room_data)}
+        else:
+            previous = self._leased
+        self.date = day
+        if self._tree is None:
+            self._build()
+        leased = {room_id(room_data): room_data for room_data in self._tree.at(day)}
+        self._leased = leased
+        return [leased.get(key) or previous[key] for key in leased.keys() ^ previous.keys()]
+
+    def clear(self):
+        """Выключает шкалу: кабинеты снова показываются по текущему статусу."""
+        self.date = None
+        self._leased = {}
+
+    def room_changed(self, room_data):
+        """Кабинет добавлен или изменен: состояние пересчитывается сразу, дерево — при следующем запросе."""
+        self._tree = None
+        if self.date is None:
+            return
+        interval = lease_interval(room_data)
+        if interval and interval[0] <= self.date <= interval[1]:
+            self._leased[room_id(room_data)] = room_data
+        else:
+            self._leased.pop(room_id(room_data), None)
+
+    def room_removed(self, room_data):
+        self._tree = None
+        self._leased.pop(room_id(room_data), None)
+
+    def is_vacant(self, room_data):
+        """Свободен ли на выбранную дату кабинет, который сейчас числится занятым."""
+        return (self.date is not None and is_occupied(room_data)
+                and room_id(room_data) not in self._leased)
+
+    def leased_count(self):
+        return len(self._leased)
@@ -0,0 +1,299 @@
+import json
+from collections import deque
+from PySide6.QtCore import QObject, Signal
+from stroycent.data_manager import data_store
+from stroycent.history import history_store, TRACKED_FIELDS
+from stroycent.statuses import status_index, set_room_status
+
+# Ограничение истории отмены по умолчанию (приблизительный объем дельт в байтах)
+DEFAULT_UNDO_MEMORY_LIMIT = 2 * 1024 * 1024
+
+
+def _floor_rooms(floor_key):
+    return data_store["floors"].setdefault(str(floor_key), {"rooms": []})["rooms"]
+
+
+def _index_of(rooms, room_data):
+    for i, room in enumerate(rooms):
+        if room is room_data:
+            return i
+    return -1
+
+
+class UndoCommand:
+    """
+    Базовая команда истории отмены.
+
+    Команда хранит только изменение (дельту) и ссылку на словарь кабинета,
+    а не копию всего data_store. Методы undo/redo меняют данные и
+    точечно обновляют сцену через методы главного окна.
+    """
+    description = ""
+
+    def undo(self, window):
+        raise NotImplementedError
+
+    def redo(self, window):
+        raise NotImplementedError
+
+    def delta(self):
+        """Данные изменения; используются для оценки занимаемой памяти."""
+        return None
+
+    def size(self):
+        return len(json.dumps(self.delta(), ensure_ascii=False, default=str)) + 64
+
+
+class RoomCreatedCommand(UndoCommand):
+    def __init__(self, room_data):
+        self.room_data = room_data
+        rooms = _floor_rooms(room_data.get("floor"))
+        index = _index_of(rooms, room_data)
+        self.index = index if index >= 0 else len(rooms)
+        self.description = f"добавление кабинета {room_data.get('number')}"
+
+    def undo(self, window):
+        rooms = _floor_rooms(self.room_data.get("floor"))
+        index = _index_of(rooms, self.room_data)
+        if index >= 0:
+            self.index = index
+            rooms.pop(index)
+        history_store.record_deleted(self.room_data)
+        window.remove_room_from_scene(self.room_data)
+
+    def redo(self, window):
+        rooms = _floor_rooms(self.room_data.get("floor"))
+        rooms.insert(min(self.index, len(rooms)), self.room_data)
+        history_store.record_created(self.room_data)
+        window.add_room_to_scene(self.room_data)
+
+    def delta(self):
+        return self.room_data
+
+
+class RoomDeletedCommand(RoomCreatedCommand):
+    def __init__(self, room_data, index):
+        self.room_data = room_data
+        self.index = index
+        self.description = f"удаление кабинета {room_data.get('number')}"
+
+    def undo(self, window):
+        RoomCreatedCommand.redo(self, window)
+
+    def redo(self, window):
+        RoomCreatedCommand.undo(self, window)
+
+
+class RoomFieldsCommand(UndoCommand):
+    """Изменение полей кабинета: {поле: (старое значение, новое значение)}."""
+
+    def __init__(self, room_data, old_values, description="изменение данных кабинета"):
+        self.room_data = room_data
+        self.changes = {
+            field: (old, room_data.get(field))
+            for field, old in old_values.items()
+            if old != room_data.get(field)
+        }
+        self.description = description
+
+    def is_empty(self):
+        return not self.changes
+
+    def _apply(self, window, position, refresh=True):
+        old_values = {field: self.room_data.get(field) for field in TRACKED_FIELDS}
+        for field, values in self.changes.items():
+            if values[position] is None:
+                self.room_data.pop(field, None)
+            else:
+                self.room_data[field] = values[position]
+        history_store.record_changes(self.room_data, old_values)
+        if refresh:
+            window.update_room_items(self.room_data)
+
+    def undo(self, window):
+        self._apply(window, 0)
+
+    def redo(self, window):
+        self._apply(window, 1)
+
+    def delta(self):
+        return self.changes
+
+
+class RoomsBatchCommand(UndoCommand):
+    """
+    Изменение полей многих кабинетов одной операцией (импорт, групповое
+    редактирование). Отменяется целиком; сцена и легенда обновляются один раз.
+    """
+
+    def __init__(self, commands, description):
+        self.commands = [command for command in commands if not command.is_empty()]
+        self.description = description
+
+    def is_empty(self):
+        return not self.commands
+
+    def _apply(self, window, position):
+        for command in self.commands:
+            command._apply(window, position, refresh=False)
+        window.refresh_rooms([command.room_data for command in self.commands])
+
+    def undo(self, window):
+        self._apply(window, 0)
+
+    def redo(self, window):
+        self._apply(window, 1)
+
+    def delta(self):
+        return [command.changes for command in self.commands]
+
+
+class RoomsCreatedCommand(UndoCommand):
+    """Добавление многих кабинетов одной операцией (найденные на плане)."""
+
+    def __init__(self, rooms, description):
+        self.commands = [RoomCreatedCommand(room_data) for room_data in rooms]
+        self.description = description
+
+    def undo(self, window):
+        for command in reversed(self.commands):
+            command.undo(window)
+
+    def redo(self, window):
+        for command in self.commands:
+            command.redo(window)
+
+    def delta(self):
+        return [command.room_data for command in self.commands]
+
+
+class RoomPolygonCommand(UndoCommand):
+    def __init__(self, room_data, old_points):
+        self.room_data = room_data
+        self.old_points = old_points
+        self.new_points = room_data.get("points", [])
+        self.description = f"изменение формы кабинета {room_data.get('number')}"
+
+    def undo(self, window):
+        self.room_data["points"] = self.old_points
+        window.update_room_geometry(self.room_data)
+
+    def redo(self, window):
+        self.room_data["points"] = self.new_points
+        window.update_room_geometry(self.room_data)
+
+    def delta(self):
+        return [self.old_points, self.new_points]
+
+
+class StatusCommand(UndoCommand):
+    """
+    Добавление, изменение или удаление статуса.
+    old/new — пары (название, цвета) или None, position — место статуса в списке,
+    rooms — кабинеты, которые при переименовании или удалении статуса получили
+    статус target (по умолчанию — новое название).
+    """
+
+    def __init__(self, old, new, position, rooms=(), target=None):
+        self.old = old
+        self.new = new
+        self.position = position
+        self.rooms = list(rooms)
+        self.target = target if target is not None else (new[0] if new else None)
+        self.description = "изменение статусов"
+
+    def _replace(self, window, remove, insert, rooms_status):
+        statuses = data_store["statuses"]
+        if remove:
+            statuses.pop(remove[0], None)
+        if insert:
+            items = list(statuses.items())
+            items.insert(min(self.position, len(items)), insert)
+            statuses.clear()
+            statuses.update(items)
+        for room_data in self.rooms:
+            set_room_status(room_data, rooms_status)
+        # Перерисовываются только кабинеты затронутых статусов
+        affected = {id(room_data): room_data for room_data in self.rooms}
+        for entry in (remove, insert):
+            if entry:
+                affected.update((id(room_data), room_data) for room_data in status_index.rooms(entry[0]))
+        window.refresh_rooms(list(affected.values()))
+
+    def undo(self, window):
+        self._replace(window, self.new, self.old, self.old[0] if self.old else None)
+
+    def redo(self, window):
+        self._replace(window, self.old, self.new, self.target)
+
+    def delta(self):
+        return [self.old, self.new, len(self.rooms)]
+
+
+class UndoStack(QObject):
+    """
+    Стек отмены/повтора с ограничением по памяти.
+    Когда суммарный объем дельт превышает memory_limit, самые старые
+    команды удаляются из истории.
+    """
+    changed = Signal()
+
+    def __init__(self, memory_limit=DEFAULT_UNDO_MEMORY_LIMIT, parent=None):
+        super().__init__(parent)
+        self.memory_limit = memory_limit
+        self._undo = deque()
+        self._redo = []
+        self._used = 0
+
+    def push(self, command):
+        """Добавляет уже выполненную команду в историю."""
+        if isinstance(command, (RoomFieldsCommand, RoomsBatchCommand)) and command.is_empty():
+            return
+        command.cost = command.size()
+        self._undo.append(command)
+        self._used += command.cost
+        self._redo.clear()
+        self._trim()
+        self.changed.emit()
+
+    def set_memory_limit(self, memory_limit):
+        self.memory_limit = memory_limit
+        self._trim()
+        self.changed.emit()
+
+    def _trim(self):
+        while self._undo and self._used > self.memory_limit:
+            self._used -= self._undo.popleft().cost
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self, window):
+        if not self._undo:
+            return None
+        command = self._undo.pop()
+        self._used -= command.cost
+        command.undo(window)
+        self._redo.append(command)
+        self.changed.emit()
+        return command
+
+    def redo(self, window):
+        if not self._redo:
+            return None
+        command = self._redo.pop()
+        command.redo(window)
+        self._undo.append(command)
+        self._used += command.cost
+        self._trim()
+        self.changed.emit()
+        return command
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._used = 0
+        self.changed.emit()
@@ -1,18 +1,167 @@
+import os
+import sys
+import json
+import queue
+import atexit
 import logging
+import platform
+import traceback
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-log_file = None
+logger = logging.getLogger("stroycent")
+# Пока логирование не настроено, сообщения никуда не выводятся
+logger.addHandler(logging.NullHandler())
 
-def debug_log(msg):
-    # Используем стандартное логирование вместо print
-    logging.debug(msg)
-    
-    # Сохраняем вашу функциональность с файлом
-    if log_file:
-        log_file.write(f"[DEBUG] {msg}\n")
-        log_file.flush()
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(threadName)s %(name)s: %(message)s"
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 5
 
-# Настройка логирования
-logging.basicConfig(level=logging.DEBUG)
+_listener = None
 
-# Использование
-debug_log("Загрузка этажа 0")
+
+def debug_log(msg, *args):
+    """
+    Отладочное сообщение в стиле logging: debug_log("Этаж %s", floor).
+    Строка форматируется только если уровень DEBUG включен.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(msg, *args, stacklevel=2)
+
+
+def info_log(msg, *args):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(msg, *args, stacklevel=2)
+
+
+def error_log(msg, *args):
+    """Сообщение об ошибке; внутри except добавляет трассировку исключения."""
+    logger.error(msg, *args, exc_info=sys.exc_info()[0] is not None, stacklevel=2)
+
+
+def get_log_file_path():
+    """Путь к файлу логов (всегда рядом с исполняемым файлом)"""
+    # Путь не зависит от данных здания: логирование настраивается до импорта приложения
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, "error_log.txt")
+
+
+def _parse_log_level(name):
+    """Уровень по имени ("debug", "WARNING") или числу; None, если такого уровня нет."""
+    name = name.strip()
+    if name.isdigit():
+        return int(name)
+    return logging.getLevelNamesMapping().get(name.upper())
+
+
+def get_default_log_level():
+    """
+    Уровень из переменной STROYCENT_LOG_LEVEL; по умолчанию (и при неизвестном
+    имени уровня) WARNING для собранного приложения и INFO при запуске из исходников.
+    """
+    name = os.environ.get("STROYCENT_LOG_LEVEL")
+    level = _parse_log_level(name) if name else None
+    if level is not None:
+        return level
+    return logging.WARNING if getattr(sys, "frozen", False) else logging.INFO
+
+
+def setup_logging(log_path, level=None, console=None):
+    """
+    Настраивает логирование приложения.
+
+    Сообщения попадают в очередь через QueueHandler, а запись в файл с ротацией
+    выполняет QueueListener в отдельном потоке, поэтому поток интерфейса не
+    ждет дискового ввода-вывода.
+    """
+    global _listener
+    if _listener:
+        return
+    level = get_default_log_level() if level is None else level
+    if console is None:
+        console = not getattr(sys, "frozen", False)
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    file_handler = RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES,
+                                       backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    file_handler.setFormatter(formatter)
+    handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(level)
+    logger.propagate = False
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    name = os.environ.get("STROYCENT_LOG_LEVEL")
+    if name and _parse_log_level(name) is None:
+        logger.warning("Неизвестный уровень логирования STROYCENT_LOG_LEVEL=%s, используется %s",
+                       name, logging.getLevelName(logger.level))
+
+
+def set_log_level(level):
+    """Меняет уровень логирования во время работы."""
+    logger.setLevel(level)
+
+
+def shutdown_logging():
+    """Дописывает оставшиеся в очереди сообщения и останавливает поток записи."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def write_crash_log(exc_type, exc_value, exc_tb, log_dir):
+    """
+    Сохраняет структурированный отчет о сбое (JSON) в папку crash_logs
+    и возвращает путь к нему.
+    """
+    crash_dir = os.path.join(log_dir, "crash_logs")
+    os.makedirs(crash_dir, exist_ok=True)
+    now = datetime.now()
+    report = {
+        "time": now.isoformat(timespec="seconds"),
+        "exception": exc_type.__name__,
+        "message": str(exc_value),
+        "frames": [
+            {"file": frame.filename, "line": frame.lineno, "function": frame.name, "code": frame.line}
+            for frame in traceback.extract_tb(exc_tb)
+        ],
+        "traceback": "".join(traceback.format_exception(exc_type, exc_value, exc_tb)),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "argv": sys.argv,
+    }
+    path = os.path.join(crash_dir, f"crash-{now.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    return path
+
+
+def install_crash_handler(log_dir):
+    """Перехватывает необработанные исключения (в том числе в слотах Qt)."""
+    def handle_exception(exc_type, exc_value, exc_tb):
+        if issubclass(exc_type, KeyboardInterrupt):
+            sys.__excepthook__(exc_type, exc_value, exc_tb)
+            return
+        logger.critical("Необработанное исключение", exc_info=(exc_type, exc_value, exc_tb))
+        try:
+            path = write_crash_log(exc_type, exc_value, exc_tb, log_dir)
+            logger.critical("Отчет о сбое сохранен: %s", path)
+        except Exception:
+            logger.exception("Не удалось сохранить отчет о сбое")
+
+    sys.excepthook = handle_exception
@@ -0,0 +1,144 @@
+import os
+import time
+from PySide6.QtCore import QObject, QFileSystemWatcher, QTimer, QRunnable, QThreadPool, Signal
+from stroycent import data_manager
+from stroycent.data_manager import data_store, get_data_file_path, after_save_callbacks, last_merge
+from stroycent.utils import debug_log
+
+# Задержка перед перечитыванием файла: серия быстрых записей объединяется в одну
+RELOAD_DEBOUNCE_MS = 250
+# Максимальная задержка, если внешний скрипт пишет без перерыва
+RELOAD_MAX_DELAY_S = 2.0
+
+
+class _ParseSignals(QObject):
+    parsed = Signal(object, object)
+    failed = Signal(str)
+
+
+class _ParseTask(QRunnable):
+    """Чтение и разбор файла данных в пуле потоков, чтобы не блокировать интерфейс."""
+
+    def __init__(self):
+        super().__init__()
+        self.signals = _ParseSignals()
+
+    def run(self):
+        try:
+            disk, signature = data_manager.read_data_file()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.parsed.emit(disk, signature)
+
+
+class DataFileWatcher(QObject):
+    """
+    Следит за файлом данных и планами этажей.
+
+    При внешнем изменении файл перечитывается в фоне, сравнивается с данными
+    в памяти по кабинетам, и сигнал data_changed сообщает, какие кабинеты
+    изменились. Собственные записи приложения распознаются по подписи файла
+    и пропускаются.
+    """
+    data_changed = Signal(object)
+    plan_changed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.data_file = get_data_file_path()
+        self.plan_path = None
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_path_changed)
+        self._watcher.directoryChanged.connect(self._on_path_changed)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._start_reload)
+        self._pending_since = None
+        self._parsing = False
+        self._reload_again = False
+        self._task = None
+        self._watch(self.data_file)
+        self._watch(os.path.dirname(self.data_file))
+        after_save_callbacks.append(self._on_saved)
+
+    def _on_saved(self):
+        # Сохранение могло слить в память чужие изменения — их тоже нужно показать
+        if last_merge["updated"] or last_merge["removed"] or last_merge["floors"] or last_merge.get("statuses"):
+            changes = dict(last_merge)
+            QTimer.singleShot(0, lambda: self.data_changed.emit(changes))
+
+    def _watch(self, path):
+        if path and os.path.exists(path) and path not in self._watcher.files() + self._watcher.directories():
+            self._watcher.addPath(path)
+
+    def set_data_file(self, path):
+        """Переключает наблюдение на файл данных другого здания."""
+        watched = self._watcher.files() + self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+        self._timer.stop()
+        self._pending_since = None
+        self.data_file = path
+        self.plan_path = None
+        self._watch(self.data_file)
+        self._watch(os.path.dirname(self.data_file))
+
+    def watch_plan(self, plan_path):
+        """Переключает наблюдение на план текущего этажа."""
+        if self.plan_path and self.plan_path != self.data_file:
+            self._watcher.removePath(self.plan_path)
+        self.plan_path = os.path.abspath(plan_path) if plan_path else None
+        self._watch(self.plan_path)
+
+    def _on_path_changed(self, path):
+        # Файл, замененный через os.replace, выпадает из списка наблюдения
+        self._watch(self.data_file)
+        if self.plan_path and os.path.abspath(path) == self.plan_path:
+            self._watch(self.plan_path)
+            self.plan_changed.emit(self.plan_path)
+            return
+        if not data_manager.is_external_change(data_manager._get_file_signature(self.data_file)):
+            return
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        if time.monotonic() - self._pending_since >= RELOAD_MAX_DELAY_S:
+            self._start_reload()
+        else:
+            self._timer.start(RELOAD_DEBOUNCE_MS)
+
+    def _start_reload(self):
+        self._timer.stop()
+        self._pending_since = None
+        if self._parsing:
+            self._reload_again = True
+            return
+        self._parsing = True
+        task = _ParseTask()
+        task.signals.parsed.connect(self._on_parsed)
+        task.signals.failed.connect(self._on_failed)
+        self._task = task
+        QThreadPool.globalInstance().start(task)
+
+    def _finish_parse(self):
+        self._parsing = False
+        if self._reload_again:
+            self._reload_again = False
+            self._timer.start(RELOAD_DEBOUNCE_MS)
+
+    def _on_failed(self, error):
+        # Файл мог быть прочитан в момент записи сторонним скриптом без замены;
+        # окончание такой записи вызовет новое уведомление
+        debug_log("Не удалось перечитать файл данных: %s", error)
+        self._finish_parse()
+
+    def _on_parsed(self, disk, signature):
+        current = data_manager._get_file_signature(self.data_file)
+        if current != signature:
+            # Пока файл разбирался, его успели перезаписать — перечитаем позже
+            self._reload_again = data_manager.is_external_change(current)
+        elif data_manager.is_external_change(signature):
+            changes = data_manager.apply_external_changes(data_store, disk, signature)
+            debug_log("Внешние изменения: обновлено %d, удалено %d", len(changes['updated']), len(changes['removed']))
+            self.data_changed.emit(changes)
+        self._finish_parse()
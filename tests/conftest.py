@@ -0,0 +1,14 @@
+"""
+Общая настройка тестов: модули stroycent читают данные здания при импорте,
+поэтому до первого импорта файл данных переносится во временную папку.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+DATA_DIR = tempfile.mkdtemp(prefix="stroycent-tests-")
+os.environ["STROYCENT_DATA_FILE"] = os.path.join(DATA_DIR, "building_data.json")
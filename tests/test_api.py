@@ -0,0 +1,88 @@
+"""Изменение кабинета через HTTP API: токен, проверка полей и сохранение."""
+import json
+import asyncio
+
+import pytest
+
+from stroycent import api
+from stroycent.data_manager import data_store, replace_data
+
+TOKEN = "test-token"
+
+
+@pytest.fixture
+def room():
+    replace_data({"floors": {"1": {"rooms": [
+        {"id": "a", "floor": "1", "number": "101", "status": "свободный", "renter_name": ""},
+    ]}}})
+    return data_store["floors"]["1"]["rooms"][0]
+
+
+async def _request(port, method, path, body=None, token=None):
+    reader, writer = await asyncio.open_connection(api.HOST, port)
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+    if token is not None:
+        head += f"Authorization: Bearer {token}\r\n"
+    head += f"Content-Length: {len(payload)}\r\n\r\n"
+    writer.write(head.encode("latin-1") + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status_line, _, rest = response.partition(b"\r\n")
+    return int(status_line.split()[1]), json.loads(rest.partition(b"\r\n\r\n")[2])
+
+
+def _run(*requests):
+    """Запускает сервер на свободном порту и выполняет запросы по очереди."""
+    async def main():
+        server = api.ApiServer(0, token=TOKEN)
+        await server.start()
+        try:
+            return [await _request(server.port, *request) for request in requests]
+        finally:
+            server.close()
+    return asyncio.run(main())
+
+
+def test_server_listens_on_loopback_only():
+    assert api.HOST == "127.0.0.1"
+    assert api.ApiServer(0, token=TOKEN).host == api.HOST
+    with pytest.raises(SystemExit):
+        api.main(["--host", "0.0.0.0"])
+
+
+def test_patch_with_accepted_token(room):
+    version = data_store["version"]
+    [(status, payload)] = _run(("PATCH", "/api/rooms/1/101", {"status": "занят", "renter_name": "ООО Альфа"}, TOKEN))
+    assert status == 200
+    assert payload["changed"] == ["renter_name", "status"]
+    assert payload["room"]["status"] == "занят"
+    assert room["status"] == "занят" and room["renter_name"] == "ООО Альфа"
+    # Изменение сохранено одним сохранением
+    assert data_store["version"] == version + 1
+    # Чтение видит изменение
+    [(status, payload)] = _run(("GET", "/api/rooms/1/101"))
+    assert status == 200 and payload["room"]["renter_name"] == "ООО Альфа"
+
+
+@pytest.mark.parametrize("token", [None, "wrong-token"])
+def test_patch_with_rejected_token(room, token):
+    [(status, payload)] = _run(("PATCH", "/api/rooms/1/101", {"status": "занят"}, token))
+    assert status == 401
+    assert "Bearer" in payload["error"]
+    assert room["status"] == "свободный"
+
+
+def test_patch_validation_errors(room):
+    results = _run(
+        ("PATCH", "/api/rooms/1/101", {"inn": "123"}, TOKEN),
+        ("PATCH", "/api/rooms/1/101", {"status": "бронь"}, TOKEN),
+        ("PATCH", "/api/rooms/1/101", {"number": "102"}, TOKEN),
+        ("PATCH", "/api/rooms/1/999", {"status": "занят"}, TOKEN),
+    )
+    assert [status for status, _ in results] == [422, 422, 400, 404]
+    assert "ИНН" in results[0][1]["error"]
+    assert "бронь" in results[1][1]["error"]
+    assert "number" in results[2][1]["error"]
+    assert "inn" not in room and room["status"] == "свободный"
@@ -0,0 +1,66 @@
+"""
+Несколько процессов одновременно сохраняют один файл данных: каждый
+меняет свой кабинет и поля общего кабинета. Изменения не должны теряться,
+а конфликт одного поля решается в пользу последнего сохранения под блокировкой.
+"""
+import os
+import json
+import multiprocessing
+
+PROCESSES = 4
+ROUNDS = 15
+SHARED = "shared"
+
+
+def _worker(data_file, n, barrier, results):
+    os.environ["STROYCENT_DATA_FILE"] = data_file
+    from stroycent.data_manager import data_store, save_data
+    rooms = {room["id"]: room for room in data_store["floors"]["1"]["rooms"]}
+    barrier.wait()
+    conflict_version = None
+    for i in range(ROUNDS):
+        rooms[f"room-{n}"]["renter_name"] = f"p{n}-{i}"
+        if i == 0:
+            # Разные поля общего кабинета меняются без конфликта
+            rooms[SHARED][f"note_{n}"] = f"p{n}"
+        if i == ROUNDS // 2:
+            # Одно поле общего кабинета меняют все процессы
+            rooms[SHARED]["client_name"] = f"p{n}"
+        save_data(data_store)
+        if i == ROUNDS // 2:
+            conflict_version = data_store["version"]
+    results.put((n, conflict_version))
+
+
+def test_concurrent_saves_keep_every_edit(tmp_path):
+    data_file = str(tmp_path / "building_data.json")
+    rooms = [{"id": f"room-{n}", "floor": "1", "number": str(n + 1), "status": "свободный"}
+             for n in range(PROCESSES)]
+    rooms.append({"id": SHARED, "floor": "1", "number": "100", "status": "занят"})
+    with open(data_file, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "floors": {"1": {"rooms": rooms}}, "statuses": {}}, f)
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(PROCESSES)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(data_file, n, barrier, results)) for n in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    versions = dict(results.get(timeout=120) for _ in processes)
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    with open(data_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    saved = {room["id"]: room for room in data["floors"]["1"]["rooms"]}
+    assert len(saved) == PROCESSES + 1
+    # Каждое сохранение увеличивает версию ровно на единицу
+    assert data["version"] == 1 + PROCESSES * ROUNDS
+    for n in range(PROCESSES):
+        assert saved[f"room-{n}"]["renter_name"] == f"p{n}-{ROUNDS - 1}"
+        assert saved[SHARED][f"note_{n}"] == f"p{n}"
+    # Конфликт одного поля: побеждает сохранение, сделанное позже под блокировкой
+    winner = max(versions, key=versions.get)
+    assert saved[SHARED]["client_name"] == f"p{winner}"
+    assert saved[SHARED]["status"] == "занят"
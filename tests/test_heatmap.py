@@ -0,0 +1,37 @@
+from stroycent.heatmap import HeatmapOverlay, NO_DATA_LABEL
+
+
+def _room(room_id, status, exit_date):
+    return {"id": room_id, "floor": "1", "number": room_id, "status": status, "exit_date": exit_date}
+
+
+def _total(legend):
+    return sum(count for _, _, count in legend)
+
+
+def test_legend_excludes_removed_room():
+    rooms = [_room("a", "свободный", "2026-01-01"), _room("b", "свободный", "2026-09-01"),
+             _room("c", "занят", "2027-01-01")]
+    overlay = HeatmapOverlay()
+    overlay.set_rooms(rooms)
+    overlay.set_mode("vacancy")
+    assert _total(overlay.legend()) == 3
+
+    removed = rooms.pop(0)
+    overlay.room_removed(removed)
+    legend = overlay.legend()
+    assert _total(legend) == 2
+    # Занятый кабинет в режиме простоя остается «без данных»
+    assert dict((label, count) for _, label, count in legend)[NO_DATA_LABEL] == 1
+
+
+def test_room_changed_updates_single_value():
+    rooms = [_room("a", "свободный", "2026-01-01"), _room("b", "занят", "2027-01-01")]
+    overlay = HeatmapOverlay()
+    overlay.set_rooms(rooms)
+    overlay.set_mode("vacancy")
+    assert overlay.value(rooms[1])[1] == -1
+
+    rooms[1].update(status="свободный", exit_date="2026-01-01")
+    overlay.room_changed(rooms[1])
+    assert overlay.value(rooms[1])[1] == overlay.value(rooms[0])[1] >= 0
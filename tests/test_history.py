@@ -0,0 +1,125 @@
+"""
+Журнал изменений: срезы по дням и месяцам, перевод старых файлов
+на идентификаторы кабинетов и дописывание сегментов из нескольких процессов.
+"""
+import json
+import multiprocessing
+from datetime import datetime
+
+from stroycent.data_manager import DEFAULT_STATUSES
+from stroycent.history import HistoryStore
+
+PROCESSES = 4
+ROUNDS = 25
+
+
+def _ts(day, hour=12):
+    return datetime.strptime(day, "%Y-%m-%d").replace(hour=hour).timestamp()
+
+
+def _room(room_id, number, status="свободный"):
+    return {"id": room_id, "floor": "1", "number": number, "status": status}
+
+
+def _data(*rooms):
+    return {"floors": {"1": {"rooms": list(rooms)}}, "statuses": dict(DEFAULT_STATUSES)}
+
+
+def _set_status(store, room, status, day):
+    old_values = dict(room)
+    room["status"] = status
+    store.record_changes(room, old_values, ts=_ts(day))
+
+
+def _occupied(rows):
+    return [(row["period"], row["occupied"], row["total"]) for row in rows]
+
+
+def test_day_and_month_rollups(tmp_path):
+    a, b = _room("a", "101"), _room("b", "102")
+    store = HistoryStore(str(tmp_path / "history.json"))
+    store.seed(_data(a, b), ts=_ts("2026-01-05"))
+    _set_status(store, a, "занят", "2026-01-10")
+    _set_status(store, b, "занят", "2026-02-03")
+
+    assert _occupied(store.occupancy("2026-01-09", "2026-01-11", granularity="day")) == [
+        ("2026-01-09", 0, 2), ("2026-01-10", 1, 2), ("2026-01-11", 1, 2)]
+    # Январь берется из месячного среза, неполный февраль — из дневного на последний день периода
+    assert _occupied(store.occupancy("2026-01-01", "2026-02-10")) == [("2026-01", 1, 2), ("2026-02", 2, 2)]
+    assert _occupied(store.occupancy("2026-01-01", "2026-02-02")) == [("2026-01", 1, 2), ("2026-02", 1, 2)]
+    # До первого среза данных нет
+    assert _occupied(store.occupancy("2025-12-01", "2025-12-31")) == [("2025-12", 0, 0)]
+
+
+def test_occupancy_after_deletes(tmp_path):
+    a, b, c = _room("a", "101", "занят"), _room("b", "102", "занят"), _room("c", "103")
+    store = HistoryStore(str(tmp_path / "history.json"))
+    store.seed(_data(a, b, c), ts=_ts("2026-03-01"))
+    store.record_deleted(a, ts=_ts("2026-03-05"))
+    store.record_deleted(c, ts=_ts("2026-03-06"))
+
+    assert _occupied(store.occupancy("2026-03-04", "2026-03-06", granularity="day")) == [
+        ("2026-03-04", 2, 3), ("2026-03-05", 1, 2), ("2026-03-06", 1, 1)]
+    assert store.occupancy("2026-03-06", "2026-03-06", granularity="day")[0]["vacant"] == 0
+    # Удаление последнего кабинета статуса убирает статус из среза, а не оставляет ноль
+    assert store.state == {"1": {"occupied": 1}}
+
+
+def test_room_keys_migrate_across_renumbering(tmp_path):
+    path = str(tmp_path / "history.json")
+    old = HistoryStore(path)
+    # Кабинет 102 создан и удален; затем новый кабинет 101 перенумерован в 102 и занят
+    old.append("1:102", "1", "status", None, "свободный", ts=_ts("2026-01-01"))
+    old.append("1:102", "1", "status", "свободный", None, ts=_ts("2026-01-02"))
+    old.append("1:101", "1", "status", None, "свободный", ts=_ts("2026-01-03"))
+    old.append("1:101", "1", "number", "101", "102", ts=_ts("2026-01-04"))
+    old.append("1:102", "1", "status", "свободный", "занят", ts=_ts("2026-01-05"))
+    raw = dict(old._raw(), version=1)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(raw, f)
+
+    store = HistoryStore.open(path, _data(_room("abc", "102", "занят")))
+
+    assert [event["field"] for event in store.events(room="abc")] == ["status", "number", "status"]
+    # События удаленного кабинета с тем же номером остаются под старым ключом
+    assert len(list(store.events(room="1:102"))) == 2
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["version"] == store._raw()["version"]
+    # Повторное открытие переведенного файла ничего не меняет
+    reopened = HistoryStore.open(path, _data(_room("abc", "102", "занят")))
+    assert list(reopened.events(room="abc")) == list(store.events(room="abc"))
+
+
+def _worker(path, n, barrier):
+    from stroycent import journal
+    # Журнал сжимается при каждом сохранении: сегменты и перечитывание после чужого сжатия
+    journal.COMPACT_MIN_BYTES = 0
+    journal.COMPACT_RATIO = 10 ** 9
+    store = HistoryStore.open(path, _data())
+    barrier.wait()
+    for i in range(ROUNDS):
+        store.append(f"room-{n}", "1", "number", None, str(i), ts=_ts("2026-05-01") + i)
+        if i % 3 == 0:
+            store.append(f"room-{n}", "1", "renter_name", None, f"p{n}", ts=_ts("2026-05-01") + i)
+        store.flush()
+
+
+def test_concurrent_flushes_keep_every_event(tmp_path):
+    path = str(tmp_path / "history.json")
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(PROCESSES)
+    processes = [context.Process(target=_worker, args=(path, n, barrier)) for n in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    store = HistoryStore.open(path, _data())
+    for n in range(PROCESSES):
+        events = list(store.events(room=f"room-{n}"))
+        assert [event["new"] for event in events if event["field"] == "number"] == [str(i) for i in range(ROUNDS)]
+        assert sum(event["field"] == "renter_name" for event in events) == len(range(0, ROUNDS, 3))
+    # События упорядочены по времени независимо от порядка записи процессами
+    timestamps = [event["ts"] for event in store.events()]
+    assert timestamps == sorted(timestamps)
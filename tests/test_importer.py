@@ -0,0 +1,89 @@
+"""Импорт арендаторов: сопоставление по (этаж, номер) и по ИНН, отклонение некорректных строк."""
+import pytest
+
+from stroycent.data_manager import DEFAULT_STATUSES
+from stroycent.importer import plan_import
+
+INN = "770000000001"
+
+
+@pytest.fixture
+def data():
+    return {
+        "statuses": dict(DEFAULT_STATUSES),
+        "floors": {
+            "1": {"rooms": [
+                {"id": "a", "floor": "1", "number": "101", "status": "занят", "inn": INN, "renter_name": "ООО Альфа"},
+                {"id": "b", "floor": "1", "number": "102", "status": "свободный"},
+            ]},
+            "2": {"rooms": [
+                {"id": "c", "floor": "2", "number": "101", "status": "занят", "inn": INN, "renter_name": "ООО Альфа"},
+            ]},
+        },
+    }
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "tenants.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def _changes(result):
+    return {room["id"]: values for room, values in result.changes}
+
+
+def test_match_by_floor_and_number(tmp_path, data):
+    path = _write(tmp_path,
+                  "Этаж;Номер кабинета;Арендатор;Ставка\n"
+                  "1;102;ИП Бета;1500\n"
+                  "2;101;ООО Альфа;\n"      # значение не меняется, пустая ставка не затирает
+                  "3;101;ИП Гамма;\n")
+    result = plan_import(path, data)
+    assert result.rows == 3
+    assert result.matched_rows == 2
+    # Одинаковый номер на разных этажах: выбирается кабинет указанного этажа
+    assert _changes(result) == {"b": {"renter_name": "ИП Бета", "rent": "1500"}}
+    assert result.errors == [(4, "Кабинет 101 на этаже «3» не найден.")]
+    assert "renter_name" not in data["floors"]["1"]["rooms"][1]
+
+
+def test_match_by_inn_updates_every_room_of_tenant(tmp_path, data):
+    path = _write(tmp_path,
+                  "ИНН;Тип оплаты;Дата выезда\n"
+                  f"{INN};Безналичные;31.12.2027\n"
+                  "500000000000;Наличные;\n")
+    result = plan_import(path, data)
+    # ИНН совпадает с текущим и в изменения не входит
+    assert _changes(result) == {
+        "a": {"payment_type": "Безналичные", "exit_date": "2027-12-31"},
+        "c": {"payment_type": "Безналичные", "exit_date": "2027-12-31"},
+    }
+    assert result.errors == [(3, "Кабинеты арендатора с ИНН 500000000000 не найдены.")]
+
+
+def test_rows_rejected_by_validation(tmp_path, data):
+    path = _write(tmp_path,
+                  "Этаж;Номер кабинета;ИНН;Статус;Дата заезда;Дата выезда;Ставка\n"
+                  "1;102;123;;;;\n"                          # 2: ИНН не из 12 цифр
+                  "1;102;;бронь;;;\n"                        # 3: неизвестный статус
+                  "1;102;;;2026-05-01;2026-04-01;\n"         # 4: выезд раньше заезда
+                  "1;102;;;;;-10\n"                          # 5: отрицательная ставка
+                  ";;;;;;\n"                                 # пустая строка пропускается
+                  ";;;занят;;;\n"                            # 7: нет ни номера, ни ИНН
+                  "1;102;;занят;2026-05-01;;\n")             # 8: верная строка
+    result = plan_import(path, data)
+    assert result.rows == 6
+    assert result.matched_rows == 1
+    assert [row for row, _ in result.errors] == [2, 3, 4, 5, 7]
+    assert result.errors[0][1] == "Кабинет 102: ИНН арендатора должен состоять из 12 цифр."
+    assert result.errors[1][1] == "Кабинет 102: Неизвестный статус: бронь."
+    assert result.errors[4][1] == "Не указан номер кабинета или ИНН."
+    # Отклоненные строки не попадают в изменения
+    assert _changes(result) == {"b": {"status": "занят", "entry_date": "2026-05-01"}}
+
+
+def test_missing_key_columns(tmp_path, data):
+    result = plan_import(_write(tmp_path, "Арендатор;Ставка\nООО;100\n"), data)
+    assert result.changes == []
+    assert result.errors == [(1, "Не найден столбец «Номер кабинета» или «ИНН арендатора».")]
@@ -0,0 +1,134 @@
+"""
+Журнал платежей: начисление месяца ровно один раз, итоги в разрезах
+и разбор файла бухгалтерии с ошибками по номерам строк.
+"""
+from datetime import date
+
+import pytest
+
+from stroycent.data_manager import DEFAULT_STATUSES
+from stroycent.ledger import LedgerStore, plan_ledger_import
+
+MONTH = "2026-05"
+
+
+def _room(room_id, floor, number, status, rent, payment_type="Наличные", **fields):
+    room = {"id": room_id, "floor": floor, "number": number, "status": status,
+            "rent": rent, "payment_type": payment_type}
+    room.update(fields)
+    return room
+
+
+@pytest.fixture
+def data():
+    return {
+        "statuses": dict(DEFAULT_STATUSES),
+        "floors": {
+            "1": {"rooms": [
+                _room("a", "1", "101", "занят", 1000),
+                _room("b", "1", "102", "свободный", 500),
+                # Без ставки: не начисляется и не считается простоем
+                _room("c", "1", "103", "занят", ""),
+            ]},
+            "2": {"rooms": [
+                _room("d", "2", "201", "скоро освободится", 2000, "Безналичные"),
+                # Договор закончился до месяца начисления: простой
+                _room("e", "2", "202", "занят", 300, exit_date="2026-04-30"),
+            ]},
+        },
+    }
+
+
+def _open(tmp_path, data):
+    return LedgerStore.open(str(tmp_path / "ledger.json"), data)
+
+
+def test_month_is_accrued_once(tmp_path, data):
+    store = _open(tmp_path, data)
+    # Второй процесс открыл журнал до начисления
+    other = _open(tmp_path, data)
+
+    result = store.accrue_month(MONTH, data)
+    assert (result["charged"], result["vacant"], result["skipped"]) == (2, 2, 0)
+    assert (result["charge"], result["vacancy"]) == (3000.0, 800.0)
+    assert len(store) == 4
+
+    assert store.accrue_month(MONTH, data)["skipped"] == 4
+    # Начисление идет под блокировкой и после чтения чужих записей
+    assert other.accrue_month(MONTH, data) == {"charged": 0, "vacant": 0, "skipped": 4, "charge": 0.0, "vacancy": 0.0}
+    assert len(other) == 4
+    # Журнал, открытый заново с диска, тоже помнит начисленный месяц
+    reopened = _open(tmp_path, data)
+    assert reopened.accrue_month(MONTH, data)["skipped"] == 4
+    assert len(reopened) == 4
+    assert sorted(entry["room"] for entry in reopened.entries()) == ["a", "b", "d", "e"]
+
+
+def test_balances_and_breakdowns(tmp_path, data):
+    store = _open(tmp_path, data)
+    store.accrue_month(MONTH, data)
+    rooms = {room["id"]: room for floor in data["floors"].values() for room in floor["rooms"]}
+    store.add_payment(rooms["a"], 600, when=date(2026, 5, 10))
+    store.add_payment(rooms["d"], 2000, when=date(2026, 5, 12))
+    # Исправление ошибочной оплаты — запись с отрицательной суммой
+    store.add_payment(rooms["d"], -500, when=date(2026, 5, 13), comment="исправление")
+    store.flush()
+
+    for ledger in (store, _open(tmp_path, data)):
+        assert ledger.balance(rooms["a"]) == 400.0
+        assert ledger.balance(rooms["d"]) == 500.0
+        assert ledger.balance(rooms["b"]) == 0.0
+        assert ledger.debtors() == [("d", 500.0), ("a", 400.0)]
+        assert ledger.monthly() == [{"month": MONTH, "charge": 3000.0, "payment": 2100.0,
+                                     "vacancy": 800.0, "arrears": 900.0}]
+        assert ledger.breakdown(MONTH, "floor") == {
+            "1": {"charge": 1000.0, "vacancy": 500.0, "payment": 600.0},
+            "2": {"charge": 2000.0, "vacancy": 300.0, "payment": 1500.0},
+        }
+        assert ledger.breakdown(MONTH, "status") == {
+            "занят": {"charge": 1000.0, "vacancy": 300.0, "payment": 600.0},
+            "свободный": {"vacancy": 500.0},
+            "скоро освободится": {"charge": 2000.0, "payment": 1500.0},
+        }
+        # У потерь от простоя нет типа оплаты
+        assert ledger.breakdown(MONTH, "payment_type") == {
+            "Наличные": {"charge": 1000.0, "payment": 600.0},
+            "Безналичные": {"charge": 2000.0, "payment": 1500.0},
+            "—": {"vacancy": 800.0},
+        }
+
+
+def test_import_rejects_malformed_rows(tmp_path, data):
+    path = tmp_path / "payments.csv"
+    path.write_text(
+        "Дата;Этаж;Кабинет;Вид;Сумма;Тип оплаты;Комментарий\n"
+        "10.05.2026;1;101;оплата;1 000,50;;май\n"      # 2: верная строка
+        "2026-13-01;1;101;оплата;100;;\n"               # 3: некорректная дата
+        "2026-05-10;1;999;оплата;100;;\n"               # 4: нет кабинета
+        "2026-05-10;1;101;возврат;100;;\n"              # 5: неизвестный вид
+        "2026-05-10;1;101;оплата;сто;;\n"               # 6: некорректная сумма
+        "2026-05-10;2;201;;100;Бартер;\n"               # 7: неизвестный тип оплаты
+        ";;;;;;\n"                                      # пустая строка пропускается
+        "2026-05-11;2;201;;2000;;\n",                   # 9: вид по умолчанию — оплата
+        encoding="utf-8")
+
+    result = plan_ledger_import(str(path), data)
+
+    assert result.rows == 7
+    assert [row for row, _ in result.errors] == [3, 4, 5, 6, 7]
+    assert "Некорректная дата" in result.errors[0][1]
+    assert "999" in result.errors[1][1]
+    assert "возврат" in result.errors[2][1]
+    assert "сто" in result.errors[3][1]
+    assert "Бартер" in result.errors[4][1]
+    assert [(entry["room"], entry["kind"], entry["amount"], entry["date"], entry["payment_type"])
+            for entry in result.entries] == [("a", "payment", 1000.5, "2026-05-10", "Наличные"),
+                                             ("d", "payment", 2000.0, "2026-05-11", "Безналичные")]
+
+
+def test_import_requires_columns(tmp_path, data):
+    path = tmp_path / "payments.csv"
+    path.write_text("Дата;Кабинет\n2026-05-10;101\n", encoding="utf-8")
+    result = plan_ledger_import(str(path), data)
+    assert result.entries == []
+    assert result.errors == [(1, "Нужны столбцы «Дата», «Кабинет» и «Сумма».")]
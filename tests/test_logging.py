@@ -0,0 +1,18 @@
+import logging
+
+from stroycent.utils import get_default_log_level
+
+
+def test_log_level_from_environment(monkeypatch):
+    monkeypatch.setenv("STROYCENT_LOG_LEVEL", "debug")
+    assert get_default_log_level() == logging.DEBUG
+    monkeypatch.setenv("STROYCENT_LOG_LEVEL", "30")
+    assert get_default_log_level() == logging.WARNING
+
+
+def test_unknown_log_level_falls_back_to_default(monkeypatch):
+    monkeypatch.delenv("STROYCENT_LOG_LEVEL", raising=False)
+    default = get_default_log_level()
+    monkeypatch.setenv("STROYCENT_LOG_LEVEL", "BOGUS")
+    level = get_default_log_level()
+    assert level == default
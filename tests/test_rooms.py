@@ -0,0 +1,67 @@
+"""Уникальность номера кабинета на этаже: индекс номеров и проверка при сохранении."""
+import pytest
+
+from stroycent.data_manager import data_store, replace_data
+from stroycent.history import history_store
+from stroycent.rooms import RoomNumberIndex, number_index, validate_room_number
+
+
+def _room(room_id, floor, number):
+    return {"id": room_id, "floor": floor, "number": number, "status": "свободный"}
+
+
+@pytest.fixture
+def rooms():
+    replace_data({"floors": {
+        "1": {"rooms": [_room("a", "1", "101"), _room("b", "1", "102")]},
+        "2": {"rooms": [_room("c", "2", "101")]},
+    }})
+    return {room["id"]: room for floor in data_store["floors"].values() for room in floor["rooms"]}
+
+
+def test_duplicate_on_same_floor_is_rejected(rooms):
+    assert validate_room_number(rooms["b"], "101") == ["Кабинет с номером 101 уже есть на этом этаже."]
+    # Пробелы вокруг номера не делают его другим
+    assert validate_room_number(rooms["b"], " 101 ") == ["Кабинет с номером 101 уже есть на этом этаже."]
+    # Свой же номер — не конфликт
+    assert validate_room_number(rooms["a"], "101") == []
+    # Новый кабинет еще не в индексе, но проверяется так же
+    assert validate_room_number(_room("d", "1", ""), "102") == ["Кабинет с номером 102 уже есть на этом этаже."]
+
+
+def test_same_number_on_other_floor_is_allowed(rooms):
+    assert validate_room_number(rooms["c"], "101") == []
+    assert validate_room_number(_room("d", "2", ""), "102") == []
+    assert number_index.rooms("1", "101") == [rooms["a"]]
+    assert number_index.rooms("2", "101") == [rooms["c"]]
+
+
+def test_renumbering_updates_index(rooms):
+    room = rooms["a"]
+    room["number"] = "105"
+    history_store.record_changes(room, {"number": "101"})
+
+    assert number_index.rooms("1", "101") == []
+    assert number_index.rooms("1", "105") == [room]
+    # Освободившийся номер можно занять, новый — нет
+    assert validate_room_number(rooms["b"], "101") == []
+    assert validate_room_number(rooms["b"], "105") == ["Кабинет с номером 105 уже есть на этом этаже."]
+
+
+def test_created_and_deleted_rooms(rooms):
+    room = _room("d", "1", "103")
+    data_store["floors"]["1"]["rooms"].append(room)
+    history_store.record_created(room)
+    assert validate_room_number(rooms["b"], "103") != []
+
+    data_store["floors"]["1"]["rooms"].remove(room)
+    history_store.record_deleted(room)
+    assert validate_room_number(rooms["b"], "103") == []
+
+
+def test_rebuild_reports_duplicates_from_old_files():
+    data = {"floors": {"1": {"rooms": [_room("a", "1", "101"), _room("b", "1", "101 "), _room("c", "1", "102")]}}}
+    index = RoomNumberIndex(data)
+    assert index.duplicates() == [(("1", "101"), data["floors"]["1"]["rooms"][:2])]
+    # Повтор не мешает сохранить каждый из кабинетов под другим номером
+    assert index.conflict(data["floors"]["1"]["rooms"][0], "103") is None
@@ -0,0 +1,80 @@
+"""Занятость кабинетов определяется по идентификатору статуса и переживает переименование."""
+import json
+from datetime import date
+
+from stroycent import data_manager
+from stroycent.data_manager import data_store, replace_data, ensure_status_ids, add_default_statuses
+from stroycent.history import history_store, HistoryStore, COLUMNS, HISTORY_FORMAT_VERSION
+from stroycent.ledger import is_leased
+from stroycent.statuses import rename_status, status_index
+
+
+def _building(status="занят"):
+    return {"floors": {"1": {"rooms": [
+        {"id": "r1", "number": "101", "floor": "1", "status": status, "rent": 1000, "points": []},
+    ]}}}
+
+
+def _occupancy():
+    today = date.today()
+    row = history_store.occupancy(today.replace(day=1), today)[-1]
+    return row["occupied"], row["total"]
+
+
+def test_builtin_statuses_get_fixed_ids():
+    statuses = {"занят": {"bg": "#000000", "text": "#000000", "id": "1a2b3c4d"},
+                "бронь": {"bg": "#000000", "text": "#000000"}}
+    assert ensure_status_ids(statuses)
+    assert statuses["занят"]["id"] == "occupied"
+    assert statuses["бронь"]["id"]
+
+    # Переименованный встроенный статус не добавляется заново под прежним названием
+    statuses = {"Арендован": {"bg": "#000000", "text": "#000000", "id": "occupied"}}
+    add_default_statuses(statuses)
+    assert "занят" not in statuses
+    assert "свободный" in statuses
+
+
+def test_rename_keeps_occupancy_and_accrual():
+    replace_data(_building())
+    room = data_store["floors"]["1"]["rooms"][0]
+    month = date.today().strftime("%Y-%m")
+    assert _occupancy() == (1, 1)
+    assert is_leased(room, month)
+
+    rename_status("занят", "Арендован", {"bg": "#B3ffff00", "text": "#000000"})
+
+    assert room["status"] == "Арендован"
+    assert data_store["statuses"]["Арендован"]["id"] == "occupied"
+    assert status_index.count("Арендован") == 1
+    assert _occupancy() == (1, 1)
+    assert is_leased(room, month)
+
+    # После слияния срезы пересчитываются по данным и тоже не меняются
+    history_store.resync(data_store)
+    assert _occupancy() == (1, 1)
+
+
+def test_custom_status_is_not_occupied():
+    replace_data(_building("бронь"))
+    data_store["statuses"]["бронь"] = {"bg": "#000000", "text": "#000000", "id": data_manager.new_status_id()}
+    history_store.resync(data_store)
+    assert _occupancy() == (0, 1)
+    assert not is_leased(data_store["floors"]["1"]["rooms"][0], date.today().strftime("%Y-%m"))
+
+
+def test_history_rollups_migrate_to_status_ids(tmp_path):
+    path = str(tmp_path / "history.json")
+    snapshot = {"1": {"Арендован": 2, "свободный": 1}}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": 2, "strings": [], "columns": {name: [] for name in COLUMNS},
+                   "state": snapshot, "rollups": {"day": {"2026-01-20": snapshot}, "month": {"2026-01": snapshot}}}, f)
+    data = {"statuses": {"Арендован": {"bg": "#000000", "text": "#000000", "id": "occupied"}},
+            "floors": {"1": {"rooms": []}}}
+
+    store = HistoryStore.open(path, data)
+
+    assert store.status_counts(date(2026, 1, 31), granularity="month") == {"occupied": 2, "free": 1}
+    assert store.occupancy("2026-01-01", "2026-01-31")[0]["occupied"] == 2
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["version"] == HISTORY_FORMAT_VERSION
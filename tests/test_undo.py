@@ -0,0 +1,185 @@
+"""
+Команды отмены: отмена возвращает data_store к состоянию до действия,
+повтор — к состоянию после него. Стек ограничен по памяти.
+"""
+import copy
+
+import pytest
+
+from stroycent import statuses
+from stroycent.data_manager import data_store, replace_data
+from stroycent.history import history_store, TRACKED_FIELDS
+from stroycent.undo import (UndoStack, RoomCreatedCommand, RoomDeletedCommand, RoomFieldsCommand,
+                            RoomsBatchCommand, RoomPolygonCommand, StatusCommand)
+
+
+class FakeWindow:
+    """Главное окно без сцены: команды вызывают только эти методы."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name in ("add_room_to_scene", "remove_room_from_scene", "update_room_items",
+                    "update_room_geometry", "refresh_rooms"):
+            return lambda *args: self.calls.append(name)
+        raise AttributeError(name)
+
+
+def _room(room_id, number, status="свободный", **fields):
+    room = {"id": room_id, "floor": "1", "number": number, "status": status,
+            "points": [[0, 0], [10, 0], [10, 10]]}
+    room.update(fields)
+    return room
+
+
+@pytest.fixture
+def rooms():
+    replace_data({"floors": {"1": {"rooms": [
+        _room("a", "101", "занят", renter_name="ООО Альфа", inn="7700000001"),
+        _room("b", "102"),
+        _room("c", "103", "занят", renter_name="ИП Бета"),
+    ]}}})
+    return data_store["floors"]["1"]["rooms"]
+
+
+def _state():
+    # Порядок статусов тоже часть данных (это порядок в списке и в легенде)
+    return copy.deepcopy(data_store), list(data_store["statuses"])
+
+
+def _check_round_trip(action):
+    """Выполняет действие, затем отмену и повтор, сравнивая data_store целиком."""
+    before = _state()
+    command = action()
+    after = _state()
+    assert after != before
+    stack = UndoStack()
+    stack.push(command)
+    window = FakeWindow()
+    stack.undo(window)
+    assert _state() == before
+    stack.redo(window)
+    assert _state() == after
+    stack.undo(window)
+    assert _state() == before
+    return window
+
+
+def _edit(room_data, **values):
+    old_values = {field: room_data.get(field) for field in set(TRACKED_FIELDS) | set(values)}
+    for field, value in values.items():
+        if value is None:
+            room_data.pop(field, None)
+        else:
+            room_data[field] = value
+    history_store.record_changes(room_data, old_values)
+    return old_values
+
+
+def test_room_created(rooms):
+    def action():
+        room = _room("d", "104")
+        rooms.insert(1, room)
+        history_store.record_created(room)
+        return RoomCreatedCommand(room)
+    _check_round_trip(action)
+
+
+def test_room_deleted(rooms):
+    def action():
+        room = rooms.pop(1)
+        history_store.record_deleted(room)
+        return RoomDeletedCommand(room, 1)
+    _check_round_trip(action)
+    # Кабинет возвращается на прежнее место в списке этажа
+    assert [room["id"] for room in rooms] == ["a", "b", "c"]
+
+
+def test_room_fields(rooms):
+    def action():
+        # Новое поле, измененное поле и удаленное поле
+        old_values = _edit(rooms[0], rent=1500, status="скоро освободится", inn=None)
+        return RoomFieldsCommand(rooms[0], old_values)
+    _check_round_trip(action)
+
+
+def test_rooms_batch(rooms):
+    def action():
+        commands = [RoomFieldsCommand(room, _edit(room, payment_type="Безналичные")) for room in rooms]
+        # Кабинет без изменений в пакет не попадает
+        commands.append(RoomFieldsCommand(rooms[1], {"payment_type": "Безналичные"}))
+        return RoomsBatchCommand(commands, "групповое изменение")
+    window = _check_round_trip(action)
+    # Сцена обновляется один раз на весь пакет
+    assert window.calls == ["refresh_rooms"] * 3
+
+
+def test_room_polygon(rooms):
+    def action():
+        old_points = rooms[2]["points"]
+        rooms[2]["points"] = [[0, 0], [20, 0], [20, 20], [0, 20]]
+        return RoomPolygonCommand(rooms[2], old_points)
+    _check_round_trip(action)
+
+
+def test_status_rename(rooms):
+    def action():
+        position = list(data_store["statuses"]).index("занят")
+        old_status = ("занят", data_store["statuses"]["занят"])
+        renamed = statuses.rename_status("занят", "арендован", {"bg": "#B3123456", "text": "#000000"})
+        return StatusCommand(old_status, ("арендован", data_store["statuses"]["арендован"]), position, renamed)
+    _check_round_trip(action)
+    assert statuses.status_index.count("занят") == 2
+
+
+def test_status_removed(rooms):
+    def action():
+        position = list(data_store["statuses"]).index("занят")
+        old_status = ("занят", data_store["statuses"]["занят"])
+        removed = statuses.remove_status("занят", "в ремонте")
+        return StatusCommand(old_status, None, position, removed, target="в ремонте")
+    _check_round_trip(action)
+
+
+def test_status_added(rooms):
+    def action():
+        new_status = ("бронь", {"bg": "#B3000000", "text": "#ffffff", "id": "b1"})
+        data_store["statuses"].update([new_status])
+        return StatusCommand(None, new_status, len(data_store["statuses"]) - 1)
+    _check_round_trip(action)
+
+
+def _fields_command(rooms, n):
+    return RoomFieldsCommand(rooms[0], _edit(rooms[0], renter_name=f"Арендатор {n}"))
+
+
+def test_trim_evicts_oldest_commands(rooms):
+    commands = [_fields_command(rooms, n) for n in range(5)]
+    cost = max(command.size() for command in commands)
+    stack = UndoStack(memory_limit=cost * 3)
+    for command in commands:
+        stack.push(command)
+    assert list(stack._undo) == commands[-3:]
+    assert stack._used == sum(command.cost for command in commands[-3:])
+
+    stack.set_memory_limit(cost)
+    assert list(stack._undo) == commands[-1:]
+
+
+def test_push_clears_redo(rooms):
+    stack = UndoStack()
+    window = FakeWindow()
+    stack.push(_fields_command(rooms, 1))
+    stack.push(_fields_command(rooms, 2))
+    stack.undo(window)
+    assert stack.can_redo()
+
+    stack.push(_fields_command(rooms, 3))
+    assert not stack.can_redo()
+    assert stack.redo(window) is None
+    assert rooms[0]["renter_name"] == "Арендатор 3"
+    # Пустое изменение не попадает в историю и не сбрасывает ее
+    stack.undo(window)
+    stack.push(RoomFieldsCommand(rooms[0], {"renter_name": rooms[0]["renter_name"]}))
+    assert stack.can_redo()
@@ -0,0 +1,47 @@
+"""
+Процессы-исполнители экспорта и снимков запускаются через spawn: они
+заново импортируют главный модуль (как __mp_main__) и модуль задания
+и не должны при этом читать данные здания.
+"""
+import os
+import sys
+import json
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+
+def _stroycent_modules():
+    return sorted(name for name in sys.modules if name.startswith("stroycent"))
+
+
+def _snapshot_in_worker(data_file, directory):
+    from stroycent.snapshots import _snapshot_job, DEFAULT_SETTINGS
+    snapshot = _snapshot_job(data_file, directory, True, dict(DEFAULT_SETTINGS))
+    return snapshot["kind"], _stroycent_modules()
+
+
+def test_main_reimport_loads_no_building_data(tmp_path):
+    # Так spawn готовит главный модуль в дочернем процессе
+    code = ("import runpy, sys; runpy.run_path(sys.argv[1], run_name='__mp_main__'); "
+            "print(sorted(name for name in sys.modules if name.startswith('stroycent')))")
+    env = dict(os.environ, PYTHONPATH=ROOT, QT_QPA_PLATFORM="offscreen")
+    env.pop("STROYCENT_DATA_FILE", None)
+    result = subprocess.run([sys.executable, "-c", code, MAIN], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "stroycent.data_manager" not in result.stdout
+    assert os.listdir(tmp_path) == []
+
+
+def test_snapshot_worker_does_not_import_data_manager(tmp_path):
+    data_file = tmp_path / "building_data.json"
+    data_file.write_text(json.dumps({"floors": {"1": {"rooms": [{"id": "a", "number": "1"}]}}}), encoding="utf-8")
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        kind, modules = pool.submit(_snapshot_in_worker, str(data_file), str(tmp_path / "snapshots")).result(timeout=60)
+    assert kind == "full"
+    assert "stroycent.data_manager" not in modules